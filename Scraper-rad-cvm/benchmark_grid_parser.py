@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark do parser da grade de resultados do RAD CVM
+Compara o caminho BeautifulSoup com o caminho lxml/XPath em páginas salvas do portal
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+from historical_scraper import HistoricalRADCVMScraper
+from real_data_scraper import RealRADCVMScraper
+from rad_cvm_scraper_requests import RADCVMScraperRequests
+
+DEFAULT_PAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            '..', 'scripts', 'cvm-insiders', 'cvm_page_content.html')
+
+ROW_TEMPLATE = """
+      <tr>
+       <td>{codigo:06d}</td>
+       <td>EMPRESA EXEMPLO {n} S.A.</td>
+       <td>Valores Mobiliários negociados e detidos (art. 11 da Instr. CVM nº 358)</td>
+       <td>Posição Consolidada</td>
+       <td></td>
+       <td>01/07/2025</td>
+       <td>28/07/2025 16:01</td>
+       <td>Ativo</td>
+       <td>1</td>
+       <td>AP - Apresentação</td>
+       <td><a href="frmDownloadDocumento.aspx?numProtocolo={n}" title="Download"><i class="fi-download"></i></a></td>
+       <td>Assunto(s): Movimentações de administradores</td>
+      </tr>"""
+
+def build_page(page_path: str, rows: int) -> bytes:
+    """Carrega a página salva e preenche a grade de resultados com linhas sintéticas"""
+    with open(page_path, 'rb') as f:
+        html = f.read().decode('utf-8')
+
+    if rows:
+        body = ''.join(ROW_TEMPLATE.format(codigo=1000 + n, n=n) for n in range(rows))
+        grid_start = html.index('id="grdDocumentos"')
+        tbody_start = html.index('<tbody>', grid_start) + len('<tbody>')
+        html = html[:tbody_start] + body + html[tbody_start:]
+
+    return html.encode('utf-8')
+
+def time_call(func, html_content: bytes, repeat: int):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(html_content)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+def strip_timestamps(documents):
+    return [{k: v for k, v in doc.items() if k != 'scraped_at'} for doc in documents]
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark do parser da grade do RAD CVM')
+    parser.add_argument('--page', default=DEFAULT_PAGE, help='Página de resultados salva')
+    parser.add_argument('--rows', type=int, default=100, help='Linhas sintéticas inseridas na grade')
+    parser.add_argument('--repeat', type=int, default=5, help='Repetições por parser')
+    args = parser.parse_args()
+
+    html_content = build_page(args.page, args.rows)
+    print(f"Página: {args.page} ({len(html_content) / 1024:.0f} KB, {args.rows} linhas na grade)")
+
+    historical = HistoricalRADCVMScraper()
+    real_data = RealRADCVMScraper()
+    requests_scraper = RADCVMScraperRequests()
+
+    cases = [
+        ('historical_scraper', historical._extract_documents_from_html_soup,
+         historical._extract_documents_from_html_fast),
+        ('real_data_scraper', real_data._extract_documents_from_response_soup,
+         real_data._extract_documents_from_response_fast),
+        ('rad_cvm_scraper_requests', requests_scraper._extract_documents_from_html_soup,
+         requests_scraper._extract_documents_from_html_fast),
+    ]
+
+    for name, soup_func, fast_func in cases:
+        soup_time, soup_docs = time_call(soup_func, html_content, args.repeat)
+        fast_time, fast_docs = time_call(fast_func, html_content, args.repeat)
+        same = strip_timestamps(soup_docs) == strip_timestamps(fast_docs)
+
+        print(f"{name:26s} BeautifulSoup {soup_time * 1000:8.1f} ms | "
+              f"lxml {fast_time * 1000:7.1f} ms | "
+              f"{soup_time / fast_time:5.1f}x | "
+              f"{len(fast_docs)} documentos | saída idêntica: {'sim' if same else 'NÃO'}")
+
+if __name__ == "__main__":
+    main()
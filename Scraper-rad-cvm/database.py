@@ -5,18 +5,55 @@ Gerencia conexões PostgreSQL e operações de dados
 """
 
 import os
+import re
 import logging
+import threading
+from contextlib import contextmanager
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
+from psycopg2.pool import ThreadedConnectionPool
 from typing import List, Dict, Optional
 from datetime import datetime
 import json
 
+# Colunas usadas pelas inserções em lote
+DOCUMENTO_COLUMNS = [
+    'protocolo', 'codigo_cvm', 'empresa', 'categoria', 'tipo', 'especie',
+    'data_referencia', 'data_entrega', 'status', 'versao',
+    'modalidade', 'download_url', 'arquivo_path', 'scraped_at'
+]
+
+MOVIMENTACAO_COLUMNS = [
+    'documento_id', 'codigo_cvm', 'empresa', 'nome_pessoa', 'cpf_cnpj',
+    'cargo', 'tipo_pessoa', 'valor_mobiliario', 'quantidade_anterior',
+    'quantidade_atual', 'quantidade_movimentada', 'tipo_movimentacao',
+    'preco_unitario', 'valor_total', 'data_movimentacao', 'observacoes'
+]
+
+def extract_protocolo(documento: Dict) -> Optional[str]:
+    """Obtém o número de protocolo do documento (campo próprio ou URL de download)"""
+    if documento.get('protocolo'):
+        return str(documento['protocolo'])
+    match = re.search(r'numProtocolo=([^&]+)', documento.get('download_url') or '', re.IGNORECASE)
+    return match.group(1) if match else None
+
+def documento_key(documento: Dict) -> str:
+    """Chave do documento no mapa de IDs: protocolo ou, na falta dele, a chave natural"""
+    protocolo = extract_protocolo(documento)
+    if protocolo:
+        return protocolo
+    return '|'.join(str(documento.get(k) or '') for k in
+                    ('codigo_cvm', 'categoria', 'tipo', 'data_referencia', 'data_entrega', 'versao'))
+
 class DatabaseManager:
     """Gerenciador de banco de dados PostgreSQL"""
     
-    def __init__(self):
-        self.connection = None
+    def __init__(self, min_connections: int = 1, max_connections: int = 8):
+        self.pool = None
+        self._local = threading.local()
+        self.min_connections = min_connections
+        self.max_connections = max_connections
+        self._pool_lock = threading.Lock()
         self.logger = logging.getLogger('DatabaseManager')
         
         # Configurações do banco (usar variáveis de ambiente)
@@ -28,23 +65,66 @@ class DatabaseManager:
             'password': os.getenv('DB_PASSWORD', 'password')
         }
     
+    @property
+    def connection(self):
+        """Conexão autocommit da thread atual, usada pelas operações unitárias"""
+        return getattr(self._local, 'connection', None)
+    
     def connect(self) -> bool:
-        """Conecta ao banco de dados"""
+        """Conecta ao banco de dados (pool de conexões + conexão autocommit da thread atual)"""
         try:
-            self.connection = psycopg2.connect(**self.db_config)
-            self.connection.autocommit = True
-            self.logger.info("Conectado ao banco de dados PostgreSQL")
+            with self._pool_lock:
+                if self.pool is None:
+                    self.pool = ThreadedConnectionPool(
+                        self.min_connections, self.max_connections, **self.db_config
+                    )
+                    self.logger.info("Conectado ao banco de dados PostgreSQL")
+                pool = self.pool
+            if self.connection is None:
+                connection = pool.getconn()
+                connection.autocommit = True
+                self._local.connection = connection
             return True
         except Exception as e:
             self.logger.error(f"Erro ao conectar ao banco: {e}")
             return False
     
     def disconnect(self):
-        """Desconecta do banco de dados"""
-        if self.connection:
-            self.connection.close()
-            self.connection = None
-            self.logger.info("Desconectado do banco de dados")
+        """Devolve ao pool a conexão da thread atual; o pool continua aberto para as demais"""
+        connection = self.connection
+        self._local.connection = None
+        if connection is not None and self.pool is not None:
+            self.pool.putconn(connection)
+    
+    def close(self):
+        """Fecha o pool de conexões; chamar uma única vez, no encerramento do processo"""
+        self.disconnect()
+        with self._pool_lock:
+            if self.pool is not None:
+                self.pool.closeall()
+                self.pool = None
+                self.logger.info("Desconectado do banco de dados")
+    
+    @contextmanager
+    def transaction(self):
+        """
+        Fornece um cursor do pool dentro de uma única transação.
+        Cada worker recebe sua própria conexão, permitindo escritas concorrentes.
+        """
+        if self.pool is None and not self.connect():
+            raise ConnectionError("Pool de conexões não inicializado")
+        
+        conn = self.pool.getconn()
+        try:
+            conn.autocommit = False
+            with conn.cursor() as cursor:
+                yield cursor
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self.pool.putconn(conn)
     
     def create_tables(self):
         """Cria as tabelas necessárias"""
@@ -66,6 +146,7 @@ class DatabaseManager:
             """
             CREATE TABLE IF NOT EXISTS documentos (
                 id SERIAL PRIMARY KEY,
+                protocolo VARCHAR(50),
                 codigo_cvm VARCHAR(20) NOT NULL,
                 empresa VARCHAR(500) NOT NULL,
                 categoria VARCHAR(200),
@@ -110,8 +191,14 @@ class DatabaseManager:
             );
             """,
             
+            # Bancos criados antes da coluna de protocolo
+            """
+            ALTER TABLE documentos ADD COLUMN IF NOT EXISTS protocolo VARCHAR(50);
+            """,
+            
             # Índices para performance
             """
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_documentos_protocolo ON documentos(protocolo);
             CREATE INDEX IF NOT EXISTS idx_documentos_codigo_cvm ON documentos(codigo_cvm);
             CREATE INDEX IF NOT EXISTS idx_documentos_data_entrega ON documentos(data_entrega);
             CREATE INDEX IF NOT EXISTS idx_documentos_tipo ON documentos(tipo);
@@ -211,6 +298,131 @@ class DatabaseManager:
             self.logger.error(f"Erro ao inserir movimentação CVM 44: {e}")
             return False
     
+    def insert_empresas_many(self, empresas: List[Dict], page_size: int = 1000) -> int:
+        """Insere ou atualiza várias empresas em uma única transação"""
+        # Deduplica por código CVM (o último registro prevalece)
+        unique = {e['codigo_cvm']: e for e in empresas if e.get('codigo_cvm')}
+        if not unique:
+            return 0
+        
+        rows = [
+            (e['codigo_cvm'], e.get('nome') or '', e.get('setor'), e.get('situacao'))
+            for e in unique.values()
+        ]
+        
+        sql = """
+        INSERT INTO empresas (codigo_cvm, nome, setor, situacao)
+        VALUES %s
+        ON CONFLICT (codigo_cvm) 
+        DO UPDATE SET 
+            nome = EXCLUDED.nome,
+            setor = EXCLUDED.setor,
+            situacao = EXCLUDED.situacao,
+            updated_at = CURRENT_TIMESTAMP
+        """
+        
+        try:
+            with self.transaction() as cursor:
+                execute_values(cursor, sql, rows, page_size=page_size)
+            return len(rows)
+        except Exception as e:
+            self.logger.error(f"Erro ao inserir empresas em lote: {e}")
+            return 0
+    
+    def insert_documentos_many(self, documentos: List[Dict], page_size: int = 1000) -> Dict[str, int]:
+        """
+        Insere vários documentos em uma única transação e retorna {protocolo: id}.
+        Documentos sem protocolo conhecido são indexados pela chave natural (documento_key).
+        Documentos com protocolo já existente são atualizados e mantêm o ID original.
+        """
+        # Deduplica dentro do lote: o ON CONFLICT não pode tocar a mesma linha duas vezes
+        unique = {}
+        for documento in documentos:
+            unique[documento_key(documento)] = documento
+        if not unique:
+            return {}
+        
+        keys = list(unique.keys())
+        rows = []
+        for documento in unique.values():
+            values = dict(documento, protocolo=extract_protocolo(documento))
+            rows.append(tuple(values.get(col) for col in DOCUMENTO_COLUMNS))
+        
+        sql = f"""
+        INSERT INTO documentos ({', '.join(DOCUMENTO_COLUMNS)})
+        VALUES %s
+        ON CONFLICT (protocolo) DO UPDATE SET
+            status = EXCLUDED.status,
+            versao = EXCLUDED.versao,
+            download_url = COALESCE(EXCLUDED.download_url, documentos.download_url),
+            scraped_at = EXCLUDED.scraped_at
+        RETURNING id
+        """
+        
+        try:
+            with self.transaction() as cursor:
+                # As linhas de RETURNING seguem a ordem do VALUES
+                returned = execute_values(cursor, sql, rows, page_size=page_size, fetch=True)
+        except Exception as e:
+            self.logger.error(f"Erro ao inserir documentos em lote, repetindo linha a linha: {e}")
+            try:
+                returned = self._execute_values_by_row(sql, rows, fetch=True)
+            except Exception as e:
+                self.logger.error(f"Erro ao inserir documentos linha a linha: {e}")
+                return {}
+        
+        id_map = {key: row[0] for key, row in zip(keys, returned) if row is not None}
+        self.logger.info(f"{len(id_map)} documentos inseridos/atualizados em lote")
+        return id_map
+    
+    def insert_movimentacoes_many(self, movimentacoes: List[Dict], page_size: int = 1000) -> int:
+        """Insere várias movimentações CVM 44 em uma única transação"""
+        if not movimentacoes:
+            return 0
+        
+        rows = [tuple(mov.get(col) for col in MOVIMENTACAO_COLUMNS) for mov in movimentacoes]
+        
+        sql = f"""
+        INSERT INTO cvm44_movimentacoes ({', '.join(MOVIMENTACAO_COLUMNS)})
+        VALUES %s
+        """
+        
+        try:
+            with self.transaction() as cursor:
+                execute_values(cursor, sql, rows, page_size=page_size)
+            inserted = len(rows)
+        except Exception as e:
+            self.logger.error(f"Erro ao inserir movimentações CVM 44 em lote, repetindo linha a linha: {e}")
+            try:
+                inserted = sum(1 for row in self._execute_values_by_row(sql, rows) if row is not None)
+            except Exception as e:
+                self.logger.error(f"Erro ao inserir movimentações CVM 44 linha a linha: {e}")
+                return 0
+        
+        self.logger.info(f"{inserted} movimentações CVM 44 inseridas em lote")
+        return inserted
+    
+    def _execute_values_by_row(self, sql: str, rows: List[tuple], fetch: bool = False) -> List:
+        """
+        Repete um lote que falhou linha a linha, cada uma em seu próprio savepoint,
+        para que só as linhas inválidas fiquem de fora. Retorna, na ordem das linhas,
+        a linha de RETURNING (ou True sem fetch) e None para as linhas ignoradas.
+        """
+        results = []
+        with self.transaction() as cursor:
+            for index, row in enumerate(rows):
+                cursor.execute("SAVEPOINT lote_linha")
+                try:
+                    returned = execute_values(cursor, sql, [row], fetch=fetch)
+                except psycopg2.Error as e:
+                    cursor.execute("ROLLBACK TO SAVEPOINT lote_linha")
+                    self.logger.warning(f"Linha {index} ignorada no lote ({row[0]!r}): {e}")
+                    results.append(None)
+                    continue
+                cursor.execute("RELEASE SAVEPOINT lote_linha")
+                results.append(returned[0] if fetch else True)
+        return results
+    
     def get_documentos_by_empresa(self, codigo_cvm: str, limit: int = 100) -> List[Dict]:
         """Obtém documentos de uma empresa específica"""
         try:
@@ -357,5 +569,5 @@ if __name__ == "__main__":
         db.create_tables()
         stats = db.get_stats()
         print("Estatísticas do banco:", stats)
-        db.disconnect()
+        db.close()
 
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Parser rápido para a grade de resultados do RAD CVM
+Usa lxml e XPath pré-compilados em vez de montar a árvore completa do BeautifulSoup
+"""
+
+import re
+
+try:
+    from lxml import etree
+    from lxml import html as lxml_html
+    LXML_AVAILABLE = True
+except ImportError:  # Sem lxml os scrapers continuam usando o BeautifulSoup
+    LXML_AVAILABLE = False
+
+if LXML_AVAILABLE:
+    XPATH_TABLES = etree.XPath('//table')
+    XPATH_GRID_TABLE = etree.XPath("//table[contains(@id, 'gvDocumentos')]")
+    XPATH_ROWS = etree.XPath('.//tr')
+    XPATH_TD = etree.XPath('.//td')
+    XPATH_TH = etree.XPath('.//th')
+    XPATH_TD_TH = etree.XPath('.//td | .//th')
+    XPATH_LINKS_WITH_TITLE = etree.XPath('.//a[@title]')
+
+def parse_html(html_content):
+    """
+    Monta a árvore lxml do HTML (bytes ou str). Bytes são decodificados como UTF-8,
+    como o BeautifulSoup faz; se não forem UTF-8 válido, o lxml usa o charset declarado.
+    """
+    if isinstance(html_content, bytes):
+        try:
+            return lxml_html.fromstring(html_content.decode('utf-8'))
+        except (UnicodeDecodeError, ValueError):
+            pass
+    return lxml_html.fromstring(html_content)
+
+def cell_text(element) -> str:
+    """Equivalente a get_text().strip() do BeautifulSoup"""
+    return element.text_content().strip()
+
+def find_grid_table(root):
+    """Retorna a tabela cujo id contém gvDocumentos, se existir"""
+    tables = XPATH_GRID_TABLE(root)
+    return tables[0] if tables else None
+
+def find_link_by_title(element, pattern: re.Pattern):
+    """Primeiro <a> descendente cujo atributo title casa com o padrão"""
+    for link in XPATH_LINKS_WITH_TITLE(element):
+        if pattern.search(link.get('title', '')):
+            return link
+    return None
+
+def find_td_with_string(row, pattern: re.Pattern):
+    """
+    Equivalente a row.find('td', string=pattern): só considera células
+    cujo conteúdo é um único texto (sem elementos filhos)
+    """
+    for td in XPATH_TD(row):
+        if len(td) == 0 and td.text is not None and pattern.search(td.text):
+            return td
+    return None
@@ -15,6 +15,7 @@ import re
 from urllib.parse import urljoin, parse_qs, urlparse
 import json
 from database import DatabaseManager
+import grid_parser
 
 class HistoricalRADCVMScraper:
     """Scraper histórico para o portal RAD CVM"""
@@ -151,7 +152,75 @@ class HistoricalRADCVMScraper:
             return []
     
     def _extract_documents_from_html(self, html_content: bytes) -> List[Dict]:
-        """Extrai documentos do HTML da resposta"""
+        """Extrai documentos do HTML da resposta (lxml quando disponível)"""
+        if grid_parser.LXML_AVAILABLE:
+            try:
+                return self._extract_documents_from_html_fast(html_content)
+            except Exception as e:
+                self.logger.debug(f"Parser rápido falhou, usando BeautifulSoup: {e}")
+        return self._extract_documents_from_html_soup(html_content)
+    
+    def _extract_documents_from_html_fast(self, html_content: bytes) -> List[Dict]:
+        """Extrai documentos da grade de resultados com lxml e XPath pré-compilados"""
+        documents = []
+        root = grid_parser.parse_html(html_content)
+        
+        # Procura pela tabela de resultados
+        table = grid_parser.find_grid_table(root)
+        if table is None:
+            # Tenta encontrar qualquer tabela com dados
+            for t in grid_parser.XPATH_TABLES(root):
+                if len(grid_parser.XPATH_ROWS(t)) > 5:  # Tabela com pelo menos 5 linhas
+                    table = t
+                    break
+        
+        if table is None:
+            return documents
+        
+        rows = grid_parser.XPATH_ROWS(table)
+        
+        # Identifica cabeçalho
+        header_row = 0
+        for i, row in enumerate(rows):
+            cells = grid_parser.XPATH_TD_TH(row)
+            if cells and any('código' in cell.text_content().lower() for cell in cells):
+                header_row = i
+                break
+        
+        download_title = re.compile(r'.*download.*', re.I)
+        
+        # Processa linhas de dados
+        for row in rows[header_row + 1:]:
+            cells = grid_parser.XPATH_TD(row)
+            if len(cells) >= 8:
+                texts = [grid_parser.cell_text(cell) for cell in cells]
+                document = {
+                    'codigo_cvm': texts[0],
+                    'empresa': texts[1],
+                    'categoria': texts[2],
+                    'tipo': texts[3],
+                    'especie': texts[4],
+                    'data_referencia': texts[5],
+                    'data_entrega': texts[6],
+                    'status': texts[7],
+                    'versao': texts[8] if len(texts) > 8 else '',
+                    'modalidade': texts[9] if len(texts) > 9 else '',
+                    'scraped_at': datetime.now().isoformat()
+                }
+                
+                # Extrai URL de download se disponível
+                download_link = grid_parser.find_link_by_title(cells[-1], download_title)
+                if download_link is not None:
+                    document['download_url'] = download_link.get('href', '')
+                
+                # Só adiciona se tiver dados válidos
+                if document['empresa'] and document['categoria']:
+                    documents.append(document)
+        
+        return documents
+    
+    def _extract_documents_from_html_soup(self, html_content: bytes) -> List[Dict]:
+        """Extrai documentos do HTML da resposta com BeautifulSoup"""
         documents = []
         
         try:
@@ -320,7 +389,8 @@ class HistoricalRADCVMScraper:
                 self.logger.error("Erro ao conectar ao banco de dados")
                 return 0
             
-            saved_count = 0
+            empresas = {}
+            documentos = []
             
             for doc in documents:
                 try:
@@ -361,24 +431,24 @@ class HistoricalRADCVMScraper:
                     except:
                         doc_data['versao'] = 1
                     
-                    # Salva empresa primeiro
-                    empresa_data = {
+                    # Acumula empresa e documento para a gravação em lote
+                    empresas[doc_data['codigo_cvm']] = {
                         'codigo_cvm': doc_data['codigo_cvm'],
                         'nome': doc_data['empresa'],
                         'setor': '',
                         'situacao': 'Ativo'
                     }
-                    self.db.insert_empresa(empresa_data)
-                    
-                    # Salva documento
-                    documento_id = self.db.insert_documento(doc_data)
-                    if documento_id:
-                        saved_count += 1
+                    documentos.append(doc_data)
                         
                 except Exception as e:
-                    self.logger.error(f"Erro ao salvar documento: {e}")
+                    self.logger.error(f"Erro ao preparar documento: {e}")
                     continue
             
+            # Empresas primeiro (chave estrangeira), cada lote em uma única transação
+            self.db.insert_empresas_many(list(empresas.values()))
+            documento_ids = self.db.insert_documentos_many(documentos)
+            saved_count = len(documento_ids)
+            
             self.db.disconnect()
             self.logger.info(f"Salvos {saved_count} documentos no banco de dados")
             return saved_count
@@ -465,4 +535,5 @@ if __name__ == "__main__":
         print(f"\n✗ Erro durante o teste: {e}")
         import traceback
         traceback.print_exc()
-
+    finally:
+        scraper.db.close()
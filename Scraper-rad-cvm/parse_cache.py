@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Cache persistente de resultados do processamento de PDFs CVM 44
+Sidecar SQLite com chave (SHA-256 do arquivo, versão das regras do processador)
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+def compute_rules_version(*source_paths: str) -> str:
+    """Calcula a versão das regras a partir do código-fonte do processador"""
+    digest = hashlib.sha256()
+    for path in source_paths:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+class PDFParseCache:
+    """
+    Cache de resultados de parsing de PDFs armazenado em SQLite.
+    A conexão é compartilhada entre threads e serializada por um lock.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.logger = logging.getLogger('PDFParseCache')
+
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS pdf_parse_results (
+                file_sha256 TEXT NOT NULL,
+                parser_version TEXT NOT NULL,
+                file_name TEXT,
+                result_json TEXT NOT NULL,
+                cached_at TEXT NOT NULL,
+                PRIMARY KEY (file_sha256, parser_version)
+            );
+            CREATE TABLE IF NOT EXISTS pdf_file_hashes (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                file_sha256 TEXT NOT NULL
+            );
+        """)
+        self.connection.commit()
+
+    def close(self):
+        """Fecha a conexão com o cache"""
+        with self._lock:
+            self.connection.close()
+
+    def file_hash(self, pdf_path: str) -> str:
+        """Retorna o SHA-256 do arquivo, reutilizando o valor se tamanho/mtime não mudaram"""
+        path = os.path.abspath(pdf_path)
+        stat = os.stat(path)
+
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT size, mtime_ns, file_sha256 FROM pdf_file_hashes WHERE path = ?", (path,)
+            ).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        sha = digest.hexdigest()
+
+        with self._lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO pdf_file_hashes (path, size, mtime_ns, file_sha256) VALUES (?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, sha)
+            )
+            self.connection.commit()
+        return sha
+
+    def get(self, pdf_path: str, parser_version: str) -> Optional[Dict]:
+        """Obtém o resultado em cache para o arquivo e versão do parser"""
+        try:
+            sha = self.file_hash(pdf_path)
+            with self._lock:
+                row = self.connection.execute(
+                    "SELECT result_json FROM pdf_parse_results WHERE file_sha256 = ? AND parser_version = ?",
+                    (sha, parser_version)
+                ).fetchone()
+            return json.loads(row[0]) if row else None
+        except Exception as e:
+            self.logger.error(f"Erro ao ler cache de parsing: {e}")
+            return None
+
+    def put(self, pdf_path: str, parser_version: str, result: Dict) -> bool:
+        """Armazena o resultado do processamento de um PDF"""
+        try:
+            sha = self.file_hash(pdf_path)
+            with self._lock:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO pdf_parse_results "
+                    "(file_sha256, parser_version, file_name, result_json, cached_at) VALUES (?, ?, ?, ?, ?)",
+                    (sha, parser_version, os.path.basename(pdf_path),
+                     json.dumps(result, ensure_ascii=False, default=str), datetime.now().isoformat())
+                )
+                self.connection.commit()
+            return True
+        except Exception as e:
+            self.logger.error(f"Erro ao gravar cache de parsing: {e}")
+            return False
+
+    def purge_stale(self, parser_version: str) -> int:
+        """Remove resultados de versões anteriores do processador"""
+        with self._lock:
+            cursor = self.connection.execute(
+                "DELETE FROM pdf_parse_results WHERE parser_version != ?", (parser_version,)
+            )
+            self.connection.commit()
+            return cursor.rowcount
@@ -5,20 +5,34 @@ Extrai dados de movimentações de valores mobiliários
 """
 
 import logging
+import os
 import re
 import pandas as pd
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Optional, Tuple, Iterator
 from datetime import datetime
 import pdfplumber
 import PyPDF2
 from io import BytesIO
 import requests
+from parse_cache import PDFParseCache, compute_rules_version
+
+# Versão das regras de extração: muda automaticamente quando este módulo é alterado
+PARSER_VERSION = compute_rules_version(__file__)
+
+# Sidecar SQLite do cache; PDF_PARSE_CACHE_PATH vazio desativa o cache
+DEFAULT_PARSE_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'parse_cache.sqlite3')
+
+# Marcador do quadro de movimentações do formulário CVM 44
+MOVIMENTACOES_MARKER = "movimentações no mês"
 
 class CVM44PDFProcessor:
     """Processador de PDFs de documentos CVM 44"""
     
-    def __init__(self):
+    def __init__(self, cache_path: Optional[str] = None):
         self.logger = self._setup_logger()
+        if cache_path is None:
+            cache_path = os.getenv('PDF_PARSE_CACHE_PATH', DEFAULT_PARSE_CACHE_PATH)
+        self.cache = PDFParseCache(cache_path) if cache_path else None
         
     def _setup_logger(self) -> logging.Logger:
         """Configura o logger"""
@@ -105,6 +119,50 @@ class CVM44PDFProcessor:
             self.logger.error(f"Erro ao extrair tabelas do PDF: {e}")
             return []
     
+    def page_has_movimentacoes(self, page_text: str) -> bool:
+        """Verificação barata que decide se vale a pena extrair tabelas da página"""
+        if not page_text:
+            return False
+        if MOVIMENTACOES_MARKER in page_text.lower():
+            return True
+        return self.identify_cvm44_document_type(page_text) == "movimentacao_insider"
+    
+    def iter_pages(self, pdf_path: str) -> Iterator[Dict]:
+        """
+        Percorre o PDF uma única vez, retornando texto e tabelas de cada página.
+        O arquivo é lido para memória uma vez; o PyPDF2 só é usado (sobre o mesmo buffer)
+        para páginas em que o pdfplumber não encontrou texto. A extração de tabelas
+        só roda nas páginas que passam por page_has_movimentacoes.
+        """
+        with open(pdf_path, 'rb') as f:
+            pdf_bytes = f.read()
+        
+        fallback_reader = None
+        
+        with pdfplumber.open(BytesIO(pdf_bytes)) as pdf:
+            for page_index, page in enumerate(pdf.pages):
+                page_text = page.extract_text() or ""
+                
+                if not page_text.strip():
+                    if fallback_reader is None:
+                        fallback_reader = PyPDF2.PdfReader(BytesIO(pdf_bytes))
+                    page_text = fallback_reader.pages[page_index].extract_text() or ""
+                
+                tables = []
+                if self.page_has_movimentacoes(page_text):
+                    for table_num, table in enumerate(page.extract_tables()):
+                        if table and len(table) > 1:  # Pelo menos cabeçalho + 1 linha
+                            df = pd.DataFrame(table[1:], columns=table[0])
+                            df['page_number'] = page_index + 1
+                            df['table_number'] = table_num + 1
+                            tables.append(df)
+                
+                yield {
+                    'page_number': page_index + 1,
+                    'text': page_text,
+                    'tables': tables
+                }
+    
     def identify_cvm44_document_type(self, text: str) -> str:
         """Identifica o tipo de documento CVM 44"""
         text_lower = text.lower()
@@ -243,7 +301,28 @@ class CVM44PDFProcessor:
         return movimentacoes
     
     def process_cvm44_pdf(self, pdf_path: str) -> Dict:
-        """Processa um PDF CVM 44 completo"""
+        """Processa um PDF CVM 44 completo, reutilizando o cache quando disponível"""
+        if self.cache:
+            try:
+                cached = self.cache.get(pdf_path, PARSER_VERSION)
+                if cached:
+                    self.logger.info(f"Resultado obtido do cache: {pdf_path}")
+                    return cached
+            except Exception as e:
+                self.logger.error(f"Erro ao ler cache de parsing: {e}")
+        
+        result = self._process_cvm44_pdf(pdf_path)
+        
+        if self.cache and result.get('success'):
+            try:
+                self.cache.put(pdf_path, PARSER_VERSION, result)
+            except Exception as e:
+                self.logger.error(f"Erro ao gravar cache de parsing: {e}")
+        
+        return result
+    
+    def _process_cvm44_pdf(self, pdf_path: str) -> Dict:
+        """Executa a extração completa de um PDF CVM 44"""
         result = {
             'success': False,
             'document_type': '',
@@ -258,9 +337,17 @@ class CVM44PDFProcessor:
         try:
             self.logger.info(f"Processando PDF CVM 44: {pdf_path}")
             
-            # Extrai texto
-            text = self.extract_text_from_pdf(pdf_path)
+            # Extrai texto e tabelas em uma única passada pelo documento
+            page_texts = []
+            tables = []
+            for page in self.iter_pages(pdf_path):
+                if page['text']:
+                    page_texts.append(page['text'] + "\n")
+                tables.extend(page['tables'])
+            
+            text = "".join(page_texts)
             result['raw_text'] = text
+            self.logger.info(f"Texto extraído: {len(text)} caracteres")
             
             if not text:
                 self.logger.error("Não foi possível extrair texto do PDF")
@@ -275,9 +362,8 @@ class CVM44PDFProcessor:
             # Extrai informações de pessoas
             result['people'] = self.extract_person_info(text)
             
-            # Extrai tabelas
-            tables = self.extract_tables_from_pdf(pdf_path)
             result['tables_count'] = len(tables)
+            self.logger.info(f"Total de tabelas extraídas: {len(tables)}")
             
             # Processa tabelas de movimentação
             for table in tables:
@@ -14,6 +14,7 @@ from bs4 import BeautifulSoup
 import pandas as pd
 import re
 from urllib.parse import urljoin, parse_qs, urlparse
+import grid_parser
 
 class RADCVMScraperRequests:
     """Scraper para o portal RAD CVM usando requests"""
@@ -142,7 +143,57 @@ class RADCVMScraperRequests:
             return []
     
     def _extract_documents_from_html(self, html_content: bytes) -> List[Dict]:
-        """Extrai documentos do HTML da resposta"""
+        """Extrai documentos do HTML da resposta (lxml quando disponível)"""
+        if grid_parser.LXML_AVAILABLE:
+            try:
+                return self._extract_documents_from_html_fast(html_content)
+            except Exception as e:
+                self.logger.debug(f"Parser rápido falhou, usando BeautifulSoup: {e}")
+        return self._extract_documents_from_html_soup(html_content)
+    
+    def _extract_documents_from_html_fast(self, html_content: bytes) -> List[Dict]:
+        """Extrai documentos da grade de resultados com lxml e XPath pré-compilados"""
+        documents = []
+        root = grid_parser.parse_html(html_content)
+        
+        for table in grid_parser.XPATH_TABLES(root):
+            # Verifica se é a tabela de resultados
+            headers = grid_parser.XPATH_TH(table) or grid_parser.XPATH_TD(table)
+            if not headers:
+                continue
+            
+            header_text = ' '.join([grid_parser.cell_text(h).lower() for h in headers[:10]])
+            
+            if 'empresa' in header_text and 'categoria' in header_text:
+                self.logger.info("Encontrada tabela de resultados")
+                
+                for row in grid_parser.XPATH_ROWS(table)[1:]:  # Pula cabeçalho
+                    cells = grid_parser.XPATH_TD_TH(row)
+                    if len(cells) >= 6:
+                        texts = [grid_parser.cell_text(cell) for cell in cells]
+                        document = {
+                            'codigo_cvm': texts[0],
+                            'empresa': texts[1],
+                            'categoria': texts[2],
+                            'tipo': texts[3],
+                            'especie': texts[4],
+                            'data_referencia': texts[5],
+                            'data_entrega': texts[6] if len(texts) > 6 else '',
+                            'status': texts[7] if len(texts) > 7 else '',
+                            'versao': texts[8] if len(texts) > 8 else '',
+                            'modalidade': texts[9] if len(texts) > 9 else '',
+                            'scraped_at': datetime.now().isoformat()
+                        }
+                        
+                        # Só adiciona se tiver dados válidos
+                        if document['empresa'] and document['categoria']:
+                            documents.append(document)
+                break
+        
+        return documents
+    
+    def _extract_documents_from_html_soup(self, html_content: bytes) -> List[Dict]:
+        """Extrai documentos do HTML da resposta com BeautifulSoup"""
         documents = []
         
         try:
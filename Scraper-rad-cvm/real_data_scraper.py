@@ -15,6 +15,7 @@ import re
 from urllib.parse import urljoin, parse_qs, urlparse
 import json
 from database import DatabaseManager
+import grid_parser
 
 class RealRADCVMScraper:
     """Scraper real para o portal RAD CVM"""
@@ -173,7 +174,80 @@ class RealRADCVMScraper:
             return []
     
     def _extract_documents_from_response(self, html_content: bytes) -> List[Dict]:
-        """Extrai documentos do HTML da resposta"""
+        """Extrai documentos do HTML da resposta (lxml quando disponível)"""
+        if grid_parser.LXML_AVAILABLE:
+            try:
+                documents = self._extract_documents_from_response_fast(html_content)
+                self.logger.info(f"Extraídos {len(documents)} documentos da resposta")
+                return documents
+            except Exception as e:
+                self.logger.debug(f"Parser rápido falhou, usando BeautifulSoup: {e}")
+        return self._extract_documents_from_response_soup(html_content)
+    
+    def _extract_documents_from_response_fast(self, html_content: bytes) -> List[Dict]:
+        """Extrai documentos da grade de resultados com lxml e XPath pré-compilados"""
+        documents = []
+        root = grid_parser.parse_html(html_content)
+        
+        # Procura pela tabela de resultados
+        table = grid_parser.find_grid_table(root)
+        if table is None:
+            # Procura por qualquer tabela com colunas típicas de documentos
+            for t in grid_parser.XPATH_TABLES(root):
+                rows = grid_parser.XPATH_ROWS(t)
+                if len(rows) > 3:
+                    header_text = ' '.join(cell.text_content() for cell in grid_parser.XPATH_TD_TH(rows[0]))
+                    if any(word in header_text.lower() for word in ['código', 'empresa', 'categoria', 'data']):
+                        table = t
+                        break
+        
+        if table is None:
+            self.logger.warning("Tabela de documentos não encontrada")
+            return documents
+        
+        download_title = re.compile(r'download', re.I)
+        assunto_pattern = re.compile(r'Assunto\\(s\\):')
+        
+        # Processa linhas de dados (pula cabeçalho)
+        for row in grid_parser.XPATH_ROWS(table)[1:]:
+            cells = grid_parser.XPATH_TD(row)
+            if len(cells) >= 7:  # Mínimo de colunas esperadas
+                texts = [grid_parser.cell_text(cell) for cell in cells]
+                
+                download_url = ''
+                download_link = grid_parser.find_link_by_title(row, download_title)
+                if download_link is not None:
+                    download_url = download_link.get('href', '')
+                
+                assunto = ''
+                assunto_cell = grid_parser.find_td_with_string(row, assunto_pattern)
+                if assunto_cell is not None:
+                    assunto = assunto_cell.text_content().replace('Assunto(s):', '').strip()
+                
+                document = {
+                    'codigo_cvm': texts[0],
+                    'empresa': texts[1],
+                    'categoria': texts[2],
+                    'tipo': texts[3],
+                    'especie': texts[4],
+                    'data_referencia': texts[5],
+                    'data_entrega': texts[6],
+                    'status': texts[7] if len(texts) > 7 else '',
+                    'versao': texts[8] if len(texts) > 8 else '1',
+                    'modalidade': texts[9] if len(texts) > 9 else '',
+                    'download_url': download_url,
+                    'assunto': assunto,
+                    'scraped_at': datetime.now().isoformat()
+                }
+                
+                # Só adiciona se tiver dados válidos
+                if document['empresa'] and document['categoria']:
+                    documents.append(document)
+        
+        return documents
+    
+    def _extract_documents_from_response_soup(self, html_content: bytes) -> List[Dict]:
+        """Extrai documentos do HTML da resposta com BeautifulSoup"""
         documents = []
         
         try:
@@ -321,7 +395,8 @@ class RealRADCVMScraper:
                 self.logger.error("Erro ao conectar ao banco de dados")
                 return 0
             
-            saved_count = 0
+            empresas = {}
+            documentos = []
             
             for doc in documents:
                 try:
@@ -360,24 +435,24 @@ class RealRADCVMScraper:
                     except:
                         doc_data['versao'] = 1
                     
-                    # Salva empresa
-                    empresa_data = {
+                    # Acumula empresa e documento para a gravação em lote
+                    empresas[doc_data['codigo_cvm']] = {
                         'codigo_cvm': doc_data['codigo_cvm'],
                         'nome': doc_data['empresa'],
                         'setor': '',
                         'situacao': 'Ativo'
                     }
-                    self.db.insert_empresa(empresa_data)
-                    
-                    # Salva documento
-                    documento_id = self.db.insert_documento(doc_data)
-                    if documento_id:
-                        saved_count += 1
+                    documentos.append(doc_data)
                         
                 except Exception as e:
-                    self.logger.error(f"Erro ao salvar documento: {e}")
+                    self.logger.error(f"Erro ao preparar documento: {e}")
                     continue
             
+            # Empresas primeiro (chave estrangeira), cada lote em uma única transação
+            self.db.insert_empresas_many(list(empresas.values()))
+            documento_ids = self.db.insert_documentos_many(documentos)
+            saved_count = len(documento_ids)
+            
             self.db.disconnect()
             self.logger.info(f"Salvos {saved_count} documentos no banco")
             return saved_count
@@ -458,4 +533,5 @@ if __name__ == "__main__":
         print(f"\n✗ Erro durante o teste: {e}")
         import traceback
         traceback.print_exc()
-
+    finally:
+        scraper.db.close()
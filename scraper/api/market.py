@@ -100,9 +100,11 @@ def get_quotes():
     
     quotes_data = []
     
+    # Try to fetch real data first (single batched cache/API lookup for all tickers)
+    fetched_quotes = data_fetcher.fetch_quotes(tickers)
+    
     for ticker in tickers:
-        # Try to fetch real data first
-        quote_data = data_fetcher.fetch_quote(ticker)
+        quote_data = fetched_quotes.get(ticker)
         
         if quote_data:
             quotes_data.append(quote_data)
@@ -153,11 +155,17 @@ def get_quote_history(ticker):
     if not valid:
         return jsonify({'error': error}), 400
     
-    # Fetch historical data
-    historical_data = data_fetcher.fetch_historical_data(ticker, period, interval)
+    # Serve locally aggregated intraday bars first; daily prices come from the history store
+    historical_data = data_fetcher.fetch_bars(ticker, period, interval)
+    source = 'bars'
+    
+    if not historical_data:
+        historical_data = data_fetcher.fetch_historical_data(ticker, period, interval, adjusted)
+        source = 'history'
     
     if not historical_data:
         # Mock historical data structure
+        source = 'mock'
         historical_data = [
             {
                 'date': int((datetime.now() - timedelta(days=i)).timestamp()),
@@ -178,12 +186,40 @@ def get_quote_history(ticker):
         'adjusted': adjusted,
         'historical_data': historical_data,
         'metadata': {
+            'source': source,
             'data_points': len(historical_data),
             'first_date': historical_data[0]['date'] if historical_data else None,
             'last_date': historical_data[-1]['date'] if historical_data else None
         }
     })
 
+@market_bp.route('/screener', methods=['GET'])
+@require_api_key
+@apply_rate_limit
+def screen_assets():
+    """
+    Screener sobre todo o universo de ativos
+    
+    Parâmetros:
+    - filter: expressão, ex. "rsi < 30 and pl < 8 and margem_liquida > 10%"
+      (10% vale 0.1 nos índices e 10 em variacao e rsi, já armazenados em pontos percentuais)
+    - sort: campo de ordenação ("-campo" para decrescente)
+    - limit: máximo de resultados (padrão 50, máximo 500)
+    - fields: campos retornados, separados por vírgula (padrão: os usados no filtro e na ordenação)
+    """
+    expression = request.args.get('filter', '')
+    sort = request.args.get('sort')
+    fields = [name.strip() for name in request.args.get('fields', '').split(',') if name.strip()]
+    
+    try:
+        limit = int(request.args.get('limit', 50))
+        result = data_fetcher.screener.screen(db.session, expression, sort, limit, fields or None)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    result.update({'filter': expression, 'sort': sort})
+    return jsonify(result)
+
 @market_bp.route('/indices', methods=['GET'])
 @require_api_key
 @apply_rate_limit
@@ -2,6 +2,7 @@ from flask import Blueprint, request
 from flask_socketio import emit, join_room, leave_room, disconnect
 from utils.auth import validate_api_key
 from services.data_fetcher import data_fetcher
+from services.tick_store import tick_store, intraday_summary, window_to_records
 from app import socketio, redis_client
 import json
 import asyncio
@@ -15,6 +16,9 @@ streaming_bp = Blueprint('streaming', __name__)
 active_connections = {}
 subscription_rooms = {}
 
+# Recent ticks sent to a client when it subscribes to a ticker
+TICK_HISTORY_SIZE = 300
+
 @socketio.on('connect')
 def on_connect():
     """Handle client connection"""
@@ -117,12 +121,23 @@ def on_subscribe_quotes(data):
     })
     
     # Send initial quote data
+    initial_quotes = data_fetcher.fetch_quotes(valid_tickers)
     for ticker in valid_tickers:
-        quote_data = data_fetcher.fetch_quote(ticker)
+        quote_data = initial_quotes.get(ticker)
         if quote_data:
             emit('quote_update', {
                 'ticker': ticker,
                 'data': quote_data,
+                'indicators': data_fetcher.indicators.snapshot(ticker),
+                'timestamp': datetime.now().isoformat()
+            })
+        
+        # Send recent intraday ticks from the in-process tick store
+        ticks = tick_store.window(ticker, TICK_HISTORY_SIZE)
+        if ticks is not None and ticks.shape[1]:
+            emit('tick_history', {
+                'ticker': ticker,
+                'ticks': window_to_records(ticks),
                 'timestamp': datetime.now().isoformat()
             })
 
@@ -281,19 +296,27 @@ def background_data_updater():
     while True:
         try:
             # Update quotes for all subscribed tickers
-            for room_name, connection_ids in subscription_rooms.items():
-                if room_name.startswith('quotes_') and connection_ids:
-                    ticker = room_name.replace('quotes_', '')
-                    
-                    # Fetch fresh quote data
-                    quote_data = data_fetcher.fetch_quote(ticker)
-                    
-                    if quote_data:
-                        socketio.emit('quote_update', {
-                            'ticker': ticker,
-                            'data': quote_data,
-                            'timestamp': datetime.now().isoformat()
-                        }, room=room_name)
+            quote_rooms = {
+                room_name.replace('quotes_', ''): room_name
+                for room_name, connection_ids in list(subscription_rooms.items())
+                if room_name.startswith('quotes_') and connection_ids
+            }
+            
+            # Fetch fresh quote data for every ticker in one batch
+            fresh_quotes = data_fetcher.fetch_quotes(list(quote_rooms)) if quote_rooms else {}
+            
+            for ticker, room_name in quote_rooms.items():
+                quote_data = fresh_quotes.get(ticker)
+                
+                if quote_data:
+                    ticks = tick_store.window(ticker)
+                    socketio.emit('quote_update', {
+                        'ticker': ticker,
+                        'data': quote_data,
+                        'intraday': intraday_summary(ticks) if ticks is not None else None,
+                        'indicators': data_fetcher.indicators.snapshot(ticker),
+                        'timestamp': datetime.now().isoformat()
+                    }, room=room_name)
             
             # Wait before next update
             time.sleep(5)  # Update every 5 seconds
@@ -328,6 +351,7 @@ def get_streaming_info():
                 'subscribed',
                 'unsubscribed',
                 'quote_update',
+                'tick_history',
                 'orderbook_update',
                 'trade_update',
                 'connection_info',
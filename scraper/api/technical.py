@@ -4,6 +4,7 @@ from utils.rate_limiter import apply_rate_limit
 from utils.validators import validate_ticker
 from services.data_fetcher import data_fetcher
 from services.calculations import financial_calc
+from services.tick_store import tick_store, intraday_summary, window_to_records
 from datetime import datetime
 
 technical_bp = Blueprint('technical', __name__)
@@ -103,8 +104,19 @@ def get_support_resistance(ticker):
     lows = [float(item.get('low', 0)) for item in historical_data if item.get('low')]
     closes = [float(item.get('close', 0)) for item in historical_data if item.get('close')]
     
-    # Calculate support and resistance
-    support_resistance = financial_calc.calculate_support_resistance(closes, window)
+    # Calculate support and resistance: pivot levels from the stored daily history,
+    # or from the closes when there is no history for the ticker
+    analysis = data_fetcher.levels.analyze(ticker, closes[-1] if closes else None)
+    if analysis:
+        support_resistance = {
+            'support_levels': [level['level'] for level in analysis['support_levels']],
+            'resistance_levels': [level['level'] for level in analysis['resistance_levels']],
+            'current_price': analysis['current_price'],
+            'analysis_period': window,
+            'levels': analysis['key_levels']
+        }
+    else:
+        support_resistance = financial_calc.calculate_support_resistance(closes, window)
     
     # Add pivot points calculation
     if len(highs) > 0 and len(lows) > 0 and len(closes) > 0:
@@ -136,6 +148,45 @@ def get_support_resistance(ticker):
     
     return jsonify(support_resistance)
 
+@technical_bp.route('/technical-analysis/<ticker>/intraday', methods=['GET'])
+@require_api_key
+@apply_rate_limit
+def get_intraday_analysis(ticker):
+    """Análise intradiária a partir dos ticks em memória"""
+    valid, error = validate_ticker(ticker)
+    if not valid:
+        return jsonify({'error': error}), 400
+    
+    ticker = ticker.upper()
+    minutes = request.args.get('minutes', type=int)
+    include_ticks = request.args.get('include_ticks', 'false').lower() == 'true'
+    
+    # Seed the buffer on a cold worker. Only upstream fetches append ticks, so a quote
+    # served from the cache is appended here (repeated timestamps are dropped)
+    if tick_store.buffer(ticker) is None:
+        quote = data_fetcher.fetch_quotes([ticker]).get(ticker)
+        if quote:
+            tick_store.append_quote(quote)
+    
+    if minutes:
+        ticks = tick_store.since(ticker, datetime.now().timestamp() - minutes * 60)
+    else:
+        ticks = tick_store.window(ticker)
+    
+    if ticks is None or not ticks.shape[1]:
+        return jsonify({'error': 'No intraday ticks available for this ticker'}), 404
+    
+    result = {
+        'ticker': ticker,
+        'analysis_date': datetime.now().isoformat(),
+        'window_minutes': minutes,
+        'intraday': intraday_summary(ticks)
+    }
+    if include_ticks:
+        result['ticks'] = window_to_records(ticks)
+    
+    return jsonify(result)
+
 @technical_bp.route('/technical-analysis/<ticker>/patterns', methods=['GET'])
 @require_api_key
 @apply_rate_limit
@@ -1,7 +1,9 @@
 from flask import Blueprint, request, jsonify
 from auth import require_api_key, optional_api_key
 from utils import create_response, create_error_response, parse_tickers
-from models import Ticker, TechnicalIndicator
+from models import Ticker
+from models_extended import TechnicalIndicator
+from datetime import datetime, timedelta
 import logging
 
 logger = logging.getLogger(__name__)
@@ -13,21 +15,31 @@ technical_bp = Blueprint('technical_analysis', __name__)
 def get_technical_indicators(ticker):
     """
     GET /technical-analysis/{ticker}/indicators
-    Indicadores técnicos (SMA, EMA, RSI, MACD, Bollinger)
+    Indicadores técnicos (SMA, EMA, RSI, MACD, Bollinger, ATR, OBV)
+    
+    Parâmetros:
+    - date: pregão desejado (YYYY-MM-DD); sem data, o mais recente.
+      Sem pregão na data, vale o último anterior a ela
     """
     try:
-        indicators = request.args.get('indicators', 'sma,ema,rsi,macd,bollinger')
+        indicators = request.args.get('indicators', 'sma,ema,rsi,macd,bollinger,atr,obv')
         period = int(request.args.get('period', 20))
+        as_of = request.args.get('date')
         
         ticker_obj = Ticker.query.filter_by(symbol=ticker.upper()).first()
         
         if not ticker_obj:
             return create_error_response("Ticker not found", 404)
         
-        # Buscar indicadores técnicos mais recentes
-        latest_indicator = TechnicalIndicator.query.filter_by(
-            ticker_id=ticker_obj.id
-        ).order_by(TechnicalIndicator.indicator_date.desc()).first()
+        # Séries gravadas por services/indicator_engine.py; com data, o último pregão até ela
+        query = TechnicalIndicator.query.filter_by(ticker=ticker.upper())
+        if as_of:
+            try:
+                day_end = datetime.strptime(as_of, '%Y-%m-%d') + timedelta(days=1)
+            except ValueError:
+                return create_error_response("Invalid date parameter, use YYYY-MM-DD", 400)
+            query = query.filter(TechnicalIndicator.indicator_date < day_end)
+        latest_indicator = query.order_by(TechnicalIndicator.indicator_date.desc()).first()
         
         if not latest_indicator:
             return create_error_response("Technical indicators not available for this ticker", 404)
@@ -38,6 +50,7 @@ def get_technical_indicators(ticker):
         indicators_data = {
             "ticker": ticker.upper(),
             "date": latest_indicator.indicator_date.isoformat(),
+            "close": latest_indicator.close,
             "indicators": {}
         }
         
@@ -52,7 +65,9 @@ def get_technical_indicators(ticker):
         # Médias móveis exponenciais
         if 'ema' in requested_indicators:
             indicators_data["indicators"].update({
+                "ema_12": latest_indicator.ema_12,
                 "ema_20": latest_indicator.ema_20,
+                "ema_26": latest_indicator.ema_26,
                 "ema_50": latest_indicator.ema_50
             })
         
@@ -76,6 +91,13 @@ def get_technical_indicators(ticker):
                 "lower": latest_indicator.bb_lower
             }
         
+        # Volatilidade (ATR 14) e volume acumulado (OBV)
+        if 'atr' in requested_indicators:
+            indicators_data["indicators"]["atr"] = latest_indicator.atr
+        
+        if 'obv' in requested_indicators:
+            indicators_data["indicators"]["obv"] = latest_indicator.obv
+        
         # Análise dos sinais
         signals = []
         
@@ -108,75 +130,41 @@ def get_technical_indicators(ticker):
 def get_support_resistance(ticker):
     """
     GET /technical-analysis/{ticker}/support-resistance
-    Níveis de suporte e resistência
+    Níveis de suporte e resistência a partir de pivôs (topos e fundos) agrupados
+    
+    Parâmetros:
+    - timeframes: 1d, 1wk e/ou 1mo separados por vírgula (padrão: todos)
+    - limit: níveis de cada lado do preço atual (padrão: 5)
     """
     try:
-        ticker_obj = Ticker.query.filter_by(symbol=ticker.upper()).first()
-        
-        if not ticker_obj:
-            return create_error_response("Ticker not found", 404)
-        
-        # Buscar cotações recentes para calcular suporte e resistência
-        from models import Quote
-        
-        recent_quotes = Quote.query.filter_by(
-            ticker_id=ticker_obj.id
-        ).order_by(Quote.quote_datetime.desc()).limit(60).all()
-        
-        if not recent_quotes:
-            return create_error_response("Insufficient price data for analysis", 404)
-        
-        # Calcular níveis de suporte e resistência baseados em máximas e mínimas
-        prices = [quote.price for quote in recent_quotes if quote.price]
-        highs = [quote.high_price for quote in recent_quotes if quote.high_price]
-        lows = [quote.low_price for quote in recent_quotes if quote.low_price]
-        
-        if not prices or not highs or not lows:
+        from services.data_fetcher import data_fetcher
+        from services.support_resistance import TIMEFRAMES
+        from services.tick_store import tick_store
+        
+        ticker = ticker.upper()
+        timeframes = [tf.strip() for tf in request.args.get('timeframes', ','.join(TIMEFRAMES)).split(',') if tf.strip()]
+        invalid = [tf for tf in timeframes if tf not in TIMEFRAMES]
+        if invalid:
+            return create_error_response(f"Invalid timeframes: {', '.join(invalid)}", 400)
+        limit = int(request.args.get('limit', 5))
+        
+        # Preço ao vivo quando houver ticks; senão, o último fechamento do histórico
+        buffer = tick_store.buffer(ticker)
+        last_tick = buffer.last() if buffer is not None else None
+        current_price = last_tick['price'] if last_tick and last_tick['price'] == last_tick['price'] else None
+        
+        # Níveis em cache até o próximo pregão, calculados sobre o histórico diário ajustado
+        support_resistance_data = data_fetcher.levels.analyze(ticker, current_price, timeframes, limit)
+        
+        if not support_resistance_data:
             return create_error_response("Insufficient price data for analysis", 404)
         
-        current_price = prices[0]
-        
-        # Calcular níveis de resistência (máximas significativas)
-        resistance_levels = []
-        sorted_highs = sorted(set(highs), reverse=True)
-        
-        for level in sorted_highs[:3]:  # Top 3 resistance levels
-            if level > current_price:
-                distance_percent = ((level - current_price) / current_price) * 100
-                resistance_levels.append({
-                    "level": round(level, 2),
-                    "type": "resistance",
-                    "strength": "strong" if level in sorted_highs[:1] else "moderate",
-                    "distance_percent": round(distance_percent, 2),
-                    "touches": highs.count(level)
-                })
-        
-        # Calcular níveis de suporte (mínimas significativas)
-        support_levels = []
-        sorted_lows = sorted(set(lows))
-        
-        for level in sorted_lows[:3]:  # Bottom 3 support levels
-            if level < current_price:
-                distance_percent = ((current_price - level) / current_price) * 100
-                support_levels.append({
-                    "level": round(level, 2),
-                    "type": "support",
-                    "strength": "strong" if level in sorted_lows[:1] else "moderate",
-                    "distance_percent": round(distance_percent, 2),
-                    "touches": lows.count(level)
-                })
-        
-        support_resistance_data = {
-            "ticker": ticker.upper(),
-            "current_price": current_price,
-            "analysis_date": recent_quotes[0].quote_datetime.isoformat() + "Z",
-            "support_levels": support_levels,
-            "resistance_levels": resistance_levels,
-            "key_levels": support_levels + resistance_levels
-        }
+        support_resistance_data["analysis_date"] = datetime.utcnow().isoformat() + "Z"
         
         return create_response(data=support_resistance_data)
         
+    except ValueError:
+        return create_error_response("Invalid limit parameter", 400)
     except Exception as e:
         logger.error(f"Error calculating support/resistance for {ticker}: {str(e)}")
         return create_error_response("Failed to calculate support and resistance levels", 500)
@@ -253,4 +253,40 @@ class FinancialIndicators(db.Model):
     
     __table_args__ = (
         db.Index('idx_indicators_cvm_year', 'cvm_code', 'year'),
-    )
\ No newline at end of file
+    )
+
+# Indicadores técnicos diários (séries completas, calculadas em lote por services/indicator_engine.py)
+class TechnicalIndicator(db.Model):
+    __tablename__ = 'technical_indicators'
+    
+    id = Column(Integer, primary_key=True)
+    ticker = Column(String(10), nullable=False, index=True)
+    indicator_date = Column(DateTime, nullable=False, index=True)
+    close = Column(Float)
+    
+    # Médias móveis
+    sma_20 = Column(Float)
+    sma_50 = Column(Float)
+    sma_200 = Column(Float)
+    ema_12 = Column(Float)
+    ema_20 = Column(Float)
+    ema_26 = Column(Float)
+    ema_50 = Column(Float)
+    
+    # Osciladores
+    rsi = Column(Float)  # RSI 14 (Wilder)
+    macd_line = Column(Float)
+    macd_signal = Column(Float)
+    macd_histogram = Column(Float)
+    
+    # Volatilidade e volume
+    bb_upper = Column(Float)
+    bb_middle = Column(Float)
+    bb_lower = Column(Float)
+    atr = Column(Float)  # ATR 14 (Wilder)
+    obv = Column(Float)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.UniqueConstraint('ticker', 'indicator_date', name='uq_technical_ticker_date'),
+    )
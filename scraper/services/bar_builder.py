@@ -0,0 +1,399 @@
+"""
+OHLCV bar aggregation over quote snapshots.
+
+Bars are built at several resolutions both incrementally (BarBuilder.on_tick, fed by
+the tick store) and in bulk (backfill_from_quotes, a vectorized resample of the
+`quotes` table). They are stored in Redis as packed fixed-size records (BAR_DTYPE,
+32 bytes per bar), one string key per ticker/resolution/partition:
+
+    bars:{resolution}:{ticker}:{YYYYMMDD}   intraday resolutions, one key per session day
+    bars:1d:{ticker}:{YYYY}                 daily bars, one key per year
+
+Live bars from every process are merged into their partition by a Lua script
+(MERGE_BARS_SCRIPT): a record with the start of one of the last stored bars updates it
+in place (first open, max high, min low, latest close) and any other record is appended.
+Live records carry the cumulative session volume of their last tick instead of a traded
+volume, so workers that saw different snapshots never count the same volume twice:
+
+    1d          bar volume is the largest cumulative volume of the session
+    intraday    a bar gets the part of the cumulative volume above the session volume
+                already counted, kept in bars:{resolution}:{ticker}:{YYYYMMDD}:counted
+
+Readers keep the last record per bar start, so a backfill over live data is not duplicated.
+
+Usage (backfill from collected quotes):
+    python -m services.bar_builder --days 30
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BAR_DTYPE = np.dtype([
+    ('start', '<i8'),
+    ('open', '<f4'),
+    ('high', '<f4'),
+    ('low', '<f4'),
+    ('close', '<f4'),
+    ('volume', '<i8'),
+])
+
+RESOLUTIONS = {
+    '1m': 60,
+    '5m': 300,
+    '15m': 900,
+    '30m': 1800,
+    '1h': 3600,
+    '1d': 86400,
+}
+
+# Seconds each resolution is kept in Redis (daily bars never expire)
+RETENTION = {
+    '1m': 30 * 86400,
+    '5m': 90 * 86400,
+    '15m': 180 * 86400,
+    '30m': 180 * 86400,
+    '1h': 730 * 86400,
+    '1d': None,
+}
+
+PERIOD_DAYS = {'1d': 1, '5d': 5, '1m': 30, '3m': 90, '6m': 180, '1y': 365, '2y': 730, '5y': 1825}
+
+# B3 trades in America/Sao_Paulo, which has had no daylight saving time since 2019
+MARKET_TZ = timezone(timedelta(hours=-3))
+MARKET_UTC_OFFSET = -3 * 3600
+
+FLUSH_INTERVAL = 5.0          # Max seconds between writes of pending bars
+MERGE_LOOKBACK = 64           # Stored bars searched (from the end) for the start of a merged record
+
+# KEYS[1] partition, KEYS[2] counted session volume (intraday only);
+# ARGV[1] packed BAR_DTYPE records with cumulative volumes, ARGV[2] ttl (0 keeps it), ARGV[3] lookback
+MERGE_BARS_SCRIPT = """
+local size = 32
+local records = ARGV[1]
+local counted = nil
+if #KEYS > 1 then
+    counted = tonumber(redis.call('GET', KEYS[2]) or '0')
+end
+for offset = 1, #records, size do
+    local start, open, high, low, close, cumulative =
+        struct.unpack('<i8ffffi8', string.sub(records, offset, offset + size - 1))
+    local traded = cumulative
+    if counted then
+        traded = math.max(cumulative - counted, 0)
+        counted = math.max(counted, cumulative)
+    end
+    local position = redis.call('STRLEN', KEYS[1]) - size
+    local scanned = 0
+    local merged = false
+    while position >= 0 and scanned < tonumber(ARGV[3]) do
+        local s_start, s_open, s_high, s_low, s_close, s_volume =
+            struct.unpack('<i8ffffi8', redis.call('GETRANGE', KEYS[1], position, position + size - 1))
+        if s_start == start then
+            local volume = counted and s_volume + traded or math.max(s_volume, traded)
+            redis.call('SETRANGE', KEYS[1], position, struct.pack('<i8ffffi8', start, s_open,
+                math.max(s_high, high), math.min(s_low, low), close, volume))
+            merged = true
+            break
+        elseif s_start < start then
+            break
+        end
+        position = position - size
+        scanned = scanned + 1
+    end
+    if not merged then
+        redis.call('APPEND', KEYS[1], struct.pack('<i8ffffi8', start, open, high, low, close, traded))
+    end
+end
+local ttl = tonumber(ARGV[2])
+if ttl > 0 then
+    redis.call('EXPIRE', KEYS[1], ttl)
+end
+if counted then
+    if ttl > 0 then
+        redis.call('SET', KEYS[2], counted, 'EX', ttl)
+    else
+        redis.call('SET', KEYS[2], counted)
+    end
+end
+return 1
+"""
+
+def bucket_start(timestamps, seconds: int):
+    """Start (epoch seconds) of the bar containing each timestamp, aligned to B3 local time"""
+    local = np.asarray(timestamps, dtype=np.int64) + MARKET_UTC_OFFSET
+    return local // seconds * seconds - MARKET_UTC_OFFSET
+
+def _partition(start: int, resolution: str) -> str:
+    day = datetime.fromtimestamp(int(start), MARKET_TZ)
+    return day.strftime('%Y') if resolution == '1d' else day.strftime('%Y%m%d')
+
+def _partitions_between(start: float, end: float, resolution: str) -> List[str]:
+    first = datetime.fromtimestamp(start, MARKET_TZ).date()
+    last = datetime.fromtimestamp(end, MARKET_TZ).date()
+    if resolution == '1d':
+        return [str(year) for year in range(first.year, last.year + 1)]
+    return [(first + timedelta(days=offset)).strftime('%Y%m%d') for offset in range((last - first).days + 1)]
+
+def bar_key(resolution: str, ticker: str, partition: str) -> str:
+    return f"bars:{resolution}:{ticker.upper()}:{partition}"
+
+def traded_volume(timestamps, cumulative_volume):
+    """
+    Volume traded at each snapshot. Snapshots carry the cumulative session volume, so it
+    is the difference to the previous snapshot of the same session; the first snapshot
+    of a session (or a counter reset) contributes its whole cumulative volume
+    """
+    cumulative = np.nan_to_num(np.asarray(cumulative_volume, dtype=np.float64))
+    day = bucket_start(timestamps, 86400)
+    traded = cumulative.copy()
+    if cumulative.size > 1:
+        delta = np.diff(cumulative)
+        same_session = (day[1:] == day[:-1]) & (delta >= 0)
+        traded[1:] = np.where(same_session, delta, cumulative[1:])
+    return traded
+
+def resample(timestamps, prices, volumes, seconds: int, highs=None, lows=None, opens=None) -> np.ndarray:
+    """
+    Vectorized OHLCV resampling of time-sorted snapshots into bars of `seconds`.
+    volumes is the volume traded at each snapshot (see traded_volume). When the rows
+    carry their own open/high/low (daily rows, session extremes) they are used instead
+    of the snapshot prices.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    prices = np.asarray(prices, dtype=np.float64)
+    if timestamps.size == 0:
+        return np.empty(0, dtype=BAR_DTYPE)
+
+    starts = bucket_start(timestamps, seconds)
+    first = np.concatenate(([0], np.flatnonzero(np.diff(starts)) + 1))
+    last = np.concatenate((first[1:], [timestamps.size])) - 1
+
+    highs = prices if highs is None else np.fmax(np.asarray(highs, dtype=np.float64), prices)
+    lows = prices if lows is None else np.fmin(np.asarray(lows, dtype=np.float64), prices)
+    opens = prices if opens is None else np.where(np.asarray(opens, dtype=np.float64) > 0, opens, prices)
+
+    bars = np.empty(first.size, dtype=BAR_DTYPE)
+    bars['start'] = starts[first]
+    bars['open'] = opens[first]
+    bars['high'] = np.maximum.reduceat(highs, first)
+    bars['low'] = np.minimum.reduceat(lows, first)
+    bars['close'] = prices[last]
+    bars['volume'] = np.add.reduceat(np.asarray(volumes, dtype=np.float64), first)
+    return bars
+
+def _dedupe(bars: np.ndarray) -> np.ndarray:
+    """Keep the last written record for each bar start, sorted by start"""
+    if bars.size < 2:
+        return bars
+    reversed_starts = bars['start'][::-1]
+    _, index = np.unique(reversed_starts, return_index=True)
+    return bars[bars.size - 1 - index]
+
+def bars_to_records(bars: np.ndarray) -> List[Dict]:
+    """Bars in the historicalDataPrice layout used by the history endpoint"""
+    return [
+        {
+            'date': int(start),
+            'open': round(float(open_), 4),
+            'high': round(float(high), 4),
+            'low': round(float(low), 4),
+            'close': round(float(close), 4),
+            'volume': int(volume),
+        }
+        for start, open_, high, low, close, volume in bars.tolist()
+    ]
+
+class BarStore:
+    """Reads and writes packed bars in Redis"""
+
+    def __init__(self, redis_client):
+        self.redis = redis_client
+
+    def merge(self, pipeline, resolution: str, ticker: str, bars: np.ndarray) -> None:
+        """
+        Queue live bars (volume = cumulative session volume at their last tick) on a
+        pipeline, merged into the stored bars with the same start
+        """
+        retention = RETENTION[resolution] or 0
+        partitions = np.array([_partition(start, resolution) for start in bars['start'].tolist()])
+        for partition in np.unique(partitions).tolist():
+            key = bar_key(resolution, ticker, partition)
+            keys = [key] if resolution == '1d' else [key, f"{key}:counted"]
+            pipeline.eval(MERGE_BARS_SCRIPT, len(keys), *keys, bars[partitions == partition].tobytes(),
+                          retention, MERGE_LOOKBACK)
+
+    def replace(self, resolution: str, ticker: str, bars: np.ndarray) -> None:
+        """Overwrite the partitions covered by bars (backfill)"""
+        if bars.size == 0:
+            return
+        pipeline = self.redis.pipeline(transaction=False)
+        retention = RETENTION[resolution]
+        partitions = np.array([_partition(start, resolution) for start in bars['start'].tolist()])
+        for partition in np.unique(partitions).tolist():
+            key = bar_key(resolution, ticker, partition)
+            pipeline.set(key, bars[partitions == partition].tobytes(), ex=retention)
+        pipeline.execute()
+
+    def read(self, ticker: str, resolution: str, start: float, end: Optional[float] = None) -> np.ndarray:
+        """Bars with start in [start, end], including the bar currently being built"""
+        end = end if end is not None else time.time()
+        keys = [bar_key(resolution, ticker, partition) for partition in _partitions_between(start, end, resolution)]
+        chunks = [np.frombuffer(raw, dtype=BAR_DTYPE) for raw in self.redis.mget(keys) if raw]
+        if not chunks:
+            return np.empty(0, dtype=BAR_DTYPE)
+        bars = _dedupe(np.concatenate(chunks))
+        mask = (bars['start'] >= bucket_start([start], RESOLUTIONS[resolution])[0]) & (bars['start'] <= end)
+        return bars[mask]
+
+class BarBuilder:
+    """
+    Incremental bar aggregation of live ticks, one open bar per ticker and resolution.
+    Closed and updated bars are buffered and merged in one pipeline at most every
+    FLUSH_INTERVAL seconds. The volume of a local bar is the cumulative session volume
+    of its last tick; BarStore.merge turns it into traded volume.
+    """
+
+    def __init__(self, redis_client, resolutions=tuple(RESOLUTIONS)):
+        self.store = BarStore(redis_client)
+        self.resolutions = {name: RESOLUTIONS[name] for name in resolutions}
+        self._open: Dict[tuple, np.ndarray] = {}         # (ticker, resolution) -> 1-record array
+        self._closed: Dict[tuple, List[np.ndarray]] = {}
+        self._dirty = set()
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def on_tick(self, ticker: str, timestamp: float, price: float, volume: float = np.nan,
+                bid: float = np.nan, ask: float = np.nan) -> None:
+        cumulative = int(volume) if volume == volume else 0
+        with self._lock:
+            for resolution, seconds in self.resolutions.items():
+                key = (ticker, resolution)
+                start = int(bucket_start([timestamp], seconds)[0])
+                bar = self._open.get(key)
+                if bar is not None and bar['start'][0] == start:
+                    bar['high'] = max(bar['high'][0], price)
+                    bar['low'] = min(bar['low'][0], price)
+                    bar['close'] = price
+                    bar['volume'] = max(bar['volume'][0], cumulative)
+                elif bar is None or start > bar['start'][0]:
+                    if bar is not None:
+                        self._closed.setdefault(key, []).append(bar)
+                    bar = np.array([(start, price, price, price, price, cumulative)], dtype=BAR_DTYPE)
+                    self._open[key] = bar
+                else:
+                    continue  # Tick older than the open bar
+                self._dirty.add(key)
+            due = time.monotonic() - self._last_flush >= FLUSH_INTERVAL
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            closed, self._closed = self._closed, {}
+            dirty, self._dirty = self._dirty, set()
+            pending = {key: list(bars) for key, bars in closed.items()}
+            for key in dirty:
+                pending.setdefault(key, []).append(self._open[key].copy())
+            self._last_flush = time.monotonic()
+        if not pending:
+            return
+
+        try:
+            pipeline = self.store.redis.pipeline(transaction=False)
+            for (ticker, resolution), bars in pending.items():
+                self.store.merge(pipeline, resolution, ticker, np.concatenate(bars))
+            pipeline.execute()
+        except Exception as e:
+            logger.error(f"Bar flush error: {str(e)}")
+            # Merging is idempotent, so the records simply go back to the queue
+            with self._lock:
+                for key, bars in pending.items():
+                    self._closed[key] = bars + self._closed.get(key, [])
+            return
+
+        # A closed daily bar changes the screener's latest values
+        if any(resolution == '1d' for _, resolution in closed):
+            from services.screener import publish_refresh
+            publish_refresh(self.store.redis)
+
+def backfill_from_quotes(session, store: BarStore, days: int = 30, tickers: Optional[List[str]] = None,
+                         resolutions=tuple(RESOLUTIONS)) -> Dict[str, int]:
+    """Rebuild bars from the quotes table with one query and a vectorized resample per ticker"""
+    from sqlalchemy import bindparam, text
+
+    query = """
+        SELECT ticker, quote_datetime, price, volume, open_price, high, low
+        FROM quotes
+        WHERE quote_datetime >= :since AND price > 0
+    """
+    params = {'since': datetime.utcnow() - timedelta(days=days)}
+    if tickers:
+        query += " AND ticker IN :tickers"
+        params['tickers'] = [ticker.upper() for ticker in tickers]
+    statement = text(query + " ORDER BY ticker, quote_datetime")
+    if tickers:
+        statement = statement.bindparams(bindparam('tickers', expanding=True))
+
+    rows = session.execute(statement, params).fetchall()
+    if not rows:
+        return {}
+
+    symbols = np.array([row[0] for row in rows])
+    # quote_datetime is stored in UTC without timezone
+    timestamps = np.array(
+        [row[1].replace(tzinfo=timezone.utc).timestamp() for row in rows], dtype=np.int64
+    )
+    values = np.array([row[2:] for row in rows], dtype=np.float64)
+    prices, volumes, opens, highs, lows = values.T
+
+    written = {}
+    boundaries = np.concatenate(([0], np.flatnonzero(symbols[1:] != symbols[:-1]) + 1, [len(rows)]))
+    for first, last in zip(boundaries[:-1], boundaries[1:]):
+        ticker = str(symbols[first])
+        ts = timestamps[first:last]
+        traded = traded_volume(ts, volumes[first:last])
+        for resolution in resolutions:
+            seconds = RESOLUTIONS[resolution]
+            if resolution == '1d':
+                bars = resample(ts, prices[first:last], traded, seconds,
+                                highs[first:last], lows[first:last], opens[first:last])
+            else:
+                bars = resample(ts, prices[first:last], traded, seconds)
+            store.replace(resolution, ticker, bars)
+            written[resolution] = written.get(resolution, 0) + int(bars.size)
+    return written
+
+_builder: Optional[BarBuilder] = None
+_builder_lock = threading.Lock()
+
+def get_bar_builder(redis_client) -> BarBuilder:
+    """Process-wide bar builder"""
+    global _builder
+    with _builder_lock:
+        if _builder is None:
+            _builder = BarBuilder(redis_client)
+        return _builder
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description='Rebuild OHLCV bars from the quotes table')
+    parser.add_argument('--days', type=int, default=30, help='Days of quotes to resample')
+    parser.add_argument('--tickers', nargs='*', help='Only these tickers (default: all)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    from app import app, db, redis_client
+
+    with app.app_context():
+        started = time.monotonic()
+        result = backfill_from_quotes(db.session, BarStore(redis_client), args.days, args.tickers)
+    print(json.dumps({'bars': result, 'seconds': round(time.monotonic() - started, 3)}, indent=2))
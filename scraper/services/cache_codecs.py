@@ -0,0 +1,125 @@
+import json
+import logging
+import os
+from typing import Any, Callable, Union
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # Falls back to stdlib json
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # Values are stored uncompressed
+    zstandard = None
+
+# Header byte prepended to every encoded value. Bytes below 0x20 never start a JSON
+# document, so values written before the header existed are still read as plain JSON.
+FORMAT_JSON = 0x01
+FORMAT_MSGPACK = 0x02
+FLAG_ZSTD = 0x10
+
+DEFAULT_CODEC = os.getenv('CACHE_CODEC', 'auto')
+DEFAULT_COMPRESS_THRESHOLD = int(os.getenv('CACHE_COMPRESS_THRESHOLD', '4096'))
+
+def _default_serializer(obj):
+    """Dates become ISO strings, anything else its str() (same as the previous json.dumps calls)"""
+    if hasattr(obj, 'isoformat'):
+        return obj.isoformat()
+    return str(obj)
+
+class CacheCodec:
+    """
+    Serializes cache values as [header byte][payload].
+
+    codec: 'orjson', 'msgpack', 'json' or 'auto' (orjson when installed, else json).
+    Payloads above compress_threshold bytes are zstd-compressed when zstandard is installed.
+    With binary=False (Redis client created with decode_responses=True) only the JSON
+    format without compression is written, since the client must be able to decode it as text.
+    """
+
+    def __init__(self, codec: str = DEFAULT_CODEC, compress_threshold: int = DEFAULT_COMPRESS_THRESHOLD,
+                 compression_level: int = 3, binary: bool = True,
+                 default: Callable[[Any], Any] = _default_serializer):
+        if codec == 'auto':
+            codec = 'orjson' if orjson is not None else 'json'
+        if codec == 'msgpack' and (msgpack is None or not binary):
+            logger.warning("msgpack codec unavailable for this Redis client, using JSON")
+            codec = 'orjson' if orjson is not None else 'json'
+        if codec == 'orjson' and orjson is None:
+            codec = 'json'
+
+        self.codec = codec
+        self.binary = binary
+        self.default = default
+        self.compress_threshold = compress_threshold
+        self._compressor = None
+        self._decompressor = None
+        if zstandard is not None:
+            self._compressor = zstandard.ZstdCompressor(level=compression_level)
+            self._decompressor = zstandard.ZstdDecompressor()
+
+    @classmethod
+    def for_client(cls, redis_client, **kwargs) -> 'CacheCodec':
+        """Codec matching how the Redis client returns values (bytes or decoded str)"""
+        try:
+            decode_responses = redis_client.connection_pool.connection_kwargs.get('decode_responses', False)
+        except AttributeError:
+            decode_responses = False
+        return cls(binary=not decode_responses, **kwargs)
+
+    def encode(self, value: Any) -> Union[bytes, str]:
+        if self.codec == 'msgpack':
+            fmt = FORMAT_MSGPACK
+            payload = msgpack.packb(value, default=self.default, use_bin_type=True)
+        elif self.codec == 'orjson':
+            fmt = FORMAT_JSON
+            payload = orjson.dumps(value, default=self.default, option=orjson.OPT_NON_STR_KEYS)
+        else:
+            fmt = FORMAT_JSON
+            payload = json.dumps(value, default=self.default).encode('utf-8')
+
+        if not self.binary:
+            return chr(fmt) + payload.decode('utf-8')
+
+        if self._compressor is not None and len(payload) > self.compress_threshold:
+            return bytes([fmt | FLAG_ZSTD]) + self._compressor.compress(payload)
+        return bytes([fmt]) + payload
+
+    def decode(self, raw: Union[bytes, str]) -> Any:
+        if isinstance(raw, str):
+            if raw and ord(raw[0]) == FORMAT_JSON:
+                return self._loads_json(raw[1:])
+            return json.loads(raw)
+
+        header = raw[0] if raw else None
+        if header is None or header >= 0x20:
+            return json.loads(raw)  # Written before codecs were introduced
+
+        payload = raw[1:]
+        if header & FLAG_ZSTD:
+            if self._decompressor is None:
+                raise ValueError("zstd-compressed cache value but zstandard is not installed")
+            payload = self._decompressor.decompress(payload)
+
+        fmt = header & ~FLAG_ZSTD
+        if fmt == FORMAT_MSGPACK:
+            if msgpack is None:
+                raise ValueError("msgpack cache value but msgpack is not installed")
+            return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+        if fmt == FORMAT_JSON:
+            return self._loads_json(payload)
+        raise ValueError(f"Unknown cache value header: {header:#04x}")
+
+    @staticmethod
+    def _loads_json(payload: Union[bytes, str]) -> Any:
+        if orjson is not None:
+            return orjson.loads(payload)
+        return json.loads(payload)
@@ -0,0 +1,87 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Stale-while-revalidate entries are stored as {SWR_MARKER: 1, 'value': ..., 'fresh_until': ts}.
+# The Redis TTL is the hard TTL; fresh_until marks the soft TTL.
+SWR_MARKER = '__swr__'
+HARD_TTL_FACTOR = 10          # Default hard TTL = soft TTL x factor
+REFRESH_LOCK_TTL = 15         # Seconds a worker owns the background refresh of a key
+
+def wrap(value: Any, soft_ttl: int) -> dict:
+    """Wrap a value with its soft expiration time"""
+    return {SWR_MARKER: 1, 'value': value, 'fresh_until': time.time() + soft_ttl}
+
+def unwrap(payload: Any) -> Tuple[Any, bool]:
+    """Return (value, is_stale). Plain payloads written before SWR are treated as fresh"""
+    if isinstance(payload, dict) and payload.get(SWR_MARKER) == 1:
+        return payload.get('value'), time.time() >= payload.get('fresh_until', 0)
+    return payload, False
+
+def hard_ttl_for(soft_ttl: int, hard_ttl: Optional[int] = None) -> int:
+    return hard_ttl if hard_ttl is not None else soft_ttl * HARD_TTL_FACTOR
+
+class BackgroundRefresher:
+    """
+    Runs at most one background refresh per key: per process via an in-flight set and
+    across workers via a short Redis lock. Refreshes run inside the Flask app context
+    of the caller when there is one.
+    """
+
+    def __init__(self, redis_client, max_workers: int = 4):
+        self.redis = redis_client
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='cache-refresh')
+        self._in_flight = set()
+        self._lock = threading.Lock()
+
+    def schedule(self, key: str, refresh: Callable[[], Any]) -> bool:
+        """Schedule refresh() for key unless one is already running somewhere"""
+        with self._lock:
+            if key in self._in_flight:
+                return False
+            self._in_flight.add(key)
+
+        try:
+            acquired = self.redis.set(f"refresh:{key}", 1, nx=True, ex=REFRESH_LOCK_TTL)
+        except Exception as e:
+            logger.error(f"Refresh lock error for {key}: {str(e)}")
+            acquired = False
+
+        if not acquired:
+            with self._lock:
+                self._in_flight.discard(key)
+            return False
+
+        app = self._current_app()
+        self._executor.submit(self._run, key, refresh, app)
+        return True
+
+    def _run(self, key: str, refresh: Callable[[], Any], app):
+        try:
+            if app is not None:
+                with app.app_context():
+                    refresh()
+            else:
+                refresh()
+        except Exception as e:
+            # The stale value stays in place until its hard TTL
+            logger.error(f"Background refresh failed for {key}: {str(e)}")
+        finally:
+            with self._lock:
+                self._in_flight.discard(key)
+            try:
+                self.redis.delete(f"refresh:{key}")
+            except Exception:
+                pass
+
+    @staticmethod
+    def _current_app():
+        try:
+            from flask import current_app
+            return current_app._get_current_object()
+        except Exception:
+            return None
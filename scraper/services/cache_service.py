@@ -1,41 +1,210 @@
-import json
 import logging
+from collections import Counter, defaultdict
 from datetime import datetime, timedelta
-from typing import Any, Optional
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from .cache_codecs import CacheCodec
+from .cache_policy import BackgroundRefresher, unwrap, wrap
+from .local_cache import get_invalidation_bus, l1_ttl_for, local_cache
 
 logger = logging.getLogger(__name__)
 
+# Namespaces whose keys ({namespace}:{kind}:{id}) are tagged per company or per ticker
+COMPANY_TAGGED_NAMESPACES = ('financial', 'ratios', 'company')
+TICKER_TAGGED_NAMESPACES = ('quote', 'technical', 'history')
+
+SCAN_BATCH_SIZE = 500
+
+# Atomically reads and deletes the members of a tag set, then the set itself
+INVALIDATE_TAG_SCRIPT = """
+local members = redis.call('SMEMBERS', KEYS[1])
+for i = 1, #members, 500 do
+    redis.call('UNLINK', unpack(members, i, math.min(i + 499, #members)))
+end
+redis.call('DEL', KEYS[1])
+return members
+"""
+
+# Raises a tag set's TTL to ARGV[1] without ever shortening it (EXPIRE NX/GT need Redis 7)
+EXTEND_TTL_SCRIPT = """
+local ttl = redis.call('TTL', KEYS[1])
+if ttl < tonumber(ARGV[1]) then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+"""
+
+def company_tag(company_id) -> str:
+    return f"company:{company_id}"
+
+def ticker_tag(ticker: str) -> str:
+    return f"ticker:{ticker.upper()}"
+
+def tags_for_key(key: str) -> List[str]:
+    """Tags derived from the key layout used by the specialized cache methods"""
+    parts = key.split(':')
+    if len(parts) != 3:
+        return []
+    if parts[0] in COMPANY_TAGGED_NAMESPACES:
+        return [company_tag(parts[2])]
+    if parts[0] in TICKER_TAGGED_NAMESPACES:
+        return [ticker_tag(parts[2])]
+    return []
+
 class CacheService:
     """Service for caching data using Redis"""
     
     def __init__(self, redis_client):
         self.redis = redis_client
         self.default_ttl = 3600  # 1 hour default TTL
+        self.refresher = BackgroundRefresher(redis_client)
+        self.l1 = local_cache
+        self.invalidation = get_invalidation_bus(redis_client)
+        self.codec = CacheCodec.for_client(redis_client, default=self._json_serializer)
+        self.namespace_stats = defaultdict(Counter)  # Per-worker hits/misses/sets by namespace
+    
+    @staticmethod
+    def _namespace(key: str) -> str:
+        return key.split(':', 1)[0]
     
     def get(self, key: str) -> Optional[Any]:
-        """Get value from cache"""
+        """Get value from cache (stale-while-revalidate entries are returned even if stale)"""
+        return self.get_with_state(key)[0]
+    
+    def get_with_state(self, key: str) -> Tuple[Optional[Any], bool]:
+        """Get (value, is_stale) from cache, checking the in-process L1 tier first"""
         try:
+            l1_ttl = l1_ttl_for(key)
+            stats = self.namespace_stats[self._namespace(key)]
+            if l1_ttl:
+                payload = self.l1.get(key)
+                if payload is not None:
+                    stats['hits'] += 1
+                    return unwrap(payload)
+            
             cached_value = self.redis.get(key)
             if cached_value:
-                return json.loads(cached_value)
-            return None
+                stats['hits'] += 1
+                payload = self.codec.decode(cached_value)
+                if l1_ttl:
+                    self.l1.set(key, payload, l1_ttl, len(cached_value))
+                return unwrap(payload)
+            stats['misses'] += 1
+            return None, False
         except Exception as e:
             logger.error(f"Cache get error for key {key}: {str(e)}")
-            return None
+            return None, False
+    
+    def set(self, key: str, value: Any, ttl: Optional[int] = None,
+            stale_ttl: Optional[int] = None, tags: Optional[Iterable[str]] = None) -> bool:
+        """
+        Set value in cache with TTL. With stale_ttl the entry becomes stale after ttl
+        but is kept for another stale_ttl seconds to be served while it is refreshed.
+        The key is registered under tags (plus the ones derived from its layout)
+        """
+        return self.set_many({key: value}, ttl, stale_ttl, tags)
     
-    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
-        """Set value in cache with TTL"""
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Get several values with one MGET (L1 hits skip Redis). Missing keys are omitted"""
+        keys = list(keys)
+        values = {}
+        remote_keys = []
+        
+        for key in keys:
+            payload = self.l1.get(key) if l1_ttl_for(key) else None
+            if payload is not None:
+                values[key] = unwrap(payload)[0]
+            else:
+                remote_keys.append(key)
+        
+        for key in values:
+            self.namespace_stats[self._namespace(key)]['hits'] += 1
+        
+        if not remote_keys:
+            return values
+        
+        try:
+            for key, cached_value in zip(remote_keys, self.redis.mget(remote_keys)):
+                if not cached_value:
+                    self.namespace_stats[self._namespace(key)]['misses'] += 1
+                    continue
+                self.namespace_stats[self._namespace(key)]['hits'] += 1
+                payload = self.codec.decode(cached_value)
+                l1_ttl = l1_ttl_for(key)
+                if l1_ttl:
+                    self.l1.set(key, payload, l1_ttl, len(cached_value))
+                values[key] = unwrap(payload)[0]
+        except Exception as e:
+            logger.error(f"Cache get_many error for {len(remote_keys)} keys: {str(e)}")
+        
+        return values
+    
+    def set_many(self, mapping: Dict[str, Any], ttl: Optional[int] = None,
+                 stale_ttl: Optional[int] = None, tags: Optional[Iterable[str]] = None) -> bool:
+        """Set several values (and their tag registrations) with one pipelined round trip"""
+        if not mapping:
+            return True
+        
         try:
             ttl = ttl or self.default_ttl
-            serialized_value = json.dumps(value, default=self._json_serializer)
-            return self.redis.setex(key, ttl, serialized_value)
+            hard_ttl = ttl + (stale_ttl or 0)
+            extra_tags = list(tags or [])
+            pipeline = self.redis.pipeline(transaction=False)
+            l1_entries = []
+            
+            for key, value in mapping.items():
+                payload = wrap(value, ttl) if stale_ttl else value
+                serialized_value = self.codec.encode(payload)
+                pipeline.setex(key, hard_ttl, serialized_value)
+                self.namespace_stats[self._namespace(key)]['sets'] += 1
+                
+                for tag in set(extra_tags + tags_for_key(key)):
+                    tag_key = f"tag:{tag}"
+                    pipeline.sadd(tag_key, key)
+                    # The tag set lives as long as its longest-lived member
+                    pipeline.eval(EXTEND_TTL_SCRIPT, 1, tag_key, hard_ttl)
+                
+                l1_ttl = l1_ttl_for(key)
+                if l1_ttl:
+                    l1_entries.append((key, payload, min(l1_ttl, ttl), len(serialized_value)))
+            
+            pipeline.execute()
+            
+            if l1_entries:
+                self.invalidation.publish(keys=[entry[0] for entry in l1_entries])
+                for key, payload, l1_ttl, size in l1_entries:
+                    self.l1.set(key, payload, l1_ttl, size)
+            return True
         except Exception as e:
-            logger.error(f"Cache set error for key {key}: {str(e)}")
+            logger.error(f"Cache set_many error for {len(mapping)} keys: {str(e)}")
             return False
     
+    def get_or_load(self, key: str, loader: Callable[[], Any], ttl: Optional[int] = None,
+                    stale_ttl: Optional[int] = None) -> Optional[Any]:
+        """
+        Stale-while-revalidate read. Fresh hits are returned directly; stale hits are
+        returned immediately while one background refresh runs; misses call loader().
+        A failed or empty refresh keeps the stale value until its hard TTL.
+        """
+        ttl = ttl or self.default_ttl
+        stale_ttl = stale_ttl if stale_ttl is not None else ttl
+        
+        def load_and_store():
+            value = loader()
+            if value is not None:
+                self.set(key, value, ttl, stale_ttl)
+            return value
+        
+        value, stale = self.get_with_state(key)
+        if value is not None:
+            if stale:
+                self.refresher.schedule(key, load_and_store)
+            return value
+        
+        return load_and_store()
+    
     def delete(self, key: str) -> bool:
-        """Delete key from cache"""
+        """Delete key from cache (and from every worker's L1 tier)"""
         try:
+            self.invalidation.publish(keys=[key])
             return bool(self.redis.delete(key))
         except Exception as e:
             logger.error(f"Cache delete error for key {key}: {str(e)}")
@@ -74,13 +243,32 @@ class CacheService:
             logger.error(f"Cache TTL error for key {key}: {str(e)}")
             return None
     
-    def flush_pattern(self, pattern: str) -> int:
-        """Delete all keys matching pattern"""
+    def invalidate_tag(self, tag: str) -> int:
+        """Delete every key registered under tag"""
         try:
-            keys = self.redis.keys(pattern)
+            members = self.redis.eval(INVALIDATE_TAG_SCRIPT, 1, f"tag:{tag}")
+            keys = [m.decode() if isinstance(m, bytes) else m for m in members or []]
             if keys:
-                return self.redis.delete(*keys)
+                self.invalidation.publish(keys=keys)
+            return len(keys)
+        except Exception as e:
+            logger.error(f"Cache tag invalidation error for {tag}: {str(e)}")
             return 0
+    
+    def flush_pattern(self, pattern: str) -> int:
+        """Delete all keys matching pattern, iterating with non-blocking SCAN"""
+        try:
+            self.invalidation.publish(patterns=[pattern])
+            deleted = 0
+            batch = []
+            for key in self.redis.scan_iter(match=pattern, count=SCAN_BATCH_SIZE):
+                batch.append(key)
+                if len(batch) >= SCAN_BATCH_SIZE:
+                    deleted += self.redis.unlink(*batch)
+                    batch = []
+            if batch:
+                deleted += self.redis.unlink(*batch)
+            return deleted
         except Exception as e:
             logger.error(f"Cache flush pattern error for {pattern}: {str(e)}")
             return 0
@@ -95,7 +283,9 @@ class CacheService:
                 'used_memory_human': info.get('used_memory_human', '0B'),
                 'keyspace_hits': info.get('keyspace_hits', 0),
                 'keyspace_misses': info.get('keyspace_misses', 0),
-                'keys_count': len(self.redis.keys('*'))
+                'keys_count': self.redis.dbsize(),
+                'namespaces': {ns: dict(counts) for ns, counts in self.namespace_stats.items()},
+                'local_cache': self.l1.stats()
             }
         except Exception as e:
             logger.error(f"Cache stats error: {str(e)}")
@@ -160,48 +350,23 @@ class CacheService:
         return self.get(key)
     
     def invalidate_company_data(self, company_id: int):
-        """Invalidate all cached data for a company"""
-        patterns = [
-            f"financial:*:{company_id}",
-            f"ratios:*:{company_id}",
-            f"company:*:{company_id}"
-        ]
-        
-        total_deleted = 0
-        for pattern in patterns:
-            total_deleted += self.flush_pattern(pattern)
-        
-        return total_deleted
+        """Invalidate all cached data for a company (financial:*, ratios:*, company:* keys)"""
+        return self.invalidate_tag(company_tag(company_id))
     
     def invalidate_ticker_data(self, ticker: str):
-        """Invalidate all cached data for a ticker"""
-        patterns = [
-            f"quote:*:{ticker.upper()}",
-            f"technical:*:{ticker.upper()}",
-            f"history:*:{ticker.upper()}"
-        ]
-        
-        total_deleted = 0
-        for pattern in patterns:
-            total_deleted += self.flush_pattern(pattern)
-        
-        return total_deleted
+        """Invalidate all cached data for a ticker (quote:*, technical:*, history:* keys)"""
+        return self.invalidate_tag(ticker_tag(ticker))
     
-    def warm_up_cache(self):
-        """Warm up cache with frequently accessed data"""
-        logger.info("Starting cache warm-up process")
-        
-        # This would be implemented to pre-load popular data
-        # For example: top 20 most traded stocks, major indices, etc.
-        
-        popular_tickers = ['PETR4', 'VALE3', 'ITUB4', 'BBDC4', 'WEGE3', 'MGLU3', 'JBSS3', 'SUZB3']
-        
-        # Pre-cache popular ticker data
-        for ticker in popular_tickers:
-            try:
-                # This would call the data service to load and cache the data
-                pass
-            except Exception as e:
-                logger.error(f"Error warming up cache for {ticker}: {str(e)}")
+    def warm_up_cache(self, top_n: int = 200, concurrency: int = 8, app=None) -> dict:
+        """
+        Warm up cache with the most accessed tickers, company profiles and statements
+        (see services.cache_warmup) and return the coverage report
+        """
+        from .cache_warmup import CacheWarmer, get_access_tracker
+        from .data_fetcher import data_fetcher
         
+        logger.info("Starting cache warm-up process")
+        warmer = CacheWarmer(data_fetcher, get_access_tracker(self.redis), concurrency=concurrency)
+        report = warmer.warm_up(top_n, app=app)
         logger.info("Cache warm-up completed")
+        return report
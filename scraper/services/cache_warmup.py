@@ -0,0 +1,240 @@
+"""
+Access-frequency-driven cache warm-up.
+
+AccessTracker counts accesses per item (ticker:PETR4, company:9512, statements:9512)
+in a count-min sketch stored in Redis, with counters halved periodically so old
+popularity fades. A sorted set keeps the current heavy hitters. CacheWarmer prefetches
+the top-N items in parallel batches before the worker starts taking traffic.
+
+Usage (deploy hook / market-open job):
+    python -m services.cache_warmup --top 200 --min-coverage 0.9
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SKETCH_KEY = 'warmup:cms'
+TOP_KEY = 'warmup:top'
+DECAY_AT_KEY = 'warmup:decay_at'
+
+SKETCH_DEPTH = 4
+SKETCH_WIDTH = 4096
+TOP_CAPACITY = 1000           # Heavy-hitter candidates kept in the sorted set
+DECAY_INTERVAL = 3600         # Counters are halved every hour
+FLUSH_EVERY = 200             # Buffered accesses before a flush to Redis
+FLUSH_INTERVAL = 5.0          # Max seconds between flushes
+
+# Used when there is no access history yet (first deploy, flushed Redis)
+DEFAULT_POPULAR_TICKERS = ['PETR4', 'VALE3', 'ITUB4', 'BBDC4', 'WEGE3', 'MGLU3', 'JBSS3', 'SUZB3']
+
+# Halves every sketch counter and heavy-hitter score, dropping the ones that reach zero
+DECAY_SCRIPT = """
+local counters = redis.call('HGETALL', KEYS[1])
+for i = 1, #counters, 2 do
+    local value = math.floor(tonumber(counters[i + 1]) / 2)
+    if value > 0 then
+        redis.call('HSET', KEYS[1], counters[i], value)
+    else
+        redis.call('HDEL', KEYS[1], counters[i])
+    end
+end
+local top = redis.call('ZRANGE', KEYS[2], 0, -1, 'WITHSCORES')
+for i = 1, #top, 2 do
+    local score = math.floor(tonumber(top[i + 1]) / 2)
+    if score > 0 then
+        redis.call('ZADD', KEYS[2], score, top[i])
+    else
+        redis.call('ZREM', KEYS[2], top[i])
+    end
+end
+return #counters / 2
+"""
+
+def _sketch_fields(item: str) -> List[str]:
+    digest = hashlib.blake2b(item.encode('utf-8'), digest_size=4 * SKETCH_DEPTH).digest()
+    return [
+        f"{row}:{int.from_bytes(digest[row * 4:(row + 1) * 4], 'little') % SKETCH_WIDTH}"
+        for row in range(SKETCH_DEPTH)
+    ]
+
+class AccessTracker:
+    """Decaying count-min sketch of item accesses, buffered in process and flushed in batches"""
+
+    def __init__(self, redis_client):
+        self.redis = redis_client
+        self._buffer = Counter()
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def paused(self):
+        """Do not count accesses made by the current thread (warm-up traffic)"""
+        self._local.paused = True
+        try:
+            yield
+        finally:
+            self._local.paused = False
+
+    def record(self, kind: str, identifier) -> None:
+        """Record one access, e.g. record('ticker', 'PETR4')"""
+        if getattr(self._local, 'paused', False):
+            return
+        with self._lock:
+            self._buffer[f"{kind}:{identifier}"] += 1
+            due = (sum(self._buffer.values()) >= FLUSH_EVERY or
+                   time.monotonic() - self._last_flush >= FLUSH_INTERVAL)
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, self._buffer = self._buffer, Counter()
+            self._last_flush = time.monotonic()
+        if not pending:
+            return
+
+        try:
+            items = list(pending.items())
+            pipeline = self.redis.pipeline(transaction=False)
+            for item, count in items:
+                for field in _sketch_fields(item):
+                    pipeline.hincrby(SKETCH_KEY, field, count)
+            results = pipeline.execute()
+
+            # Count-min estimate: smallest counter across the rows
+            estimates = {
+                item: min(results[i * SKETCH_DEPTH:(i + 1) * SKETCH_DEPTH])
+                for i, (item, _) in enumerate(items)
+            }
+            pipeline = self.redis.pipeline(transaction=False)
+            pipeline.zadd(TOP_KEY, estimates)
+            pipeline.zremrangebyrank(TOP_KEY, 0, -(TOP_CAPACITY + 1))
+            pipeline.execute()
+
+            self._maybe_decay()
+        except Exception as e:
+            logger.error(f"Access tracker flush error: {str(e)}")
+
+    def _maybe_decay(self) -> None:
+        # Only one worker per interval wins the SET NX and runs the decay
+        if self.redis.set(DECAY_AT_KEY, int(time.time()), nx=True, ex=DECAY_INTERVAL):
+            self.redis.eval(DECAY_SCRIPT, 2, SKETCH_KEY, TOP_KEY)
+
+    def top(self, n: int) -> List[str]:
+        """Most accessed items, most popular first"""
+        try:
+            members = self.redis.zrevrange(TOP_KEY, 0, n - 1)
+            return [m.decode() if isinstance(m, bytes) else m for m in members]
+        except Exception as e:
+            logger.error(f"Access tracker read error: {str(e)}")
+            return []
+
+class CacheWarmer:
+    """Prefetches the most accessed tickers, company profiles and statements"""
+
+    def __init__(self, data_fetcher, tracker: AccessTracker, concurrency: int = 8,
+                 quote_batch_size: int = 20):
+        self.data_fetcher = data_fetcher
+        self.tracker = tracker
+        self.concurrency = concurrency
+        self.quote_batch_size = quote_batch_size
+
+    def warm_up(self, top_n: int = 200, app=None) -> Dict:
+        """Warm the cache and return a coverage report"""
+        started = time.monotonic()
+        items = self.tracker.top(top_n)
+        if not items:
+            items = [f"ticker:{ticker}" for ticker in DEFAULT_POPULAR_TICKERS]
+
+        grouped = {'ticker': [], 'company': [], 'statements': []}
+        for item in items:
+            kind, _, identifier = item.partition(':')
+            if kind in grouped and identifier:
+                grouped[kind].append(identifier)
+
+        tasks = []
+        tickers = grouped['ticker']
+        for start in range(0, len(tickers), self.quote_batch_size):
+            tasks.append(('ticker', tickers[start:start + self.quote_batch_size]))
+        tasks.extend(('company', [code]) for code in grouped['company'])
+        tasks.extend(('statements', [code]) for code in grouped['statements'])
+
+        warmed = Counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='cache-warmup') as executor:
+            futures = {executor.submit(self._run_task, app, kind, ids): kind for kind, ids in tasks}
+            for future in as_completed(futures):
+                try:
+                    warmed[futures[future]] += future.result()
+                except Exception as e:
+                    logger.error(f"Cache warm-up task failed: {str(e)}")
+
+        requested = {kind: len(ids) for kind, ids in grouped.items()}
+        total_requested = sum(requested.values())
+        report = {
+            'requested': requested,
+            'warmed': {kind: warmed.get(kind, 0) for kind in grouped},
+            'coverage': round(sum(warmed.values()) / total_requested, 4) if total_requested else 1.0,
+            'seconds': round(time.monotonic() - started, 3),
+        }
+        logger.info(f"Cache warm-up: coverage {report['coverage']:.1%} of {total_requested} items "
+                    f"in {report['seconds']}s")
+        return report
+
+    def _run_task(self, app, kind: str, identifiers: List[str]) -> int:
+        with self.tracker.paused():
+            if app is not None:
+                with app.app_context():
+                    return self._fetch(kind, identifiers)
+            return self._fetch(kind, identifiers)
+
+    def _fetch(self, kind: str, identifiers: List[str]) -> int:
+        if kind == 'ticker':
+            quotes = self.data_fetcher.fetch_quotes(identifiers)
+            return sum(1 for quote in quotes.values() if quote)
+        if kind == 'company':
+            company = self.data_fetcher.fetch_company_data(identifiers[0])
+            return 0 if company.get('error') else 1
+        if kind == 'statements':
+            return 1 if self.data_fetcher.fetch_financial_statements(identifiers[0]) else 0
+        return 0
+
+_tracker: Optional[AccessTracker] = None
+_tracker_lock = threading.Lock()
+
+def get_access_tracker(redis_client) -> AccessTracker:
+    """Process-wide access tracker"""
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            _tracker = AccessTracker(redis_client)
+        return _tracker
+
+if __name__ == '__main__':
+    import argparse
+    import json
+    import sys
+
+    parser = argparse.ArgumentParser(description='Warm the market data cache before taking traffic')
+    parser.add_argument('--top', type=int, default=200, help='Number of most accessed items to prefetch')
+    parser.add_argument('--concurrency', type=int, default=8, help='Parallel prefetch tasks')
+    parser.add_argument('--min-coverage', type=float, default=0.0,
+                        help='Exit with status 1 when coverage is below this fraction')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    from app import app, redis_client
+    from services.data_fetcher import data_fetcher
+
+    warmer = CacheWarmer(data_fetcher, get_access_tracker(redis_client), concurrency=args.concurrency)
+    result = warmer.warm_up(args.top, app=app)
+    print(json.dumps(result, indent=2))
+    sys.exit(0 if result['coverage'] >= args.min_coverage else 1)
@@ -2,6 +2,9 @@ import numpy as np
 import pandas as pd
 from typing import Dict, List, Optional
 
+from services.indicator_engine import rsi
+from services.support_resistance import MIN_TOLERANCE, cluster_levels, find_pivots
+
 class FinancialCalculations:
     
     @staticmethod
@@ -108,24 +111,11 @@ class FinancialCalculations:
             sma_50 = np.mean(prices_array[-50:]) if len(prices_array) >= 50 else np.mean(prices_array)
             sma_200 = np.mean(prices_array[-200:]) if len(prices_array) >= 200 else np.mean(prices_array)
             
-            # RSI calculation
+            # RSI calculation (Wilder, same as the stored indicator series)
             def calculate_rsi(prices, period=14):
                 if len(prices) < period + 1:
                     return 50  # Neutral RSI
-                
-                deltas = np.diff(prices)
-                gains = np.where(deltas > 0, deltas, 0)
-                losses = np.where(deltas < 0, -deltas, 0)
-                
-                avg_gain = np.mean(gains[-period:])
-                avg_loss = np.mean(losses[-period:])
-                
-                if avg_loss == 0:
-                    return 100
-                
-                rs = avg_gain / avg_loss
-                rsi = 100 - (100 / (1 + rs))
-                return rsi
+                return float(rsi(prices, period)[0, -1])
             
             # Bollinger Bands
             sma_20_full = sma_20
@@ -153,36 +143,31 @@ class FinancialCalculations:
     
     @staticmethod
     def calculate_support_resistance(prices: List[float], window: int = 20) -> Dict:
-        """Calculate basic support and resistance levels"""
+        """Support and resistance levels from clustered swing highs/lows of the prices"""
         try:
             if not prices or len(prices) < window:
                 return {'error': 'Insufficient data for support/resistance calculation'}
             
-            prices_array = np.array(prices)
-            
-            # Simple approach: use recent highs and lows
-            recent_prices = prices_array[-window:]
-            
-            support_level = np.min(recent_prices)
-            resistance_level = np.max(recent_prices)
-            
-            # Additional levels based on percentiles
-            support_levels = [
-                np.percentile(recent_prices, 10),
-                np.percentile(recent_prices, 25),
-                support_level
-            ]
-            
-            resistance_levels = [
-                resistance_level,
-                np.percentile(recent_prices, 75),
-                np.percentile(recent_prices, 90)
-            ]
+            prices_array = np.array(prices, dtype=np.float64)
+            current_price = prices_array[-1]
+            
+            # Closes only: the same series is used as highs and lows
+            is_high, is_low = find_pivots(prices_array, prices_array, max(2, window // 4))
+            positions = np.flatnonzero(is_high[0] | is_low[0])
+            levels = cluster_levels(
+                prices_array[positions],
+                (prices_array.size - 1 - positions).astype(np.float64),
+                is_high[0][positions],
+                MIN_TOLERANCE * current_price,
+                window
+            )
+            order = np.argsort(-levels['score'])
+            ranked = levels['level'][order]
             
             return {
-                'support_levels': [round(level, 2) for level in sorted(support_levels)],
-                'resistance_levels': [round(level, 2) for level in sorted(resistance_levels, reverse=True)],
-                'current_price': round(prices_array[-1], 2),
+                'support_levels': [round(float(level), 2) for level in sorted(ranked[ranked < current_price][:3])],
+                'resistance_levels': [round(float(level), 2) for level in sorted(ranked[ranked > current_price][:3], reverse=True)],
+                'current_price': round(float(current_price), 2),
                 'analysis_period': window
             }
             
@@ -1,11 +1,11 @@
 """
 Filtro para manter apenas empresas com ticker e negociação ativa na B3
 """
-import requests
 import logging
 from typing import List, Dict, Optional
 from app import db
 from models import Company
+from services.http_scheduler import ScheduledSession
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -15,7 +15,7 @@ class B3CompanyFilter:
     
     def __init__(self):
         self.brapi_base_url = "https://brapi.dev/api/quote"
-        self.session = requests.Session()
+        self.session = ScheduledSession()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (compatible; B3CompanyFilter/1.0)'
         })
@@ -3,12 +3,12 @@
 Scraper para obter a lista correta de empresas da DadosDeMercado
 """
 
-import requests
 from bs4 import BeautifulSoup
 import pandas as pd
 import logging
 from typing import List, Dict
 import time
+from services.http_scheduler import ScheduledSession
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -17,7 +17,7 @@ class CompanyListScraper:
     """Scraper para obter lista correta de empresas B3"""
     
     def __init__(self):
-        self.session = requests.Session()
+        self.session = ScheduledSession()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
@@ -4,15 +4,15 @@ Complete CVM RAD Scraper - Implementação completa dos pontos 1-13 do PDF
 Coleta TODOS os dados financeiros desde 2012 para TODAS as empresas B3
 """
 
-import requests
 import pandas as pd
 import logging
+from io import BytesIO
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
-import time
 import json
 from sqlalchemy import create_engine, text
 import os
+from services.http_scheduler import ScheduledSession
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -27,7 +27,7 @@ class CompleteCVMScraper:
     def __init__(self):
         self.base_url_cvm = "https://dados.cvm.gov.br/dados"
         self.base_url_rad = "https://www.rad.cvm.gov.br/ENET/frmGerenciaPaginaFRE.aspx"
-        self.session = requests.Session()
+        self.session = ScheduledSession()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         })
@@ -77,7 +77,7 @@ class CompleteCVMScraper:
                 response = self.session.get(csv_url, timeout=30)
                 if response.status_code == 200:
                     # Parse CSV data
-                    df = pd.read_csv(csv_url, sep=';', encoding='latin-1')
+                    df = pd.read_csv(BytesIO(response.content), sep=';', encoding='latin-1')
                     
                     # Process and save to database
                     self._save_company_info_data(df, year)
@@ -85,8 +85,6 @@ class CompleteCVMScraper:
                 else:
                     logger.warning(f"❌ Erro ao buscar dados {year}: {response.status_code}")
                     
-                time.sleep(2)  # Rate limiting
-                
             except Exception as e:
                 logger.error(f"Erro no ponto 1 para {year}: {str(e)}")
 
@@ -123,10 +121,9 @@ class CompleteCVMScraper:
                         try:
                             response = self.session.get(csv_url, timeout=30)
                             if response.status_code == 200:
-                                df = pd.read_csv(csv_url, sep=';', encoding='latin-1')
+                                df = pd.read_csv(BytesIO(response.content), sep=';', encoding='latin-1')
                                 self._save_financial_statements_data(df, year, statement_type, file_type)
                                 logger.info(f"✅ {statement_type} {file_type} {year} salvo")
-                            time.sleep(1)
                         except Exception as e:
                             logger.warning(f"Erro em {file_type} {year}: {str(e)}")
                             
@@ -150,12 +147,10 @@ class CompleteCVMScraper:
                 
                 response = self.session.get(csv_url, timeout=30)
                 if response.status_code == 200:
-                    df = pd.read_csv(csv_url, sep=';', encoding='latin-1')
+                    df = pd.read_csv(BytesIO(response.content), sep=';', encoding='latin-1')
                     self._save_insider_trading_data(df, year)
                     logger.info(f"✅ Insider trading {year} salvo")
                     
-                time.sleep(2)
-                
             except Exception as e:
                 logger.error(f"Erro no ponto 3 para {year}: {str(e)}")
 
@@ -176,12 +171,10 @@ class CompleteCVMScraper:
                 
                 response = self.session.get(csv_url, timeout=30)
                 if response.status_code == 200:
-                    df = pd.read_csv(csv_url, sep=';', encoding='latin-1')
+                    df = pd.read_csv(BytesIO(response.content), sep=';', encoding='latin-1')
                     self._save_dividends_data(df, year)
                     logger.info(f"✅ Dividendos {year} salvos")
                     
-                time.sleep(2)
-                
             except Exception as e:
                 logger.error(f"Erro no ponto 4 para {year}: {str(e)}")
 
@@ -202,12 +195,10 @@ class CompleteCVMScraper:
                 
                 response = self.session.get(csv_url, timeout=30)
                 if response.status_code == 200:
-                    df = pd.read_csv(csv_url, sep=';', encoding='latin-1')
+                    df = pd.read_csv(BytesIO(response.content), sep=';', encoding='latin-1')
                     self._save_stock_composition_data(df, year)
                     logger.info(f"✅ Composição acionária {year} salva")
                     
-                time.sleep(2)
-                
             except Exception as e:
                 logger.error(f"Erro no ponto 5 para {year}: {str(e)}")
 
@@ -228,12 +219,10 @@ class CompleteCVMScraper:
                 
                 response = self.session.get(csv_url, timeout=30)
                 if response.status_code == 200:
-                    df = pd.read_csv(csv_url, sep=';', encoding='latin-1')
+                    df = pd.read_csv(BytesIO(response.content), sep=';', encoding='latin-1')
                     self._save_board_members_data(df, year)
                     logger.info(f"✅ Administradores {year} salvos")
                     
-                time.sleep(2)
-                
             except Exception as e:
                 logger.error(f"Erro no ponto 6 para {year}: {str(e)}")
 
@@ -254,12 +243,10 @@ class CompleteCVMScraper:
                 
                 response = self.session.get(csv_url, timeout=30)
                 if response.status_code == 200:
-                    df = pd.read_csv(csv_url, sep=';', encoding='latin-1')
+                    df = pd.read_csv(BytesIO(response.content), sep=';', encoding='latin-1')
                     self._save_assemblies_data(df, year)
                     logger.info(f"✅ Assembleias {year} salvas")
                     
-                time.sleep(2)
-                
             except Exception as e:
                 logger.error(f"Erro no ponto 7 para {year}: {str(e)}")
 
@@ -291,12 +278,10 @@ class CompleteCVMScraper:
                 
                 response = self.session.get(csv_url, timeout=30)
                 if response.status_code == 200:
-                    df = pd.read_csv(csv_url, sep=';', encoding='latin-1')
+                    df = pd.read_csv(BytesIO(response.content), sep=';', encoding='latin-1')
                     self._save_corporate_events_data(df, year)
                     logger.info(f"✅ Eventos corporativos {year} salvos")
                     
-                time.sleep(2)
-                
             except Exception as e:
                 logger.error(f"Erro no ponto 9 para {year}: {str(e)}")
 
@@ -318,12 +303,10 @@ class CompleteCVMScraper:
                 
                 response = self.session.get(csv_url, timeout=30)
                 if response.status_code == 200:
-                    df = pd.read_csv(csv_url, sep=';', encoding='latin-1')
+                    df = pd.read_csv(BytesIO(response.content), sep=';', encoding='latin-1')
                     self._save_fundraising_data(df, year)
                     logger.info(f"✅ Captações {year} salvas")
                     
-                time.sleep(2)
-                
             except Exception as e:
                 logger.error(f"Erro no ponto 10 para {year}: {str(e)}")
 
@@ -348,7 +331,7 @@ class CompleteCVMScraper:
                 
                 response = self.session.get(csv_url, timeout=30)
                 if response.status_code == 200:
-                    df = pd.read_csv(csv_url, sep=';', encoding='latin-1')
+                    df = pd.read_csv(BytesIO(response.content), sep=';', encoding='latin-1')
                     self._save_regulatory_filings_data(df, year, 'FORM_REF')
                 
                 # Fatos relevantes
@@ -357,11 +340,10 @@ class CompleteCVMScraper:
                 
                 response = self.session.get(csv_url, timeout=30)
                 if response.status_code == 200:
-                    df = pd.read_csv(csv_url, sep=';', encoding='latin-1')
+                    df = pd.read_csv(BytesIO(response.content), sep=';', encoding='latin-1')
                     self._save_regulatory_filings_data(df, year, 'FATO_REL')
                 
                 logger.info(f"✅ Documentos regulatórios {year} salvos")
-                time.sleep(2)
                 
             except Exception as e:
                 logger.error(f"Erro no ponto 11 para {year}: {str(e)}")
@@ -386,8 +368,6 @@ class CompleteCVMScraper:
                 for year in self.years_range:
                     self._collect_market_data_for_ticker(ticker, year, company)
                     
-                time.sleep(1)  # Rate limiting
-                
             except Exception as e:
                 logger.error(f"Erro no ponto 12 para {ticker}: {str(e)}")
 
@@ -4,18 +4,17 @@ Implementação Completa dos 13 Pontos da API Financeira Brasileira
 Baseado na especificação completa do documento
 """
 
-import requests
 import pandas as pd
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
-import time
 import json
 from sqlalchemy import create_engine, text
 import os
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import numpy as np
 from io import StringIO
+from services.http_scheduler import ScheduledSession
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -30,7 +29,7 @@ class CompleteBrazilianFinancialAPI:
     def __init__(self):
         self.base_url_cvm = "https://dados.cvm.gov.br/dados"
         self.base_url_b3 = "https://www.b3.com.br"
-        self.session = requests.Session()
+        self.session = ScheduledSession()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
@@ -135,8 +134,6 @@ class CompleteBrazilianFinancialAPI:
                 else:
                     logger.warning(f"⚠️  Dados {year} não disponíveis (HTTP {response.status_code})")
                     
-                time.sleep(1)  # Rate limiting
-                
             except Exception as e:
                 logger.error(f"❌ Erro ao coletar informações gerais {year}: {str(e)}")
 
@@ -173,8 +170,6 @@ class CompleteBrazilianFinancialAPI:
                             self._save_financial_statements(df, year, statement_type, doc_type)
                             logger.info(f"✅ {statement_type} {doc_type} {year} - {len(df)} registros")
                         
-                        time.sleep(0.5)  # Rate limiting
-                        
                     except Exception as e:
                         logger.error(f"❌ Erro {statement_type} {doc_type} {year}: {str(e)}")
 
@@ -197,8 +192,6 @@ class CompleteBrazilianFinancialAPI:
                     self._save_insider_transactions(df, year)
                     logger.info(f"✅ Insider trading {year} - {len(df)} transações")
                     
-                time.sleep(1)
-                
             except Exception as e:
                 logger.error(f"❌ Erro insider trading {year}: {str(e)}")
 
@@ -221,8 +214,6 @@ class CompleteBrazilianFinancialAPI:
                     self._save_dividends(df, year)
                     logger.info(f"✅ Dividendos {year} - {len(df)} registros")
                     
-                time.sleep(1)
-                
             except Exception as e:
                 logger.error(f"❌ Erro dividendos {year}: {str(e)}")
 
@@ -244,8 +235,6 @@ class CompleteBrazilianFinancialAPI:
                     self._save_shareholding_composition(df, year)
                     logger.info(f"✅ Composição acionária {year} - {len(df)} registros")
                     
-                time.sleep(1)
-                
             except Exception as e:
                 logger.error(f"❌ Erro composição acionária {year}: {str(e)}")
 
@@ -267,8 +256,6 @@ class CompleteBrazilianFinancialAPI:
                     self._save_board_members(df, year)
                     logger.info(f"✅ Administradores {year} - {len(df)} registros")
                     
-                time.sleep(1)
-                
             except Exception as e:
                 logger.error(f"❌ Erro administradores {year}: {str(e)}")
 
@@ -290,8 +277,6 @@ class CompleteBrazilianFinancialAPI:
                     self._save_assemblies(df, year)
                     logger.info(f"✅ Assembleias {year} - {len(df)} registros")
                     
-                time.sleep(1)
-                
             except Exception as e:
                 logger.error(f"❌ Erro assembleias {year}: {str(e)}")
 
@@ -321,8 +306,6 @@ class CompleteBrazilianFinancialAPI:
                     self._save_corporate_events(df, year)
                     logger.info(f"✅ Eventos corporativos {year} - {len(df)} registros")
                     
-                time.sleep(1)
-                
             except Exception as e:
                 logger.error(f"❌ Erro eventos corporativos {year}: {str(e)}")
 
@@ -344,8 +327,6 @@ class CompleteBrazilianFinancialAPI:
                     self._save_fundraising(df, year)
                     logger.info(f"✅ Captações {year} - {len(df)} registros")
                     
-                time.sleep(1)
-                
             except Exception as e:
                 logger.error(f"❌ Erro captações {year}: {str(e)}")
 
@@ -374,8 +355,6 @@ class CompleteBrazilianFinancialAPI:
                         self._save_regulatory_docs(df, year, doc_type)
                         logger.info(f"✅ {doc_type} {year} - {len(df)} documentos")
                         
-                    time.sleep(0.5)
-                    
                 except Exception as e:
                     logger.error(f"❌ Erro {doc_type} {year}: {str(e)}")
 
@@ -395,7 +374,6 @@ class CompleteBrazilianFinancialAPI:
             try:
                 logger.info(f"📈 Coletando dados de mercado para {ticker}")
                 self._collect_historical_quotes(ticker, company)
-                time.sleep(0.5)  # Rate limiting
                 
             except Exception as e:
                 logger.error(f"❌ Erro dados mercado {ticker}: {str(e)}")
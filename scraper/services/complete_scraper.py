@@ -1,15 +1,14 @@
 """
 Scraper completo para todos os dados financeiros, insiders e históricos
 """
-import requests
 import pandas as pd
 import logging
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
-import time
 import json
 from app import db
 from models import Company, FinancialStatement, Quote
+from services.http_scheduler import ScheduledSession
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -20,7 +19,7 @@ class CompleteFinancialScraper:
     def __init__(self):
         self.brapi_base = "https://brapi.dev/api"
         self.partnr_base = "https://api.partnr.ai"
-        self.session = requests.Session()
+        self.session = ScheduledSession()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (compatible; CompleteFinancialScraper/1.0)'
         })
@@ -98,8 +97,6 @@ class CompleteFinancialScraper:
                         statements['income_statement'].extend(itr_data.get('income_statement', []))
                         statements['cash_flow'].extend(itr_data.get('cash_flow', []))
                 
-                time.sleep(0.5)  # Rate limiting
-            
         except Exception as e:
             logger.error(f"Erro ao buscar demonstrações {ticker}: {str(e)}")
         
@@ -381,9 +378,6 @@ class CompleteFinancialScraper:
                 # Salvar no database
                 self.save_to_database(company_data)
                 
-                # Rate limiting
-                time.sleep(1)
-                
             except Exception as e:
                 logger.error(f"Erro ao processar {company.get('ticker', 'N/A')}: {str(e)}")
                 continue
@@ -0,0 +1,214 @@
+"""
+Corporate-action price adjustment.
+
+Cash events (dividendos, JCP, rendimentos) and share events (desdobramentos,
+grupamentos, bonificações) become one multiplicative factor each, placed on the
+last session before the ex date:
+
+    cash:   1 - amount / close[ex - 1]
+    shares: shares_before / shares_after
+
+The adjustment of session i is the product of the factors at sessions >= i, so a
+whole series is adjusted with one reversed cumulative product. Volumes only follow
+share events (multiplied by shares_after / shares_before).
+
+Factors are cached per ticker in Redis. When the history grows the cached factors
+are extended with ones, and a new event only rescales the sessions before its ex
+date; the cache is rebuilt from scratch only if a known event changed or disappeared.
+"""
+import logging
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from services.history_store import session_day
+
+logger = logging.getLogger(__name__)
+
+SHARE_EVENT_KEYWORDS = ('desdobr', 'grupam', 'bonific', 'split', 'inplit')
+EVENTS_L1_TTL = 300           # Seconds the event list of a ticker is kept in process
+CACHE_TTL = 7 * 86400
+
+# (key, ex session day, kind, value); kind is 'cash' (amount per share) or 'shares' (after / before)
+Event = Tuple[str, int, str, float]
+
+def _day(value) -> int:
+    if isinstance(value, datetime):
+        return (value.date() - date(1970, 1, 1)).days
+    if isinstance(value, date):
+        return (value - date(1970, 1, 1)).days
+    return session_day(value)
+
+def load_events(session, ticker: str) -> List[Event]:
+    """Dividends/JCP from `dividends` and share events from `capital_structure`"""
+    from sqlalchemy import text
+
+    events = []
+    # Columns of models_extended.Dividends; bonificações listed there are share events,
+    # taken from capital_structure below
+    dividends = session.execute(text(
+        "SELECT ex_date, value_per_share, dividend_type FROM dividends "
+        "WHERE ticker = :ticker AND value_per_share > 0 AND ex_date IS NOT NULL"
+    ), {'ticker': ticker}).fetchall()
+    for ex_date, amount, kind in dividends:
+        if any(word in (kind or '').lower() for word in SHARE_EVENT_KEYWORDS):
+            continue
+        day = _day(ex_date)
+        events.append((f"cash:{day}:{kind or ''}:{amount}", day, 'cash', float(amount)))
+
+    # capital_structure keeps the share count after each event; the ratio comes from
+    # the previous count of the same company. It has no ex date, so the approval date is used
+    capital = session.execute(text(
+        "SELECT cs.approval_date, cs.event_type, cs.qty_total_shares "
+        "FROM capital_structure cs JOIN companies c ON c.id = cs.company_id "
+        "WHERE c.ticker = :ticker AND cs.qty_total_shares > 0 "
+        "ORDER BY cs.approval_date"
+    ), {'ticker': ticker}).fetchall()
+    previous = None
+    for approval_date, event_type, shares in capital:
+        is_share_event = any(word in (event_type or '').lower() for word in SHARE_EVENT_KEYWORDS)
+        if is_share_event and previous and shares != previous:
+            day = _day(approval_date)
+            events.append((f"shares:{day}:{previous}:{shares}", day, 'shares', shares / previous))
+        previous = shares
+
+    return sorted(events, key=lambda event: event[1])
+
+def event_factors(dates: np.ndarray, closes: np.ndarray, events: List[Event]):
+    """
+    Position (last session before the ex date), price factor and volume factor of
+    each event that falls inside the series
+    """
+    if not events or dates.size == 0:
+        empty = np.empty(0)
+        return empty.astype(np.int64), empty, empty
+
+    ex_days = np.array([event[1] for event in events], dtype=np.int64)
+    kinds = np.array([event[2] for event in events])
+    values = np.array([event[3] for event in events], dtype=np.float64)
+
+    positions = np.searchsorted(dates, ex_days, side='left') - 1
+    # Events before the first session or not yet ex (future ex dates) do not apply
+    inside = (positions >= 0) & (ex_days <= dates[-1])
+    positions, kinds, values = positions[inside], kinds[inside], values[inside]
+
+    cash = kinds == 'cash'
+    price_factors = np.where(cash, 1 - values / closes[positions], 1 / values)
+    volume_factors = np.where(cash, 1.0, values)
+    # A dividend larger than the price is bad data, not an adjustment
+    valid = np.isfinite(price_factors) & (price_factors > 0)
+    return positions[valid], price_factors[valid], volume_factors[valid]
+
+def cumulative_factors(size: int, positions: np.ndarray, factors: np.ndarray) -> np.ndarray:
+    """Adjustment of every session: product of the event factors at or after it"""
+    per_session = np.ones(size)
+    np.multiply.at(per_session, positions, factors)
+    return np.cumprod(per_session[::-1])[::-1]
+
+def apply_adjustment(columns: Dict[str, np.ndarray], price_factors: np.ndarray,
+                     volume_factors: np.ndarray) -> Dict[str, np.ndarray]:
+    adjusted = dict(columns)
+    for name in ('open', 'high', 'low', 'close'):
+        adjusted[name] = columns[name] * price_factors
+    adjusted['adj_close'] = adjusted['close']
+    adjusted['volume'] = np.rint(columns['volume'] * volume_factors).astype(np.int64)
+    return adjusted
+
+class AdjustmentEngine:
+    """Adjusted daily series from the history store, with incremental factor caching"""
+
+    def __init__(self, redis_client, history_store, local_cache=None):
+        self.redis = redis_client
+        self.history = history_store
+        self.l1 = local_cache
+
+    def events(self, session, ticker: str) -> List[Event]:
+        key = f"corporate_events:{ticker}"
+        cached = self.l1.get(key) if self.l1 is not None else None
+        if cached is not None:
+            return cached
+        events = load_events(session, ticker)
+        if self.l1 is not None:
+            self.l1.set(key, events, EVENTS_L1_TTL, 64 * len(events) + 64)
+        return events
+
+    def adjusted(self, session, ticker: str, start: Optional[date] = None) -> Dict[str, np.ndarray]:
+        """Adjusted columns for sessions from start on (the whole history if None)"""
+        ticker = ticker.upper()
+        columns = self.history.read(ticker)
+        size = columns['date'].size
+        if size == 0:
+            return columns
+
+        price_factors, volume_factors = self._factors(session, ticker, columns)
+        lo = int(np.searchsorted(columns['date'], _day(start), side='left')) if start else 0
+        window = {name: values[lo:] for name, values in columns.items()}
+        return apply_adjustment(window, price_factors[lo:], volume_factors[lo:])
+
+    def _factors(self, session, ticker: str, columns: Dict[str, np.ndarray]):
+        dates, closes = columns['date'], columns['close']
+        size = dates.size
+        events = self.events(session, ticker)
+        cache_key = f"adjust:{ticker}"
+
+        cached = self._read_cache(cache_key)
+        applied = {event[0] for event in events if event[1] <= dates[-1]}
+        if cached and cached['first_day'] == int(dates[0]) and cached['rows'] <= size \
+                and cached['events'] <= applied:
+            rows = cached['rows']
+            price = np.concatenate((cached['price'], np.ones(size - rows)))
+            volume = np.concatenate((cached['volume'], np.ones(size - rows)))
+            new_events = [event for event in events if event[0] in applied - cached['events']]
+            positions, price_new, volume_new = event_factors(dates, closes, new_events)
+            # Each new event only rescales the sessions before its ex date
+            for position, price_factor, volume_factor in zip(positions.tolist(), price_new.tolist(), volume_new.tolist()):
+                price[:position + 1] *= price_factor
+                volume[:position + 1] *= volume_factor
+            if size == rows and not new_events:
+                return price, volume
+        else:
+            positions, price_all, volume_all = event_factors(dates, closes, events)
+            price = cumulative_factors(size, positions, price_all)
+            volume = cumulative_factors(size, positions, volume_all)
+
+        self._write_cache(cache_key, int(dates[0]), size, applied, price, volume)
+        return price, volume
+
+    def _read_cache(self, key: str) -> Optional[Dict]:
+        try:
+            raw = self.redis.hgetall(key)
+        except Exception as e:
+            logger.error(f"Adjustment cache read error: {str(e)}")
+            return None
+        if not raw:
+            return None
+        raw = {k.decode() if isinstance(k, bytes) else k: v for k, v in raw.items()}
+        try:
+            events = raw['events']
+            events = events.decode() if isinstance(events, bytes) else events
+            return {
+                'first_day': int(raw['first_day']),
+                'rows': int(raw['rows']),
+                'events': set(filter(None, events.split('|'))),
+                'price': np.frombuffer(raw['price'], dtype=np.float64),
+                'volume': np.frombuffer(raw['volume'], dtype=np.float64),
+            }
+        except (KeyError, ValueError, TypeError):
+            return None
+
+    def _write_cache(self, key: str, first_day: int, rows: int, events, price, volume) -> None:
+        try:
+            pipeline = self.redis.pipeline(transaction=True)
+            pipeline.delete(key)
+            pipeline.hset(key, mapping={
+                'first_day': first_day,
+                'rows': rows,
+                'events': '|'.join(sorted(events)),
+                'price': price.astype(np.float64).tobytes(),
+                'volume': volume.astype(np.float64).tobytes(),
+            })
+            pipeline.expire(key, CACHE_TTL)
+            pipeline.execute()
+        except Exception as e:
+            logger.error(f"Adjustment cache write error: {str(e)}")
@@ -5,13 +5,13 @@ import logging
 from datetime import datetime
 from io import BytesIO
 import zipfile
-import time
 from typing import Dict
 import io
 from sqlalchemy import extract
 
 from scraper.config import CVM_DADOS_ABERTOS_URL, REQUESTS_HEADERS, START_YEAR_HISTORICAL_LOAD
 from scraper.database import get_db_session
+from services.http_scheduler import ScheduledSession
 from scraper.models import (
     FinancialStatement, Company, CapitalStructure, Shareholder, CompanyAdministrator, CompanyRiskFactor
 )
@@ -21,7 +21,7 @@ logger = logging.getLogger(__name__)
 
 class CVMDataCollector:
     def __init__(self):
-        self.session = requests.Session()
+        self.session = ScheduledSession()
         self.session.headers.update(REQUESTS_HEADERS)
         self.base_url = CVM_DADOS_ABERTOS_URL
 
@@ -140,7 +140,6 @@ class CVMDataCollector:
         current_year = datetime.now().year
         for year in range(START_YEAR_HISTORICAL_LOAD, current_year + 1):
             self.process_fre_data(year)
-            time.sleep(2)
         logger.info("--- Carga histórica de dados do FRE concluída ---")
 
     def process_financial_statements(self, doc_type: str, year: int):
@@ -1,10 +1,32 @@
 import requests
-import json
 import time
 from datetime import datetime, timedelta
 from flask import current_app
-from app import redis_client
+from app import db, redis_client
 from config import Config
+from services.single_flight import SingleFlight
+from services.cache_policy import BackgroundRefresher, hard_ttl_for, unwrap, wrap
+from services.local_cache import get_invalidation_bus, l1_ttl_for, local_cache
+from services.cache_codecs import CacheCodec
+from services.cache_warmup import get_access_tracker
+from services.tick_store import tick_store
+from services.bar_builder import PERIOD_DAYS, RESOLUTIONS, BarStore, bars_to_records, get_bar_builder
+from services.history_store import (
+    columns_to_records, history_store, market_today, rows_from_brapi, upstream_range_for
+)
+from services.corporate_actions import AdjustmentEngine
+from services.streaming_indicators import IndicatorStream
+from services.support_resistance import SupportResistanceEngine
+from services.screener import Screener
+
+# brapi accepts several symbols per request (/quote/A,B,C); larger batches are split
+BRAPI_MAX_TICKERS_PER_REQUEST = 20
+
+# How often one worker checks brapi for new sessions of a ticker's daily history
+HISTORY_SYNC_INTERVAL = 900
+
+# Slowest upstream request behind the single-flight layer; its lock and waits outlast it
+UPSTREAM_TIMEOUT = 15
 
 class DataFetcher:
     def __init__(self):
@@ -12,32 +34,125 @@ class DataFetcher:
         self.partnr_base = Config.PARTNR_BASE_URL
         self.dados_mercado_base = Config.DADOS_MERCADO_BASE_URL
         self.cache_ttl = Config.CACHE_TTL
+        self.single_flight = SingleFlight(redis_client, lock_ttl=2 * UPSTREAM_TIMEOUT,
+                                          wait_timeout=UPSTREAM_TIMEOUT + 5)
+        self.refresher = BackgroundRefresher(redis_client)
+        self.l1 = local_cache
+        self.invalidation = get_invalidation_bus(redis_client)
+        self.codec = CacheCodec.for_client(redis_client)
+        self.access_tracker = get_access_tracker(redis_client)
+        self.bars = BarStore(redis_client)
+        self.history = history_store
+        self.adjustments = AdjustmentEngine(redis_client, history_store, local_cache)
+        self.indicators = IndicatorStream(redis_client, loader=self._adjusted_history)
+        self.levels = SupportResistanceEngine(redis_client, history_store, loader=self._adjusted_history)
+        self.screener = Screener(redis_client)
+        # Live ticks are aggregated into OHLCV bars and indicator states as they are stored
+        tick_store.add_listener(get_bar_builder(redis_client).on_tick)
+        tick_store.add_listener(self.indicators.on_tick)
     
-    def _get_cached_data(self, cache_key):
-        """Get data from Redis cache"""
+    def _get_cached_entry(self, cache_key):
+        """Get (data, is_stale) from the in-process L1 tier or Redis cache"""
         try:
+            l1_ttl = l1_ttl_for(cache_key)
+            if l1_ttl:
+                payload = self.l1.get(cache_key)
+                if payload is not None:
+                    return unwrap(payload)
+            
             cached_data = redis_client.get(cache_key)
             if cached_data:
-                return json.loads(cached_data)
+                payload = self.codec.decode(cached_data)
+                if l1_ttl:
+                    self.l1.set(cache_key, payload, l1_ttl, len(cached_data))
+                return unwrap(payload)
         except Exception as e:
             current_app.logger.error(f"Cache read error: {e}")
-        return None
+        return None, False
+    
+    def _get_cached_data(self, cache_key):
+        """Get data from cache (L1 or Redis), fresh or stale"""
+        return self._get_cached_entry(cache_key)[0]
     
     def _set_cached_data(self, cache_key, data, ttl=3600):
-        """Set data in Redis cache"""
+        """
+        Set data in Redis cache. ttl is the soft TTL; the entry is kept until the
+        hard TTL so it can be served stale while refreshing or when upstream fails
+        """
+        self._set_cached_many({cache_key: data}, ttl)
+    
+    def _store_l1(self, serialized):
+        """Keep freshly written L1-eligible entries in process and drop other workers' copies"""
+        eligible = {key: value for key, value in serialized.items() if l1_ttl_for(key)}
+        if not eligible:
+            return
+        self.invalidation.publish(keys=list(eligible))
+        for key, (payload, raw, ttl) in eligible.items():
+            self.l1.set(key, payload, min(l1_ttl_for(key), ttl), len(raw))
+    
+    def _get_cached_many(self, cache_keys):
+        """Get several keys from L1 / Redis cache with a single MGET round trip: {key: (data, is_stale)}"""
         try:
-            redis_client.setex(cache_key, ttl, json.dumps(data, default=str))
+            entries = {}
+            remote_keys = []
+            for key in cache_keys:
+                payload = self.l1.get(key) if l1_ttl_for(key) else None
+                if payload is not None:
+                    entries[key] = unwrap(payload)
+                else:
+                    remote_keys.append(key)
+            
+            if remote_keys:
+                for key, value in zip(remote_keys, redis_client.mget(remote_keys)):
+                    if value:
+                        payload = self.codec.decode(value)
+                        l1_ttl = l1_ttl_for(key)
+                        if l1_ttl:
+                            self.l1.set(key, payload, l1_ttl, len(value))
+                        entries[key] = unwrap(payload)
+            return entries
+        except Exception as e:
+            current_app.logger.error(f"Cache read error: {e}")
+            return {}
+    
+    def _set_cached_many(self, items, ttl=3600):
+        """Set several keys in Redis cache with a single pipelined SETEX batch"""
+        try:
+            serialized = {}
+            pipeline = redis_client.pipeline(transaction=False)
+            for cache_key, data in items.items():
+                payload = wrap(data, ttl)
+                raw = self.codec.encode(payload)
+                pipeline.setex(cache_key, hard_ttl_for(ttl), raw)
+                serialized[cache_key] = (payload, raw, ttl)
+            pipeline.execute()
+            self._store_l1(serialized)
         except Exception as e:
             current_app.logger.error(f"Cache write error: {e}")
     
-    def fetch_quote(self, ticker):
-        """Fetch stock quote from brapi.dev"""
-        cache_key = f"quote:{ticker}"
-        cached_data = self._get_cached_data(cache_key)
+    def _cached_fetch(self, cache_key, fetch_upstream):
+        """
+        Stale-while-revalidate read: fresh entries are returned as is, stale entries are
+        returned immediately while one background refresh runs, and misses go upstream
+        through the single-flight layer
+        """
+        cached_data, stale = self._get_cached_entry(cache_key)
         
         if cached_data:
+            if stale:
+                self.refresher.schedule(cache_key, fetch_upstream)
             return cached_data
         
+        return self.single_flight.do(cache_key, fetch_upstream, lambda: self._get_cached_data(cache_key))
+    
+    def fetch_quote(self, ticker):
+        """Fetch stock quote from brapi.dev"""
+        cache_key = f"quote:{ticker}"
+        self.access_tracker.record('ticker', ticker)
+        return self._cached_fetch(cache_key, lambda: self._fetch_quote_upstream(ticker, cache_key))
+    
+    def _fetch_quote_upstream(self, ticker, cache_key):
+        """Fetch a single quote from brapi.dev and cache it"""
         try:
             url = f"{self.brapi_base}/quote/{ticker}"
             headers = {'Authorization': f'Bearer {Config.BRAPI_API_KEY}'}
@@ -49,6 +164,7 @@ class DataFetcher:
                 if data.get('results'):
                     quote_data = data['results'][0]
                     self._set_cached_data(cache_key, quote_data, self.cache_ttl['quotes'])
+                    tick_store.append_quote(quote_data)
                     return quote_data
             
             return None
@@ -57,20 +173,151 @@ class DataFetcher:
             current_app.logger.error(f"Error fetching quote for {ticker}: {e}")
             return None
     
-    def fetch_historical_data(self, ticker, period='1y', interval='1d'):
-        """Fetch historical price data"""
-        cache_key = f"historical:{ticker}:{period}:{interval}"
-        cached_data = self._get_cached_data(cache_key)
+    def fetch_quotes(self, tickers):
+        """
+        Fetch quotes for several tickers: one MGET for the cache and one multi-symbol
+        brapi request per batch of misses. Returns {ticker: quote or None}
+        """
+        tickers = list(dict.fromkeys(tickers))
+        for ticker in tickers:
+            self.access_tracker.record('ticker', ticker)
+        cache_keys = {ticker: f"quote:{ticker}" for ticker in tickers}
+        cached = self._get_cached_many(list(cache_keys.values()))
         
-        if cached_data:
-            return cached_data
+        quotes = {ticker: cached.get(cache_keys[ticker], (None, False))[0] for ticker in tickers}
+        missing = [ticker for ticker in tickers if not quotes[ticker]]
+        stale = [ticker for ticker in tickers if quotes[ticker] and cached[cache_keys[ticker]][1]]
+        
+        # Stale quotes are served now and refreshed in one background batch
+        if stale:
+            self.refresher.schedule(
+                f"quotes:{','.join(sorted(stale))}",
+                lambda: self._fetch_quotes_upstream(stale)
+            )
+        
+        if missing:
+            quotes.update(self._fetch_quotes_upstream(missing))
         
+        return quotes
+    
+    def _fetch_quotes_upstream(self, tickers):
+        """Fetch quotes from brapi.dev in multi-symbol batches and cache them"""
+        headers = {'Authorization': f'Bearer {Config.BRAPI_API_KEY}'}
+        quotes = {}
+        fetched = {}
+        
+        for start in range(0, len(tickers), BRAPI_MAX_TICKERS_PER_REQUEST):
+            batch = tickers[start:start + BRAPI_MAX_TICKERS_PER_REQUEST]
+            try:
+                url = f"{self.brapi_base}/quote/{','.join(batch)}"
+                response = requests.get(url, headers=headers, timeout=10)
+                
+                if response.status_code == 200:
+                    by_symbol = {
+                        result.get('symbol', '').upper(): result
+                        for result in response.json().get('results') or []
+                    }
+                    for ticker in batch:
+                        quote_data = by_symbol.get(ticker.upper())
+                        if quote_data:
+                            quotes[ticker] = quote_data
+                            fetched[f"quote:{ticker}"] = quote_data
+            
+            except Exception as e:
+                current_app.logger.error(f"Error fetching quotes for {','.join(batch)}: {e}")
+        
+        if fetched:
+            self._set_cached_many(fetched, self.cache_ttl['quotes'])
+            tick_store.append_quotes(fetched.values())
+        
+        return quotes
+    
+    def fetch_historical_data(self, ticker, period='1y', interval='1d', adjusted=False):
+        """
+        Fetch historical price data. Daily prices are read from the local history store,
+        adjusted for dividends, JCP, splits and bonus issues when adjusted=True
+        """
+        if interval == '1d':
+            daily = self.fetch_daily_history(ticker, period, adjusted)
+            if daily:
+                return daily
+        
+        cache_key = f"historical:{ticker}:{period}:{interval}"
+        return self._cached_fetch(
+            cache_key,
+            lambda: self._fetch_historical_upstream(ticker, period, interval, cache_key)
+        )
+    
+    def fetch_bars(self, ticker, period='1y', interval='1d'):
+        """
+        OHLCV bars built from collected quotes, in the historicalDataPrice layout.
+        Returns [] for intervals that are not aggregated locally or when there are no bars.
+        Daily history is served by fetch_daily_history instead
+        """
+        if interval not in RESOLUTIONS or interval == '1d':
+            return []
+        try:
+            start = time.time() - PERIOD_DAYS.get(period, 7300) * 86400
+            return bars_to_records(self.bars.read(ticker.upper(), interval, start))
+        except Exception as e:
+            current_app.logger.error(f"Error reading bars for {ticker}: {e}")
+            return []
+    
+    def fetch_daily_history(self, ticker, period='1y', adjusted=False):
+        """Daily OHLCV for period from the memory-mapped history store, synced from brapi"""
+        ticker = ticker.upper()
+        try:
+            self._sync_daily_history(ticker)
+            start = market_today() - timedelta(days=PERIOD_DAYS.get(period, 36500))
+            if adjusted:
+                return columns_to_records(self.adjustments.adjusted(db.session, ticker, start))
+            return columns_to_records(self.history.read(ticker, start))
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Error reading daily history for {ticker}: {e}")
+            return []
+    
+    def _adjusted_history(self, ticker):
+        """Adjusted daily columns for indicators and levels (raw prices without a database)"""
+        try:
+            return self.adjustments.adjusted(db.session, ticker)
+        except Exception as e:
+            # A failed query leaves the transaction aborted for the rest of the request
+            db.session.rollback()
+            current_app.logger.warning(f"Unadjusted history for {ticker}: {e}")
+            return self.history.read(ticker)
+    
+    def _sync_daily_history(self, ticker):
+        """Append the sessions missing from the store; one worker per ticker per interval"""
+        if not redis_client.set(f"history-sync:{ticker}", 1, nx=True, ex=HISTORY_SYNC_INTERVAL):
+            return
+        
+        synced = False
+        try:
+            brapi_range = upstream_range_for(self.history.last_date(ticker), market_today())
+            url = f"{self.brapi_base}/quote/{ticker}"
+            params = {'range': brapi_range, 'interval': '1d'}
+            headers = {'Authorization': f'Bearer {Config.BRAPI_API_KEY}'}
+            
+            response = requests.get(url, headers=headers, params=params, timeout=30)
+            if response.status_code == 200:
+                results = response.json().get('results') or []
+                if results and results[0].get('historicalDataPrice'):
+                    self.history.append(ticker, rows_from_brapi(results[0]['historicalDataPrice']))
+                    synced = True
+        finally:
+            if not synced:
+                # Let the next request retry instead of waiting for the interval
+                redis_client.delete(f"history-sync:{ticker}")
+    
+    def _fetch_historical_upstream(self, ticker, period, interval, cache_key):
+        """Fetch historical prices from brapi.dev and cache them"""
         try:
             url = f"{self.brapi_base}/quote/{ticker}"
             params = {'range': period, 'interval': interval}
             headers = {'Authorization': f'Bearer {Config.BRAPI_API_KEY}'}
             
-            response = requests.get(url, headers=headers, params=params, timeout=15)
+            response = requests.get(url, headers=headers, params=params, timeout=UPSTREAM_TIMEOUT)
             
             if response.status_code == 200:
                 data = response.json()
@@ -88,12 +335,24 @@ class DataFetcher:
     def fetch_company_data(self, cvm_code):
         """Fetch company data from multiple sources"""
         cache_key = f"company:{cvm_code}"
-        cached_data = self._get_cached_data(cache_key)
+        self.access_tracker.record('company', cvm_code)
+        company_data = self._cached_fetch(
+            cache_key,
+            lambda: self._fetch_company_upstream(cvm_code, cache_key)
+        )
         
-        if cached_data:
-            return cached_data
+        if company_data:
+            return company_data
         
-        # Try to fetch from dados de mercado first
+        # Return mock structure if API fails and there is no stale copy
+        return {
+            'cvm_code': cvm_code,
+            'company_name': f'Empresa CVM {cvm_code}',
+            'error': 'Data not available - external API unavailable'
+        }
+    
+    def _fetch_company_upstream(self, cvm_code, cache_key):
+        """Fetch company data from dados de mercado and cache it"""
         try:
             url = f"{self.dados_mercado_base}/companies/{cvm_code}"
             headers = {'Authorization': f'Bearer {Config.DADOS_MERCADO_API_KEY}'}
@@ -108,21 +367,19 @@ class DataFetcher:
         except Exception as e:
             current_app.logger.error(f"Error fetching company data for {cvm_code}: {e}")
         
-        # Return mock structure if API fails
-        return {
-            'cvm_code': cvm_code,
-            'company_name': f'Empresa CVM {cvm_code}',
-            'error': 'Data not available - external API unavailable'
-        }
+        return None
     
     def fetch_financial_statements(self, cvm_code, report_type=None, aggregation=None):
         """Fetch financial statements"""
         cache_key = f"statements:{cvm_code}:{report_type}:{aggregation}"
-        cached_data = self._get_cached_data(cache_key)
-        
-        if cached_data:
-            return cached_data
-        
+        self.access_tracker.record('statements', cvm_code)
+        return self._cached_fetch(
+            cache_key,
+            lambda: self._fetch_statements_upstream(cvm_code, report_type, aggregation, cache_key)
+        )
+    
+    def _fetch_statements_upstream(self, cvm_code, report_type, aggregation, cache_key):
+        """Fetch financial statements from dados de mercado and cache them"""
         try:
             url = f"{self.dados_mercado_base}/companies/{cvm_code}/raw-reports"
             params = {}
@@ -133,7 +390,7 @@ class DataFetcher:
             
             headers = {'Authorization': f'Bearer {Config.DADOS_MERCADO_API_KEY}'}
             
-            response = requests.get(url, headers=headers, params=params, timeout=15)
+            response = requests.get(url, headers=headers, params=params, timeout=UPSTREAM_TIMEOUT)
             
             if response.status_code == 200:
                 statements = response.json()
@@ -17,12 +17,13 @@ class DataService:
         """Get company by CVM code with caching"""
         cache_key = f"company:cvm:{cvm_code}"
         
-        # Try cache first
-        cached_company = self.cache.get(cache_key)
-        if cached_company:
-            return cached_company
-        
-        # Query database
+        # Cache for 1 hour, serving the stale copy for up to a day while it is refreshed
+        return self.cache.get_or_load(
+            cache_key, lambda: self._load_company_by_cvm_code(cvm_code), ttl=3600, stale_ttl=86400
+        )
+    
+    def _load_company_by_cvm_code(self, cvm_code):
+        """Load company data from the database"""
         company = Company.query.filter_by(cvm_code=cvm_code).first()
         
         if company:
@@ -37,8 +38,6 @@ class DataService:
                 'market_cap': company.market_cap
             }
             
-            # Cache for 1 hour
-            self.cache.set(cache_key, company_data, ttl=3600)
             return company_data
         
         return None
@@ -47,12 +46,13 @@ class DataService:
         """Get latest quote for ticker with caching"""
         cache_key = f"quote:latest:{ticker_symbol.upper()}"
         
-        # Try cache first (short TTL for real-time data)
-        cached_quote = self.cache.get(cache_key)
-        if cached_quote:
-            return cached_quote
-        
-        # Query database
+        # Cache for 1 minute (real-time data), stale copy served for up to 10 minutes
+        return self.cache.get_or_load(
+            cache_key, lambda: self._load_latest_quote(ticker_symbol), ttl=60, stale_ttl=600
+        )
+    
+    def _load_latest_quote(self, ticker_symbol):
+        """Load the latest quote for ticker from the database"""
         ticker = Ticker.query.filter_by(symbol=ticker_symbol.upper()).first()
         if not ticker:
             return None
@@ -73,8 +73,6 @@ class DataService:
                 'timestamp': latest_quote.quote_datetime.isoformat()
             }
             
-            # Cache for 1 minute (real-time data)
-            self.cache.set(cache_key, quote_data, ttl=60)
             return quote_data
         
         return None
@@ -2,12 +2,12 @@
 ETL para dados de empresas brasileiras
 Integração com brapi.dev, CVM e B3
 """
-import requests
 import logging
 from datetime import datetime
 from app import db
 from models import Company, Ticker, Quote
 from services.external_apis import BrapiAPI, CVMIntegration
+from services.http_scheduler import ScheduledSession
 
 logger = logging.getLogger(__name__)
 
@@ -15,12 +15,13 @@ class CompaniesETL:
     def __init__(self):
         self.brapi = BrapiAPI()
         self.cvm = CVMIntegration()
+        self.session = ScheduledSession()
         
     def extract_companies_from_brapi(self):
         """Extrai lista de empresas da brapi.dev"""
         try:
             url = "https://brapi.dev/api/available"
-            response = requests.get(url, timeout=30)
+            response = self.session.get(url, timeout=30)
             response.raise_for_status()
             
             data = response.json()
@@ -37,7 +38,7 @@ class CompaniesETL:
         try:
             # Buscar dados da brapi
             url = f"https://brapi.dev/api/quote/{ticker}?fundamental=true"
-            response = requests.get(url, timeout=30)
+            response = self.session.get(url, timeout=30)
             response.raise_for_status()
             
             data = response.json()
@@ -111,7 +112,7 @@ class CompaniesETL:
         try:
             # Endpoint da CVM para empresas registradas
             url = "https://dados.cvm.gov.br/dados/CIA_ABERTA/CAD/DADOS/cad_cia_aberta.csv"
-            response = requests.get(url, timeout=60)
+            response = self.session.get(url, timeout=60)
             response.raise_for_status()
             
             # Parse CSV data
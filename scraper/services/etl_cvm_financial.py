@@ -404,11 +404,9 @@ class CVMFinancialETL:
                     if success:
                         success_count += 1
                     
-                    # Delay entre empresas para não sobrecarregar os servidores da CVM
+                    # O ritmo das requisições à CVM é controlado pelo agendador HTTP compartilhado
                     if i % 10 == 0:
                         logger.info(f"Processadas {i} empresas, {success_count} com sucesso")
-                        import time
-                        time.sleep(2)
                         
                 except Exception as e:
                     logger.error(f"Erro ao processar empresa {company.company_name}: {str(e)}")
@@ -12,6 +12,7 @@ from services.scraper_cvm import CVMScraper
 from services.scraper_bacen import BacenScraper  
 from services.scraper_b3 import B3Scraper
 from services.scraper_news import NewsScraper
+from services.http_scheduler import http_scheduler
 
 logger = logging.getLogger(__name__)
 
@@ -73,7 +74,8 @@ class ETLMaster:
             'execution_time_seconds': execution_time,
             'results': results,
             'success_count': len([r for r in results.values() if 'error' not in r]),
-            'error_count': len([r for r in results.values() if 'error' in r])
+            'error_count': len([r for r in results.values() if 'error' in r]),
+            'http_metrics': http_scheduler.get_metrics()
         }
         
         self.execution_log.append(execution_summary)
@@ -5,55 +5,47 @@ Integração com brapi.dev, Yahoo Finance e outras fontes
 import requests
 import logging
 from datetime import datetime, timedelta
-from app import db
+from sqlalchemy.dialects.postgresql import insert
+from app import db, redis_client
 from models import Quote, Ticker, Company
 from services.external_apis import BrapiAPI
+from services.tick_store import tick_store
+from services.quote_poller import AsyncQuotePoller, DEFAULT_CURRENCIES
+from services.screener import publish_refresh
 
 logger = logging.getLogger(__name__)
 
+# Linhas por comando INSERT no upsert em lote (todas na mesma transação)
+UPSERT_PAGE_SIZE = 1000
+
+# Prazo de uma coleta completa (universo listado + câmbio): o intervalo entre coletas
+POLL_INTERVAL_SECONDS = 60
+# Janela de quote_datetime: coletas dentro da mesma janela atualizam a mesma linha
+QUOTE_BUCKET_SECONDS = 300
+
 class QuotesETL:
     def __init__(self):
         self.brapi = BrapiAPI()
+        self.poller = AsyncQuotePoller()
+        self._ticker_ids = None
         
     def extract_real_time_quotes(self, tickers_list=None):
-        """Extrai cotações em tempo real"""
+        """Extrai cotações em tempo real (lotes em paralelo, ver AsyncQuotePoller)"""
         try:
             if not tickers_list:
                 # Buscar todos os tickers ativos
                 tickers = Ticker.query.all()
                 tickers_list = [t.symbol for t in tickers]
             
-            # Limitar a 50 tickers por request para evitar timeout
-            batch_size = 50
-            all_quotes = []
-            
-            for i in range(0, len(tickers_list), batch_size):
-                batch = tickers_list[i:i+batch_size]
-                quotes_batch = self._fetch_quotes_batch(batch)
-                all_quotes.extend(quotes_batch)
-            
-            return all_quotes
+            result = self.poller.poll(tickers_list, currencies=(), deadline=POLL_INTERVAL_SECONDS)
+            if result.failed:
+                logger.warning(f"Cotações não obtidas para {len(result.failed)} tickers: {', '.join(result.failed[:20])}")
+            return result.quotes
             
         except Exception as e:
             logger.error(f"Erro ao extrair cotações: {str(e)}")
             return []
     
-    def _fetch_quotes_batch(self, tickers):
-        """Busca batch de cotações da brapi"""
-        try:
-            tickers_str = ','.join(tickers)
-            url = f"https://brapi.dev/api/quote/{tickers_str}"
-            
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
-            
-            data = response.json()
-            return data.get('results', [])
-            
-        except Exception as e:
-            logger.error(f"Erro ao buscar batch de cotações: {str(e)}")
-            return []
-    
     def extract_historical_quotes(self, ticker, days=30):
         """Extrai cotações históricas"""
         try:
@@ -84,6 +76,7 @@ class QuotesETL:
             return None
             
         try:
+            now = datetime.utcnow()
             return {
                 'ticker': raw_quote.get('symbol', ''),
                 'price': float(raw_quote.get('regularMarketPrice', 0)),
@@ -100,50 +93,87 @@ class QuotesETL:
                 'bid_size': int(raw_quote.get('bidSize', 0)),
                 'ask_size': int(raw_quote.get('askSize', 0)),
                 'market_status': raw_quote.get('marketState', 'CLOSED'),
-                'timestamp': datetime.utcnow(),
-                'quote_datetime': datetime.utcnow()
+                'timestamp': now,
+                'quote_datetime': self._quote_bucket(now)
             }
             
         except Exception as e:
             logger.error(f"Erro ao transformar cotação: {str(e)}")
             return None
     
-    def load_quote(self, quote_data):
-        """Carrega cotação no banco"""
-        if not quote_data:
-            return None
-            
+    def _get_ticker_ids(self, refresh=False):
+        """Mapa symbol -> id dos tickers, carregado uma vez por execução"""
+        if self._ticker_ids is None or refresh:
+            self._ticker_ids = {
+                symbol: ticker_id
+                for symbol, ticker_id in db.session.query(Ticker.symbol, Ticker.id)
+            }
+        return self._ticker_ids
+    
+    @staticmethod
+    def _quote_bucket(moment):
+        """Início da janela de QUOTE_BUCKET_SECONDS que contém o instante"""
+        start = moment.replace(microsecond=0)
+        seconds = (start - start.replace(hour=0, minute=0, second=0)).seconds
+        return start - timedelta(seconds=seconds % QUOTE_BUCKET_SECONDS)
+    
+    def _quote_row(self, quote_data, columns, ticker_ids):
+        """Linha da tabela quotes a partir de uma cotação transformada"""
+        row = {key: value for key, value in quote_data.items() if key in columns}
+        row.setdefault('close_price', quote_data.get('price'))
+        row.setdefault('date', quote_data.get('quote_datetime'))
+        if 'ticker_id' in columns and quote_data['ticker'] in ticker_ids:
+            row['ticker_id'] = ticker_ids[quote_data['ticker']]
+        return row
+    
+    def load_quotes(self, quotes_data):
+        """
+        Carrega um lote de cotações com INSERT ... ON CONFLICT (ticker, quote_datetime)
+        DO UPDATE, em uma única transação. Retorna o número de cotações gravadas.
+        O índice único da chave é criado por scripts/migrate_quotes_upsert_index.py
+        """
+        quotes_data = [q for q in quotes_data if q and q.get('ticker') and q.get('quote_datetime')]
+        if not quotes_data:
+            return 0
+        
         try:
-            # Verificar se ticker existe
-            ticker_obj = Ticker.query.filter_by(symbol=quote_data['ticker']).first()
-            if ticker_obj:
-                quote_data['ticker_id'] = ticker_obj.id
+            table = Quote.__table__
+            columns = set(table.c.keys())
+            ticker_ids = self._get_ticker_ids()
             
-            # Verificar se já existe cotação recente (últimos 5 minutos)
-            recent_quote = Quote.query.filter_by(
-                ticker=quote_data['ticker']
-            ).filter(
-                Quote.timestamp > datetime.utcnow() - timedelta(minutes=5)
-            ).first()
+            # O mesmo comando não pode atualizar uma linha duas vezes: a última cotação de cada chave vale
+            rows = {}
+            for quote_data in quotes_data:
+                row = self._quote_row(quote_data, columns, ticker_ids)
+                rows[(row['ticker'], row['quote_datetime'])] = row
+            rows = list(rows.values())
             
-            if recent_quote:
-                # Atualizar cotação existente
-                for key, value in quote_data.items():
-                    if hasattr(recent_quote, key):
-                        setattr(recent_quote, key, value)
-                quote = recent_quote
-            else:
-                # Criar nova cotação
-                quote = Quote(**quote_data)
-                db.session.add(quote)
+            # Todas as linhas de um comando precisam das mesmas colunas
+            row_columns = sorted(set().union(*rows))
+            update_columns = [c for c in row_columns if c not in ('id', 'ticker', 'quote_datetime', 'created_at')]
+            
+            for start in range(0, len(rows), UPSERT_PAGE_SIZE):
+                page = [{c: row.get(c) for c in row_columns} for row in rows[start:start + UPSERT_PAGE_SIZE]]
+                stmt = insert(table).values(page)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=['ticker', 'quote_datetime'],
+                    set_={c: stmt.excluded[c] for c in update_columns}
+                )
+                db.session.execute(stmt)
             
             db.session.commit()
-            return quote
+            return len(rows)
             
         except Exception as e:
-            logger.error(f"Erro ao carregar cotação: {str(e)}")
+            logger.error(f"Erro ao carregar lote de cotações: {str(e)}")
             db.session.rollback()
+            return 0
+    
+    def load_quote(self, quote_data):
+        """Carrega cotação no banco"""
+        if not quote_data:
             return None
+        return quote_data if self.load_quotes([quote_data]) else None
     
     def extract_ibovespa_composition(self):
         """Extrai composição do Ibovespa"""
@@ -169,72 +199,63 @@ class QuotesETL:
     def extract_currency_rates(self):
         """Extrai taxas de câmbio"""
         try:
-            currencies = ['USDBRL', 'EURBRL', 'GBPBRL']
-            rates = []
-            
-            for currency in currencies:
-                url = f"https://brapi.dev/api/quote/{currency}=X"
-                response = requests.get(url, timeout=30)
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    if 'results' in data and len(data['results']) > 0:
-                        rates.append({
-                            'symbol': currency,
-                            'rate': data['results'][0].get('regularMarketPrice', 0),
-                            'change': data['results'][0].get('regularMarketChange', 0),
-                            'change_percent': data['results'][0].get('regularMarketChangePercent', 0),
-                            'timestamp': datetime.utcnow()
-                        })
-            
-            return rates
+            result = self.poller.poll([], currencies=DEFAULT_CURRENCIES, deadline=POLL_INTERVAL_SECONDS)
+            return [self._currency_rate(quote) for quote in result.currencies]
             
         except Exception as e:
             logger.error(f"Erro ao buscar taxas de câmbio: {str(e)}")
             return []
     
+    def _currency_rate(self, quote):
+        return {
+            'symbol': quote['symbol'],
+            'rate': quote.get('regularMarketPrice', 0),
+            'change': quote.get('regularMarketChange', 0),
+            'change_percent': quote.get('regularMarketChangePercent', 0),
+            'timestamp': datetime.utcnow()
+        }
+    
     def run_real_time_etl(self):
         """Executa ETL de cotações em tempo real"""
         logger.info("Iniciando ETL de cotações em tempo real")
         
-        quotes_processed = 0
-        
         # 1. Buscar composição do Ibovespa
         ibov_tickers = self.extract_ibovespa_composition()
         logger.info(f"Encontrados {len(ibov_tickers)} papéis do Ibovespa")
         
-        # 2. Buscar cotações principais
-        main_quotes = self.extract_real_time_quotes(ibov_tickers[:30])  # Top 30
+        # 2. Buscar cotações de todo o universo listado e o câmbio em uma única coleta paralela
+        result = self.poller.poll(ibov_tickers, currencies=DEFAULT_CURRENCIES, deadline=POLL_INTERVAL_SECONDS)
+        if result.failed:
+            logger.warning(f"Coleta parcial: {len(result.failed)} símbolos falharam: {', '.join(result.failed[:20])}")
         
-        for quote_data in main_quotes:
-            transformed = self.transform_quote_data(quote_data)
-            if transformed:
-                quote = self.load_quote(transformed)
-                if quote:
-                    quotes_processed += 1
+        # Alimentar o buffer de ticks intradiários deste processo
+        tick_store.append_quotes(result.quotes)
         
-        # 3. Buscar taxas de câmbio
-        currency_rates = self.extract_currency_rates()
-        for rate_data in currency_rates:
-            transformed = self.transform_quote_data(rate_data)
-            if transformed:
-                quote = self.load_quote(transformed)
-                if quote:
-                    quotes_processed += 1
+        # 3. Gravar cotações e câmbio em um único lote
+        transformed = [self.transform_quote_data(q) for q in result.quotes + result.currencies]
+        quotes_processed = self.load_quotes(transformed)
+        
+        # Screeners dos workers da API reconstroem a matriz com as novas cotações
+        if quotes_processed:
+            publish_refresh(redis_client)
         
         logger.info(f"ETL de cotações concluído. {quotes_processed} cotações processadas")
         return quotes_processed
     
-    def run_historical_etl(self, days=30):
+    def run_historical_etl(self, days=30, tickers=None):
         """Executa ETL de dados históricos"""
         logger.info(f"Iniciando ETL histórico de {days} dias")
         
         # Buscar principais tickers
-        main_tickers = ['PETR4', 'VALE3', 'ITUB4', 'BBDC4', 'ABEV3', 'WEGE3', 'MGLU3', 'VVAR3']
+        main_tickers = tickers or ['PETR4', 'VALE3', 'ITUB4', 'BBDC4', 'ABEV3', 'WEGE3', 'MGLU3', 'VVAR3']
+        historical_quotes = []
         
-        for ticker in main_tickers:
-            historical_data = self.extract_historical_quotes(ticker, days)
-            
+        history = self.poller.history(main_tickers, days)
+        missing = [ticker for ticker in main_tickers if ticker not in history]
+        if missing:
+            logger.warning(f"Histórico não obtido para: {', '.join(missing)}")
+        
+        for ticker, historical_data in history.items():
             for hist_quote in historical_data:
                 # Transformar dados históricos
                 quote_data = {
@@ -247,17 +268,13 @@ class QuotesETL:
                     'timestamp': datetime.fromtimestamp(hist_quote.get('date', 0)),
                     'quote_datetime': datetime.fromtimestamp(hist_quote.get('date', 0))
                 }
-                
-                # Verificar se já existe
-                existing = Quote.query.filter_by(
-                    ticker=ticker,
-                    timestamp=quote_data['timestamp']
-                ).first()
-                
-                if not existing:
-                    self.load_quote(quote_data)
+                historical_quotes.append(quote_data)
+        
+        # Cotações já existentes são atualizadas pelo ON CONFLICT, sem consulta prévia
+        loaded = self.load_quotes(historical_quotes)
         
-        logger.info("ETL histórico concluído")
+        logger.info(f"ETL histórico concluído. {loaded} cotações gravadas")
+        return loaded
 
 if __name__ == '__main__':
     etl = QuotesETL()
@@ -4,6 +4,7 @@ import requests
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 import time
+from services.http_scheduler import ScheduledSession
 
 logger = logging.getLogger(__name__)
 
@@ -25,7 +26,7 @@ class ExternalAPIService:
         self.yahoo_base_url = "https://query1.finance.yahoo.com/v8/finance"
         
         # Request session for connection pooling
-        self.session = requests.Session()
+        self.session = ScheduledSession()
         self.session.headers.update({
             'User-Agent': 'MercadoBrasil-API/1.0.0',
             'Accept': 'application/json'
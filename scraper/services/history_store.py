@@ -0,0 +1,279 @@
+"""
+Memory-mapped daily price history, one append-only columnar file per ticker.
+
+File layout ({HISTORY_STORE_DIR}/{TICKER}.hist):
+
+    header (64 bytes): magic/version tag, row count, row capacity
+    date      int32[capacity]    B3 session day, days since 1970-01-01
+    open      float64[capacity]
+    high      float64[capacity]
+    low       float64[capacity]
+    close     float64[capacity]
+    adj_close float64[capacity]
+    volume    int64[capacity]
+
+Rows are kept sorted by date, which serves as the date index: range lookups are two
+binary searches on the date column and return zero-copy slices of the mapping.
+Appends write the new rows first and then bump the row count in the header, so
+readers never see a partial row. When capacity runs out the file is rewritten at
+twice the size and atomically renamed; mappings already handed out keep pointing at
+the old file. Writers take an exclusive flock, so several workers can share a directory.
+"""
+import fcntl
+import logging
+import os
+import struct
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from services.bar_builder import MARKET_TZ, MARKET_UTC_OFFSET
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DIR = os.getenv('HISTORY_STORE_DIR', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'history'))
+INITIAL_CAPACITY = 4096       # ~16 years of sessions
+
+MAGIC = b'MTHIST01'
+HEADER = struct.Struct('<8sQQ')   # magic, count, capacity
+HEADER_SIZE = 64
+
+COLUMNS = (
+    ('date', np.dtype('<i4')),
+    ('open', np.dtype('<f8')),
+    ('high', np.dtype('<f8')),
+    ('low', np.dtype('<f8')),
+    ('close', np.dtype('<f8')),
+    ('adj_close', np.dtype('<f8')),
+    ('volume', np.dtype('<i8')),
+)
+
+def session_day(timestamp: float) -> int:
+    """B3 session day (days since epoch) of an epoch timestamp"""
+    return int((int(timestamp) + MARKET_UTC_OFFSET) // 86400)
+
+def day_start(days) -> np.ndarray:
+    """Epoch seconds of local midnight for session days (same as 1d bar starts)"""
+    return np.asarray(days, dtype=np.int64) * 86400 - MARKET_UTC_OFFSET
+
+def _column_offsets(capacity: int) -> Dict[str, int]:
+    offsets, position = {}, HEADER_SIZE
+    for name, dtype in COLUMNS:
+        offsets[name] = position
+        position += capacity * dtype.itemsize
+    return offsets
+
+def _file_size(capacity: int) -> int:
+    return HEADER_SIZE + capacity * sum(dtype.itemsize for _, dtype in COLUMNS)
+
+def _missing_column(dtype: np.dtype, size: int) -> np.ndarray:
+    """Fill for a column the caller did not send: NaN prices, zero volume"""
+    if dtype.kind in 'iu':
+        return np.zeros(size, dtype=dtype)
+    return np.full(size, np.nan, dtype=dtype)
+
+class _Mapping:
+    """Read-only mapping of one history file"""
+
+    def __init__(self, path: str):
+        stat = os.stat(path)
+        self.identity = (stat.st_ino, stat.st_size)
+        self._raw = np.memmap(path, dtype=np.uint8, mode='r')
+        magic, _, capacity = HEADER.unpack_from(self._raw, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a history file")
+        self.capacity = capacity
+        offsets = _column_offsets(capacity)
+        self.columns = {
+            name: np.frombuffer(self._raw, dtype=dtype, count=capacity, offset=offsets[name])
+            for name, dtype in COLUMNS
+        }
+
+    @property
+    def count(self) -> int:
+        return HEADER.unpack_from(self._raw, 0)[1]
+
+class HistoryStore:
+    """Per-ticker daily OHLCV files with zero-copy range reads"""
+
+    def __init__(self, root: str = DEFAULT_DIR, initial_capacity: int = INITIAL_CAPACITY):
+        self.root = root
+        self.initial_capacity = initial_capacity
+        self._mappings: Dict[str, _Mapping] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, ticker: str) -> str:
+        return os.path.join(self.root, f"{ticker.upper()}.hist")
+
+    def _mapping(self, ticker: str) -> Optional[_Mapping]:
+        path = self._path(ticker)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        mapping = self._mappings.get(ticker)
+        if mapping is None or mapping.identity != (stat.st_ino, stat.st_size):
+            with self._lock:
+                mapping = _Mapping(path)
+                self._mappings[ticker] = mapping
+        return mapping
+
+    def read(self, ticker: str, start: Optional[date] = None, end: Optional[date] = None) -> Dict[str, np.ndarray]:
+        """Columns for sessions in [start, end] as read-only views of the file"""
+        ticker = ticker.upper()
+        mapping = self._mapping(ticker)
+        if mapping is None:
+            return {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS}
+        count = mapping.count
+        dates = mapping.columns['date'][:count]
+        lo = int(np.searchsorted(dates, _to_day(start), side='left')) if start else 0
+        hi = int(np.searchsorted(dates, _to_day(end), side='right')) if end else count
+        return {name: column[lo:hi] for name, column in mapping.columns.items()}
+
+    def tickers(self) -> List[str]:
+        """Tickers with a history file"""
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-len('.hist')] for name in names if name.endswith('.hist'))
+
+    def last_date(self, ticker: str) -> Optional[date]:
+        mapping = self._mapping(ticker.upper())
+        if mapping is None or not mapping.count:
+            return None
+        return date(1970, 1, 1) + timedelta(days=int(mapping.columns['date'][mapping.count - 1]))
+
+    def append(self, ticker: str, rows: Dict[str, np.ndarray]) -> int:
+        """
+        Append rows (dict of columns, 'date' in session days). Rows older than the last
+        stored session are ignored; a row for the last session replaces it, since the
+        current day's bar keeps changing until the close. Returns the number of rows written
+        """
+        ticker = ticker.upper()
+        days = np.asarray(rows['date'], dtype=np.int32)
+        if days.size == 0:
+            return 0
+        order = np.argsort(days, kind='stable')
+        days = days[order]
+        # Last value wins when the same session comes twice
+        keep = np.append(days[1:] != days[:-1], True)
+        columns = {
+            name: np.asarray(rows[name] if name in rows else _missing_column(dtype, order.size),
+                             dtype=dtype)[order][keep]
+            for name, dtype in COLUMNS
+        }
+
+        path = self._path(ticker)
+        os.makedirs(self.root, exist_ok=True)
+        with open(path + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            if not os.path.exists(path):
+                self._create(path, max(self.initial_capacity, int(keep.sum())))
+
+            mapping = _Mapping(path)
+            count, capacity = mapping.count, mapping.capacity
+            position = count
+            if count:
+                last = mapping.columns['date'][count - 1]
+                new = columns['date'] >= last
+                columns = {name: values[new] for name, values in columns.items()}
+                if columns['date'].size and columns['date'][0] == last:
+                    position = count - 1
+            added = int(columns['date'].size)
+            if not added:
+                return 0
+
+            if position + added > capacity:
+                capacity = self._grow(path, count, max(capacity * 2, position + added))
+
+            offsets = _column_offsets(capacity)
+            with open(path, 'r+b') as handle:
+                for name, dtype in COLUMNS:
+                    handle.seek(offsets[name] + position * dtype.itemsize)
+                    handle.write(columns[name].tobytes())
+                handle.flush()
+                # Publishing the new row count makes the rows visible to readers
+                handle.seek(0)
+                handle.write(HEADER.pack(MAGIC, position + added, capacity))
+            return added
+
+    def _create(self, path: str, capacity: int) -> None:
+        temp = path + '.tmp'
+        with open(temp, 'wb') as handle:
+            handle.truncate(_file_size(capacity))
+            handle.write(HEADER.pack(MAGIC, 0, capacity))
+        os.replace(temp, path)
+
+    def _grow(self, path: str, count: int, capacity: int) -> int:
+        old = _Mapping(path)
+        temp = path + '.tmp'
+        offsets = _column_offsets(capacity)
+        with open(temp, 'wb') as handle:
+            handle.truncate(_file_size(capacity))
+            handle.write(HEADER.pack(MAGIC, count, capacity))
+            for name, _ in COLUMNS:
+                handle.seek(offsets[name])
+                handle.write(old.columns[name][:count].tobytes())
+        os.replace(temp, path)
+        return capacity
+
+def _to_day(value) -> int:
+    if isinstance(value, datetime):
+        return session_day(value.timestamp())
+    if isinstance(value, date):
+        return (value - date(1970, 1, 1)).days
+    return int(value)
+
+def rows_from_brapi(historical_data: Iterable[Dict]) -> Dict[str, np.ndarray]:
+    """Columns from brapi historicalDataPrice entries"""
+    entries = [entry for entry in historical_data if entry.get('date') and entry.get('close') is not None]
+    return {
+        'date': np.array([session_day(entry['date']) for entry in entries], dtype=np.int32),
+        'open': np.array([entry.get('open') or np.nan for entry in entries], dtype=np.float64),
+        'high': np.array([entry.get('high') or np.nan for entry in entries], dtype=np.float64),
+        'low': np.array([entry.get('low') or np.nan for entry in entries], dtype=np.float64),
+        'close': np.array([entry.get('close') for entry in entries], dtype=np.float64),
+        'adj_close': np.array([entry.get('adjustedClose') or entry.get('close') for entry in entries], dtype=np.float64),
+        'volume': np.array([entry.get('volume') or 0 for entry in entries], dtype=np.int64),
+    }
+
+def columns_to_records(columns: Dict[str, np.ndarray]) -> List[Dict]:
+    """Rows in the historicalDataPrice layout the endpoints already consume"""
+    dates = day_start(columns['date']).tolist()
+    # Missing prices are NaN in the file and None in JSON
+    fields = [
+        [None if value != value else value for value in columns[name].tolist()]
+        for name in ('open', 'high', 'low', 'close', 'adj_close')
+    ]
+    fields.append(columns['volume'].tolist())
+    return [
+        {
+            'date': day,
+            'open': open_,
+            'high': high,
+            'low': low,
+            'close': close,
+            'adjustedClose': adj_close,
+            'volume': volume,
+        }
+        for day, (open_, high, low, close, adj_close, volume) in zip(dates, zip(*fields))
+    ]
+
+def upstream_range_for(last: Optional[date], today: date) -> str:
+    """Smallest brapi range covering the sessions missing since `last`"""
+    if last is None:
+        return 'max'
+    gap = (today - last).days
+    for days, brapi_range in ((5, '5d'), (30, '1mo'), (90, '3mo'), (180, '6mo'), (365, '1y'), (730, '2y'), (1825, '5y')):
+        if gap <= days:
+            return brapi_range
+    return 'max'
+
+def market_today() -> date:
+    return datetime.now(MARKET_TZ).date()
+
+# Process-wide store
+history_store = HistoryStore()
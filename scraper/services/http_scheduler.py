@@ -0,0 +1,249 @@
+"""
+Agendador central de requisições HTTP para os scrapers
+Controla a taxa por host (token bucket) e a concorrência de forma adaptativa (AIMD),
+substituindo os time.sleep fixos espalhados pelos scrapers
+"""
+import logging
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Limites por host: taxa inicial/máxima (req/s), rajada e concorrência máxima.
+# Hosts não listados usam DEFAULT_HOST_LIMITS.
+DEFAULT_HOST_LIMITS = {
+    'rate': 2.0,
+    'min_rate': 0.2,
+    'max_rate': 10.0,
+    'burst': 4,
+    'max_concurrency': 8,
+}
+
+HOST_LIMITS = {
+    # Portal ASP.NET da CVM: sensível a carga, começa devagar
+    'www.rad.cvm.gov.br': {'rate': 0.5, 'max_rate': 2.0, 'burst': 1, 'max_concurrency': 2},
+    # Arquivos estáticos do portal de dados abertos
+    'dados.cvm.gov.br': {'rate': 2.0, 'max_rate': 8.0, 'burst': 4, 'max_concurrency': 4},
+    'api.bcb.gov.br': {'rate': 3.0, 'max_rate': 10.0, 'burst': 5, 'max_concurrency': 6},
+    'brapi.dev': {'rate': 2.0, 'max_rate': 10.0, 'burst': 5, 'max_concurrency': 4},
+    'www.b3.com.br': {'rate': 1.0, 'max_rate': 4.0, 'burst': 2, 'max_concurrency': 2},
+}
+
+# Sinais de congestionamento
+BACKOFF_STATUS_CODES = {429, 500, 502, 503, 504}
+LATENCY_TOLERANCE = 2.0      # EWMA de latência acima de 2x a linha de base conta como congestionamento
+LATENCY_ALPHA = 0.2          # Peso da última amostra na EWMA
+BASELINE_DRIFT = 0.01        # Velocidade com que a linha de base acompanha latências maiores
+DECREASE_FACTOR = 0.5
+RATE_STEP = 0.1              # Incremento aditivo da taxa (req/s) por requisição saudável
+
+
+class HostState:
+    """Estado de agendamento de um host: token bucket, limite AIMD e métricas"""
+
+    def __init__(self, host: str, rate: float, min_rate: float, max_rate: float,
+                 burst: int, max_concurrency: int):
+        self.host = host
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+
+        self.tokens = float(burst)
+        self.last_refill = time.monotonic()
+        self.concurrency_limit = 1.0
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+
+        self.ewma_latency: Optional[float] = None
+        self.baseline_latency: Optional[float] = None
+
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self.backoffs = 0
+        self.wait_time = 0.0
+
+        self._cond = threading.Condition()
+
+    def _refill(self, now: float):
+        elapsed = now - self.last_refill
+        self.tokens = min(float(self.burst), self.tokens + elapsed * self.rate)
+        self.last_refill = now
+
+    def acquire(self):
+        """Bloqueia até haver vaga de concorrência e um token disponível para o host"""
+        started = time.monotonic()
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+
+                if now < self.paused_until:
+                    timeout = self.paused_until - now
+                elif self.in_flight >= int(self.concurrency_limit):
+                    timeout = None  # Aguarda uma requisição terminar
+                elif self.tokens < 1.0:
+                    timeout = (1.0 - self.tokens) / self.rate
+                else:
+                    self.tokens -= 1.0
+                    self.in_flight += 1
+                    self.requests += 1
+                    self.wait_time += now - started
+                    return
+
+                self._cond.wait(timeout=timeout)
+
+    def release(self, latency: Optional[float], status_code: Optional[int] = None,
+                retry_after: Optional[float] = None):
+        """Registra o resultado de uma requisição e ajusta taxa e concorrência (AIMD)"""
+        with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+
+            congested = False
+            if status_code is None:
+                self.errors += 1
+                congested = True
+            elif status_code in BACKOFF_STATUS_CODES:
+                self.errors += 1
+                congested = True
+                if status_code == 429:
+                    self.throttled += 1
+                if retry_after:
+                    self.paused_until = max(self.paused_until, now + retry_after)
+
+            if latency is not None:
+                self._observe_latency(latency)
+                if (self.baseline_latency and
+                        self.ewma_latency > self.baseline_latency * LATENCY_TOLERANCE):
+                    congested = True
+
+            if congested:
+                self._decrease(now)
+            else:
+                self._increase()
+
+            self._cond.notify_all()
+
+    def _observe_latency(self, latency: float):
+        if self.ewma_latency is None:
+            self.ewma_latency = latency
+        else:
+            self.ewma_latency = (1 - LATENCY_ALPHA) * self.ewma_latency + LATENCY_ALPHA * latency
+
+        if self.baseline_latency is None or self.ewma_latency < self.baseline_latency:
+            self.baseline_latency = self.ewma_latency
+        else:
+            self.baseline_latency += (self.ewma_latency - self.baseline_latency) * BASELINE_DRIFT
+
+    def _increase(self):
+        # Aumento aditivo: ~+1 de concorrência por janela completa de requisições
+        self.concurrency_limit = min(float(self.max_concurrency),
+                                     self.concurrency_limit + 1.0 / self.concurrency_limit)
+        self.rate = min(self.max_rate, self.rate + RATE_STEP / max(self.rate, 1.0))
+
+    def _decrease(self, now: float):
+        # Redução multiplicativa, no máximo uma vez por janela de latência
+        cooldown = max(1.0, self.ewma_latency or 0.0)
+        if now - self.last_decrease < cooldown:
+            return
+        self.last_decrease = now
+        self.backoffs += 1
+        self.concurrency_limit = max(1.0, self.concurrency_limit * DECREASE_FACTOR)
+        self.rate = max(self.min_rate, self.rate * DECREASE_FACTOR)
+        logger.info(f"Backoff em {self.host}: taxa {self.rate:.2f} req/s, "
+                    f"concorrência {int(self.concurrency_limit)}")
+
+    def metrics(self) -> Dict:
+        with self._cond:
+            return {
+                'requests': self.requests,
+                'errors': self.errors,
+                'throttled': self.throttled,
+                'backoffs': self.backoffs,
+                'in_flight': self.in_flight,
+                'concurrency_limit': int(self.concurrency_limit),
+                'rate_per_second': round(self.rate, 3),
+                'ewma_latency_ms': round(self.ewma_latency * 1000, 1) if self.ewma_latency else None,
+                'baseline_latency_ms': round(self.baseline_latency * 1000, 1) if self.baseline_latency else None,
+                'total_wait_seconds': round(self.wait_time, 3),
+            }
+
+
+class HTTPScheduler:
+    """Agendador compartilhado por todas as sessões dos scrapers"""
+
+    def __init__(self, host_limits: Optional[Dict[str, Dict]] = None):
+        self.host_limits = host_limits if host_limits is not None else HOST_LIMITS
+        self._hosts: Dict[str, HostState] = {}
+        self._lock = threading.Lock()
+
+    def _get_host(self, host: str) -> HostState:
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None:
+                limits = {**DEFAULT_HOST_LIMITS, **self.host_limits.get(host, {})}
+                state = HostState(host, **limits)
+                self._hosts[host] = state
+            return state
+
+    @staticmethod
+    def _retry_after(response: requests.Response) -> Optional[float]:
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return None
+
+    def request(self, send, method: str, url: str, **kwargs) -> requests.Response:
+        """Executa send(method, url, **kwargs) respeitando os limites do host"""
+        state = self._get_host(urlparse(url).netloc.lower())
+        state.acquire()
+
+        started = time.monotonic()
+        try:
+            response = send(method, url, **kwargs)
+        except Exception:
+            # Timeouts e erros de conexão também contam como congestionamento
+            state.release(None)
+            raise
+
+        # Latência até os cabeçalhos: o download do corpo (CSVs grandes) não é sinal de congestionamento
+        latency = response.elapsed.total_seconds() if response.elapsed else time.monotonic() - started
+        state.release(latency, response.status_code, self._retry_after(response))
+        return response
+
+    def get_metrics(self) -> Dict[str, Dict]:
+        """Métricas por host"""
+        with self._lock:
+            hosts = list(self._hosts.values())
+        return {state.host: state.metrics() for state in hosts}
+
+
+class ScheduledSession(requests.Session):
+    """requests.Session cujas requisições passam pelo agendador compartilhado"""
+
+    def __init__(self, scheduler: Optional[HTTPScheduler] = None):
+        super().__init__()
+        self.scheduler = scheduler or http_scheduler
+
+    def request(self, method, url, *args, **kwargs):
+        if args:
+            # Mantém compatibilidade com chamadas posicionais de requests.Session.request
+            names = ['params', 'data', 'headers', 'cookies', 'files', 'auth', 'timeout',
+                     'allow_redirects', 'proxies', 'hooks', 'stream', 'verify', 'cert', 'json']
+            kwargs.update(zip(names, args))
+        return self.scheduler.request(super().request, method, url, **kwargs)
+
+
+# Global instance
+http_scheduler = HTTPScheduler()
@@ -0,0 +1,335 @@
+"""
+Full-series technical indicators over the daily history store.
+
+Tickers are processed in batches: each batch is stacked into a (tickers x sessions)
+matrix, right-aligned so column -1 is every ticker's latest session and shorter
+histories are padded with NaN on the left. Window indicators (SMA, Bollinger) are
+differences of cumulative sums; recursive ones (EMA, Wilder RSI/ATR, MACD) walk the
+session axis once with the whole cross-section updated per step. The whole series
+of every indicator comes out, not just the latest value.
+
+Results are upserted into technical_indicators with paged INSERT ... ON CONFLICT
+(ticker, indicator_date) DO UPDATE. After the first full run only the sessions from
+the last stored date on are written again, unless the close stored for that date no
+longer matches: a new dividend or split rescaled the adjusted history before it, so the
+ticker is written again in full.
+"""
+import logging
+import time
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BATCH_TICKERS = 128           # Tickers per matrix (bounds memory on long histories)
+UPSERT_PAGE_SIZE = 1000
+
+SMA_PERIODS = (20, 50, 200)
+EMA_PERIODS = (12, 20, 26, 50)
+RSI_PERIOD = 14
+MACD_PERIODS = (12, 26, 9)    # fast, slow, signal
+BOLLINGER_PERIOD, BOLLINGER_WIDTH = 20, 2.0
+ATR_PERIOD = 14
+
+INDICATOR_COLUMNS = (
+    'close', 'sma_20', 'sma_50', 'sma_200', 'ema_12', 'ema_20', 'ema_26', 'ema_50',
+    'rsi', 'macd_line', 'macd_signal', 'macd_histogram',
+    'bb_upper', 'bb_middle', 'bb_lower', 'atr', 'obv',
+)
+
+def stack(series: List[np.ndarray], dtype=np.float64) -> np.ndarray:
+    """Right-aligned matrix of 1-D series, NaN-padded on the left"""
+    width = max((values.size for values in series), default=0)
+    matrix = np.full((len(series), width), np.nan, dtype=dtype)
+    for row, values in enumerate(series):
+        if values.size:
+            matrix[row, width - values.size:] = values
+    return matrix
+
+def _rolling(x: np.ndarray, n: int):
+    """Windowed sum and count of the finite values over the last n sessions"""
+    finite = np.isfinite(x)
+    values = np.where(finite, x, 0.0)
+    pad = np.zeros(x.shape[:-1] + (1,))
+    sums = np.concatenate((pad, np.cumsum(values, axis=-1)), axis=-1)
+    counts = np.concatenate((pad, np.cumsum(finite, axis=-1)), axis=-1)
+    window_sum = np.full(x.shape, np.nan)
+    window_count = np.zeros(x.shape)
+    if x.shape[-1] >= n:
+        window_sum[..., n - 1:] = sums[..., n:] - sums[..., :-n]
+        window_count[..., n - 1:] = counts[..., n:] - counts[..., :-n]
+    return window_sum, window_count
+
+def sma(x: np.ndarray, n: int) -> np.ndarray:
+    """Simple moving average; NaN until n values are available"""
+    window_sum, count = _rolling(x, n)
+    return np.where(count == n, window_sum / n, np.nan)
+
+def rolling_std(x: np.ndarray, n: int) -> np.ndarray:
+    """Population standard deviation over n sessions (Bollinger convention)"""
+    # Shifting by each row's first value keeps the sum of squares from cancelling out
+    finite = np.isfinite(x)
+    first = np.argmax(finite, axis=-1)
+    reference = np.take_along_axis(np.where(finite, x, 0.0), first[..., None], axis=-1)
+    shifted = x - reference
+    window_sum, count = _rolling(shifted, n)
+    window_squares, _ = _rolling(shifted * shifted, n)
+    mean = window_sum / n
+    variance = np.maximum(window_squares / n - mean * mean, 0.0)
+    return np.where(count == n, np.sqrt(variance), np.nan)
+
+def ema(x: np.ndarray, n: int, alpha: Optional[float] = None) -> np.ndarray:
+    """
+    Exponential moving average seeded with the SMA of the first n values. A missing
+    value keeps the previous average
+    """
+    alpha = 2.0 / (n + 1) if alpha is None else alpha
+    x = np.atleast_2d(x)
+    seed = sma(x, n)
+    out = np.full(x.shape, np.nan)
+    previous = np.full(x.shape[0], np.nan)
+    for t in range(x.shape[1]):
+        current = x[:, t]
+        step = np.where(np.isnan(current), previous, previous + alpha * (current - previous))
+        previous = np.where(np.isnan(previous), seed[:, t], step)
+        out[:, t] = previous
+    return out
+
+def wilder(x: np.ndarray, n: int) -> np.ndarray:
+    """Wilder smoothing (EMA with alpha = 1/n), used by RSI and ATR"""
+    return ema(x, n, alpha=1.0 / n)
+
+def _diff(x: np.ndarray) -> np.ndarray:
+    out = np.full(x.shape, np.nan)
+    out[..., 1:] = x[..., 1:] - x[..., :-1]
+    return out
+
+def rsi(close: np.ndarray, n: int = RSI_PERIOD) -> np.ndarray:
+    """Relative Strength Index with Wilder smoothing"""
+    close = np.atleast_2d(close)
+    delta = _diff(close)
+    gains = np.where(np.isnan(delta), np.nan, np.maximum(delta, 0.0))
+    losses = np.where(np.isnan(delta), np.nan, np.maximum(-delta, 0.0))
+    average_gain, average_loss = wilder(gains, n), wilder(losses, n)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        value = 100.0 - 100.0 / (1.0 + average_gain / average_loss)
+    # No losses in the window: RSI is 100 (0 / 0 when the price did not move at all: 50)
+    value = np.where(average_loss == 0, np.where(average_gain == 0, 50.0, 100.0), value)
+    return np.where(np.isnan(average_gain) | np.isnan(average_loss), np.nan, value)
+
+def bollinger(close: np.ndarray, n: int = BOLLINGER_PERIOD, width: float = BOLLINGER_WIDTH):
+    """Upper, middle and lower Bollinger bands"""
+    middle = sma(close, n)
+    deviation = rolling_std(close, n)
+    return middle + width * deviation, middle, middle - width * deviation
+
+def true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    previous_close = np.full(close.shape, np.nan)
+    previous_close[..., 1:] = close[..., :-1]
+    # fmax skips the missing previous close of the first session (range = high - low)
+    return np.fmax(high - low, np.fmax(np.abs(high - previous_close), np.abs(low - previous_close)))
+
+def atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, n: int = ATR_PERIOD) -> np.ndarray:
+    """Average True Range with Wilder smoothing"""
+    return wilder(true_range(high, low, close), n)
+
+def obv(close: np.ndarray, volume: np.ndarray) -> np.ndarray:
+    """On-Balance Volume, starting at 0 on each ticker's first session"""
+    direction = np.nan_to_num(np.sign(_diff(close)))
+    flow = direction * np.nan_to_num(volume)
+    return np.where(np.isnan(close), np.nan, np.cumsum(flow, axis=-1))
+
+def compute_indicators(columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Every indicator column for a stacked batch (or a single series)"""
+    close = np.atleast_2d(columns['close']).astype(np.float64)
+    high = np.atleast_2d(columns.get('high', close)).astype(np.float64)
+    low = np.atleast_2d(columns.get('low', close)).astype(np.float64)
+    volume = np.atleast_2d(columns.get('volume', np.zeros(close.shape))).astype(np.float64)
+    # Sessions without high/low fall back to the close
+    high = np.where(np.isnan(high), close, high)
+    low = np.where(np.isnan(low), close, low)
+
+    result = {'close': close}
+    for n in SMA_PERIODS:
+        result[f'sma_{n}'] = sma(close, n)
+    emas = {n: ema(close, n) for n in set(EMA_PERIODS) | set(MACD_PERIODS[:2])}
+    for n in EMA_PERIODS:
+        result[f'ema_{n}'] = emas[n]
+    result['rsi'] = rsi(close)
+    line = emas[MACD_PERIODS[0]] - emas[MACD_PERIODS[1]]
+    result['macd_line'] = line
+    result['macd_signal'] = ema(line, MACD_PERIODS[2])
+    result['macd_histogram'] = line - result['macd_signal']
+    result['bb_upper'], result['bb_middle'], result['bb_lower'] = bollinger(close)
+    result['atr'] = atr(high, low, close)
+    result['obv'] = obv(close, volume)
+    return result
+
+def _as_datetimes(days: np.ndarray) -> list:
+    return np.asarray(days, dtype='datetime64[D]').astype('datetime64[s]').tolist()
+
+class IndicatorEngine:
+    """Batch computation of indicator series for the tickers in the history store"""
+
+    def __init__(self, history_store, adjustments=None, batch_size: int = BATCH_TICKERS):
+        self.history = history_store
+        self.adjustments = adjustments
+        self.batch_size = batch_size
+
+    def _columns(self, session, ticker: str) -> Dict[str, np.ndarray]:
+        if self.adjustments is not None and session is not None:
+            try:
+                return self.adjustments.adjusted(session, ticker)
+            except Exception as e:
+                # Keep the session usable for the next tickers and the upsert
+                session.rollback()
+                logger.error(f"Adjustment failed for {ticker}, using raw prices: {str(e)}")
+        return self.history.read(ticker)
+
+    def compute(self, session, tickers: List[str]) -> Dict[str, Dict[str, np.ndarray]]:
+        """Indicator series per ticker ('date' in session days plus INDICATOR_COLUMNS)"""
+        results = {}
+        for first in range(0, len(tickers), self.batch_size):
+            batch = {}
+            for ticker in tickers[first:first + self.batch_size]:
+                columns = self._columns(session, ticker.upper())
+                if columns['date'].size:
+                    batch[ticker.upper()] = columns
+            if not batch:
+                continue
+            names = list(batch)
+            stacked = {
+                name: stack([batch[ticker][name].astype(np.float64) for ticker in names])
+                for name in ('close', 'high', 'low', 'volume')
+            }
+            indicators = compute_indicators(stacked)
+            for row, ticker in enumerate(names):
+                size = batch[ticker]['date'].size
+                series = {name: values[row, -size:] for name, values in indicators.items()}
+                series['date'] = np.asarray(batch[ticker]['date'])
+                results[ticker] = series
+        return results
+
+    def persist(self, session, results: Dict[str, Dict[str, np.ndarray]],
+                since: Optional[Dict[str, date]] = None) -> int:
+        """Upsert indicator rows; with `since`, only sessions on or after each ticker's date"""
+        from sqlalchemy.dialects.postgresql import insert
+        from models_extended import TechnicalIndicator
+
+        table = TechnicalIndicator.__table__
+        table.create(bind=session.get_bind(), checkfirst=True)
+        since = since or {}
+
+        rows = []
+        for ticker, series in results.items():
+            days = series['date']
+            lo = 0
+            if ticker in since:
+                lo = int(np.searchsorted(days, (since[ticker] - date(1970, 1, 1)).days, side='left'))
+            if lo >= days.size:
+                continue
+            values = [
+                [None if value != value else value for value in series[name][lo:].tolist()]
+                for name in INDICATOR_COLUMNS
+            ]
+            for indicator_date, row in zip(_as_datetimes(days[lo:]), zip(*values)):
+                record = dict(zip(INDICATOR_COLUMNS, row))
+                record['ticker'] = ticker
+                record['indicator_date'] = indicator_date
+                rows.append(record)
+
+        try:
+            for start in range(0, len(rows), UPSERT_PAGE_SIZE):
+                stmt = insert(table).values(rows[start:start + UPSERT_PAGE_SIZE])
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=['ticker', 'indicator_date'],
+                    set_={name: stmt.excluded[name] for name in INDICATOR_COLUMNS}
+                )
+                session.execute(stmt)
+            session.commit()
+        except Exception as e:
+            logger.error(f"Error writing technical indicators: {str(e)}")
+            session.rollback()
+            return 0
+        return len(rows)
+
+    def last_stored(self, session) -> Dict[str, Tuple[date, Optional[float]]]:
+        """Latest indicator date already stored per ticker, with the close stored for it"""
+        from sqlalchemy import and_, func
+        from models_extended import TechnicalIndicator
+
+        try:
+            latest = session.query(
+                TechnicalIndicator.ticker, func.max(TechnicalIndicator.indicator_date).label('last')
+            ).group_by(TechnicalIndicator.ticker).subquery()
+            rows = session.query(
+                TechnicalIndicator.ticker, TechnicalIndicator.indicator_date, TechnicalIndicator.close
+            ).join(latest, and_(TechnicalIndicator.ticker == latest.c.ticker,
+                                TechnicalIndicator.indicator_date == latest.c.last)).all()
+        except Exception as e:
+            logger.warning(f"Could not read stored indicator dates: {str(e)}")
+            session.rollback()
+            return {}
+        return {ticker: (last.date(), close) for ticker, last, close in rows if last}
+
+    @staticmethod
+    def resume_dates(results: Dict[str, Dict[str, np.ndarray]],
+                     stored: Dict[str, Tuple[date, Optional[float]]]) -> Dict[str, date]:
+        """
+        Date each ticker is written from. Tickers whose stored close differs from the
+        recomputed one (adjusted by an event found since the last run) are left out, so
+        every session is written again
+        """
+        since = {}
+        for ticker, (last, close) in stored.items():
+            series = results.get(ticker)
+            if series is None:
+                continue
+            day = (last - date(1970, 1, 1)).days
+            position = int(np.searchsorted(series['date'], day))
+            if (position < series['date'].size and series['date'][position] == day and close is not None
+                    and np.isclose(series['close'][position], close, rtol=1e-6)):
+                since[ticker] = last
+            else:
+                logger.info(f"Stored indicators of {ticker} are stale, rewriting all sessions")
+        return since
+
+    def run(self, session, tickers: Optional[List[str]] = None, full: bool = False) -> Dict:
+        """Compute every ticker and write the new sessions (all sessions with full=True)"""
+        started = time.monotonic()
+        tickers = [ticker.upper() for ticker in (tickers or self.history.tickers())]
+        stored = {} if full else self.last_stored(session)
+        written = 0
+        # Batches are computed and written one at a time so a long run holds one matrix at most
+        for first in range(0, len(tickers), self.batch_size):
+            results = self.compute(session, tickers[first:first + self.batch_size])
+            written += self.persist(session, results, self.resume_dates(results, stored))
+        summary = {'tickers': len(tickers), 'rows': written, 'seconds': round(time.monotonic() - started, 3)}
+        logger.info(f"Technical indicators: {summary}")
+        return summary
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description='Compute technical indicator series from the daily history store')
+    parser.add_argument('--tickers', nargs='*', help='Only these tickers (default: every stored history)')
+    parser.add_argument('--full', action='store_true', help='Rewrite every session instead of only the new ones')
+    parser.add_argument('--unadjusted', action='store_true', help='Use raw prices instead of corporate-action adjusted ones')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    from app import app, db, redis_client
+    from services.corporate_actions import AdjustmentEngine
+    from services.history_store import history_store
+
+    adjustments = None if args.unadjusted else AdjustmentEngine(redis_client, history_store)
+    with app.app_context():
+        result = IndicatorEngine(history_store, adjustments).run(db.session, args.tickers, args.full)
+    if result['rows']:
+        from services.screener import publish_refresh
+        publish_refresh(redis_client)
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,185 @@
+import fnmatch
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Only near-static namespaces live in the in-process tier; everything else goes to Redis
+L1_TTL_BY_PREFIX = {
+    'company:': 300,
+    'statements:': 300,
+    'financial:': 300,
+    'ratios:': 300,
+    'sector:': 300,
+    'macro:': 300,
+    'dividends:': 300,
+    'market:': 30,
+}
+
+INVALIDATION_CHANNEL = 'cache:invalidate'
+
+def l1_ttl_for(key: str) -> Optional[int]:
+    """L1 TTL for key, or None if the key should not be kept in process"""
+    for prefix, ttl in L1_TTL_BY_PREFIX.items():
+        if key.startswith(prefix):
+            return ttl
+    return None
+
+class LocalCache:
+    """
+    Bounded in-process LRU/TTL cache of decoded objects, with size accounting.
+    Cached objects are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict = OrderedDict()  # key -> (value, expires_at, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at, size = entry
+            if time.monotonic() >= expires_at:
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any, ttl: int, size: int):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + ttl, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, keys: Iterable[str]) -> int:
+        with self._lock:
+            removed = 0
+            for key in keys:
+                if key in self._entries:
+                    self._remove(key)
+                    removed += 1
+            return removed
+
+    def delete_pattern(self, pattern: str) -> int:
+        with self._lock:
+            matches = [key for key in self._entries if fnmatch.fnmatchcase(key, pattern)]
+            for key in matches:
+                self._remove(key)
+            return len(matches)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key: str):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            }
+
+class InvalidationBus:
+    """
+    Broadcasts L1 invalidations over Redis pub/sub. Each process listens on a daemon
+    thread and drops the published keys/patterns from its own LocalCache; messages
+    from the same process are ignored since it has already applied them.
+    """
+
+    def __init__(self, redis_client, cache: LocalCache, channel: str = INVALIDATION_CHANNEL):
+        self.redis = redis_client
+        self.cache = cache
+        self.channel = channel
+        self.origin = uuid.uuid4().hex
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._listen, daemon=True, name='cache-invalidation')
+            self._thread.start()
+
+    def publish(self, keys: Iterable[str] = (), patterns: Iterable[str] = ()):
+        """Apply the invalidation locally and broadcast it to the other workers"""
+        keys, patterns = list(keys), list(patterns)
+        self.cache.delete(keys)
+        for pattern in patterns:
+            self.cache.delete_pattern(pattern)
+        try:
+            self.redis.publish(self.channel, json.dumps({
+                'origin': self.origin, 'keys': keys, 'patterns': patterns
+            }))
+        except Exception as e:
+            logger.error(f"Cache invalidation publish error: {str(e)}")
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                # Invalidations may have been missed while disconnected
+                self.cache.clear()
+                for message in pubsub.listen():
+                    self._apply(message)
+            except Exception as e:
+                logger.error(f"Cache invalidation listener error: {str(e)}")
+                time.sleep(1)
+
+    def _apply(self, message):
+        if message.get('type') != 'message':
+            return
+        try:
+            data = json.loads(message['data'])
+        except (TypeError, ValueError):
+            return
+        if data.get('origin') == self.origin:
+            return
+        self.cache.delete(data.get('keys') or [])
+        for pattern in data.get('patterns') or []:
+            self.cache.delete_pattern(pattern)
+
+# Process-wide L1 tier shared by CacheService and DataFetcher
+local_cache = LocalCache()
+_bus: Optional[InvalidationBus] = None
+_bus_lock = threading.Lock()
+
+def get_invalidation_bus(redis_client) -> InvalidationBus:
+    """Return the process-wide invalidation bus, starting its listener on first use"""
+    global _bus
+    with _bus_lock:
+        if _bus is None:
+            _bus = InvalidationBus(redis_client, local_cache)
+            _bus.start()
+        return _bus
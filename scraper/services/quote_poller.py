@@ -0,0 +1,199 @@
+"""
+Asynchronous brapi polling engine used by QuotesETL.
+
+All requests of a poll share one keep-alive ScheduledSession, so they count toward
+the shared brapi limits of services.http_scheduler (rate, AIMD concurrency, Retry-After).
+Batches run in parallel on worker threads driven by asyncio, each with its own
+timeout, under an overall deadline (normally the polling interval).
+
+Failures are handled by kind: a batch rejected for a bad symbol (HTTP 400/404) is
+split in halves so the other symbols still come through; throttling, server errors
+and timeouts retry the whole batch after a backoff, since splitting would only add
+load. Whatever still fails when the deadline hits is reported in `failed` instead of
+aborting the poll.
+"""
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from requests.adapters import HTTPAdapter
+
+from config import Config
+from services.http_scheduler import HOST_LIMITS, ScheduledSession
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 20       # Symbols per /quote/A,B,C request
+DEFAULT_CONCURRENCY = HOST_LIMITS['brapi.dev']['max_concurrency']  # Worker threads; the scheduler caps requests in flight
+DEFAULT_REQUEST_TIMEOUT = 10  # Seconds per request
+DEFAULT_DEADLINE = 15         # Seconds for a whole poll
+DEFAULT_CURRENCIES = ('USDBRL', 'EURBRL', 'GBPBRL')
+
+SPLIT_STATUS_CODES = {400, 404}                  # brapi rejects the whole batch for one unknown symbol
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 2
+RETRY_BACKOFF = 1.0                              # Seconds, doubled on each retry
+
+@dataclass
+class PollResult:
+    quotes: List[Dict] = field(default_factory=list)
+    currencies: List[Dict] = field(default_factory=list)
+    failed: List[str] = field(default_factory=list)
+    requests: int = 0
+    seconds: float = 0.0
+
+class _ThreadedTransport:
+    def __init__(self, concurrency: int, headers: Dict):
+        self._session = ScheduledSession()
+        self._session.headers.update(headers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='quote-poller')
+
+    def _get(self, url: str, params: Optional[Dict], timeout: float) -> Tuple[Optional[Dict], int]:
+        response = self._session.get(url, params=params, timeout=timeout)
+        if response.status_code != 200:
+            return None, response.status_code
+        return response.json(), 200
+
+    async def get_json(self, url: str, params: Optional[Dict], timeout: float) -> Tuple[Optional[Dict], int]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._get, url, params, timeout)
+
+    async def close(self):
+        self._session.close()
+        self._executor.shutdown(wait=False)
+
+class AsyncQuotePoller:
+    """Fetches quotes, FX rates and daily history from brapi in bounded parallel batches"""
+
+    def __init__(self, base_url: Optional[str] = None, token: Optional[str] = None,
+                 batch_size: int = DEFAULT_BATCH_SIZE, concurrency: int = DEFAULT_CONCURRENCY,
+                 request_timeout: float = DEFAULT_REQUEST_TIMEOUT):
+        self.base_url = (base_url or Config.BRAPI_BASE_URL).rstrip('/')
+        self.token = token if token is not None else Config.BRAPI_API_KEY
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.request_timeout = request_timeout
+
+    def _transport(self):
+        headers = {'Authorization': f'Bearer {self.token}'} if self.token else {}
+        return _ThreadedTransport(self.concurrency, headers)
+
+    def poll(self, tickers: List[str], currencies=DEFAULT_CURRENCIES,
+             deadline: float = DEFAULT_DEADLINE) -> PollResult:
+        """Quotes for every ticker plus FX rates within `deadline` seconds (blocking entry point)"""
+        return asyncio.run(self.poll_async(tickers, currencies, deadline))
+
+    def history(self, tickers: List[str], days: int = 30, deadline: float = 120) -> Dict[str, List[Dict]]:
+        """historicalDataPrice per ticker, fetched in parallel (blocking entry point)"""
+        return asyncio.run(self.history_async(tickers, days, deadline))
+
+    async def poll_async(self, tickers: List[str], currencies=DEFAULT_CURRENCIES,
+                         deadline: float = DEFAULT_DEADLINE) -> PollResult:
+        started = time.monotonic()
+        stop_at = started + deadline
+        tickers = list(dict.fromkeys(t.upper() for t in tickers))
+        result = PollResult()
+        transport = self._transport()
+        try:
+            batches = [tickers[i:i + self.batch_size] for i in range(0, len(tickers), self.batch_size)]
+            jobs = [self._quote_batch(transport, batch, stop_at, result) for batch in batches]
+            jobs += [self._currency(transport, symbol, stop_at, result) for symbol in currencies]
+            await self._run_until(jobs, stop_at)
+        finally:
+            await transport.close()
+
+        received = {quote.get('symbol', '').upper() for quote in result.quotes}
+        result.failed = sorted(set(result.failed) | (set(tickers) - received))
+        result.seconds = round(time.monotonic() - started, 3)
+        logger.info(f"Quote poll: {len(result.quotes)}/{len(tickers)} quotes, {len(result.currencies)} FX rates, "
+                    f"{len(result.failed)} failed, {result.requests} requests in {result.seconds}s")
+        return result
+
+    async def history_async(self, tickers: List[str], days: int = 30, deadline: float = 120) -> Dict[str, List[Dict]]:
+        stop_at = time.monotonic() + deadline
+        history: Dict[str, List[Dict]] = {}
+        transport = self._transport()
+
+        async def fetch(ticker):
+            data, _ = await self._get(transport, f"{self.base_url}/quote/{ticker}",
+                                      {'range': f'{days}d', 'interval': '1d'}, stop_at)
+            results = (data or {}).get('results') or []
+            if results:
+                history[ticker] = results[0].get('historicalDataPrice') or []
+
+        try:
+            await self._run_until([fetch(ticker) for ticker in tickers], stop_at)
+        finally:
+            await transport.close()
+        return history
+
+    @staticmethod
+    async def _run_until(jobs, stop_at: float):
+        """Run jobs concurrently and cancel whatever is still pending at the deadline"""
+        tasks = [asyncio.ensure_future(job) for job in jobs]
+        if not tasks:
+            return
+        _, pending = await asyncio.wait(tasks, timeout=max(0.0, stop_at - time.monotonic()))
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning(f"Quote poll deadline reached with {len(pending)} requests pending")
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _get(self, transport, url: str, params: Optional[Dict], stop_at: float,
+                   result: Optional[PollResult] = None) -> Tuple[Optional[Dict], Optional[int]]:
+        """
+        (json, 200) or (None, status); the status is None for timeouts and connection
+        errors. Throttling, server errors and timeouts are retried with a backoff
+        """
+        data, status = None, None
+        for attempt in range(MAX_RETRIES + 1):
+            timeout = min(self.request_timeout, stop_at - time.monotonic())
+            if timeout <= 0:
+                break
+            if result is not None:
+                result.requests += 1
+            try:
+                data, status = await asyncio.wait_for(transport.get_json(url, params, timeout), timeout)
+            except Exception as e:
+                logger.warning(f"brapi request failed ({url}): {e!r}")
+                data, status = None, None
+            if data is not None or (status is not None and status not in RETRY_STATUS_CODES):
+                break
+            delay = RETRY_BACKOFF * 2 ** attempt
+            if attempt == MAX_RETRIES or time.monotonic() + delay >= stop_at:
+                break
+            await asyncio.sleep(delay)
+        if data is None and status is not None:
+            logger.warning(f"brapi request failed ({url}): HTTP {status}")
+        return data, status
+
+    async def _quote_batch(self, transport, batch: List[str], stop_at: float, result: PollResult):
+        data, status = await self._get(transport, f"{self.base_url}/quote/{','.join(batch)}", None, stop_at, result)
+        if data is not None:
+            result.quotes.extend(q for q in data.get('results') or [] if q)
+            return
+        if len(batch) == 1 or status not in SPLIT_STATUS_CODES:
+            result.failed.extend(batch)
+            return
+        # A symbol of the batch was rejected: split it so the symbols that work still come through
+        middle = len(batch) // 2
+        await asyncio.gather(
+            self._quote_batch(transport, batch[:middle], stop_at, result),
+            self._quote_batch(transport, batch[middle:], stop_at, result),
+        )
+
+    async def _currency(self, transport, symbol: str, stop_at: float, result: PollResult):
+        data, _ = await self._get(transport, f"{self.base_url}/quote/{symbol}=X", None, stop_at, result)
+        results = (data or {}).get('results') or []
+        if not results:
+            result.failed.append(symbol)
+            return
+        # Raw brapi quote under the plain currency symbol (USDBRL instead of USDBRL=X)
+        result.currencies.append(dict(results[0], symbol=symbol))
@@ -2,7 +2,6 @@
 Scraper para dados da B3 (Brasil, Bolsa, Balcão)
 Busca cotações, dividendos e dados de mercado diretamente do site da B3
 """
-import requests
 import pandas as pd
 import logging
 from datetime import datetime, timedelta
@@ -11,6 +10,7 @@ from app import db
 from models import Quote, Ticker, Dividend
 import trafilatura
 import re
+from services.http_scheduler import ScheduledSession
 
 logger = logging.getLogger(__name__)
 
@@ -18,7 +18,7 @@ class B3Scraper:
     def __init__(self):
         self.base_url = "https://www.b3.com.br"
         self.quotes_url = "https://cotacoes.b3.com.br"
-        self.session = requests.Session()
+        self.session = ScheduledSession()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
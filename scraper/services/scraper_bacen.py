@@ -2,13 +2,13 @@
 Scraper para dados do Banco Central do Brasil (BACEN)
 Busca indicadores macroeconômicos e dados do Sistema Financeiro Nacional
 """
-import requests
 import pandas as pd
 import logging
 from datetime import datetime, timedelta
 from app import db
 from models import EconomicIndicator
 import json
+from services.http_scheduler import ScheduledSession
 
 logger = logging.getLogger(__name__)
 
@@ -16,7 +16,7 @@ class BacenScraper:
     def __init__(self):
         self.base_url = "https://api.bcb.gov.br/dados/serie/bcdata.sgs"
         self.olinda_url = "https://was.bcb.gov.br/ccs/service/ws/olinda"
-        self.session = requests.Session()
+        self.session = ScheduledSession()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         })
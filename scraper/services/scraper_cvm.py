@@ -2,7 +2,6 @@
 Scraper para dados da CVM (Comissão de Valores Mobiliários)
 Busca dados diretamente dos sistemas públicos da CVM
 """
-import requests
 import pandas as pd
 import logging
 from datetime import datetime, timedelta
@@ -11,13 +10,14 @@ import zipfile
 from app import db
 from models import Company, FinancialStatement
 import trafilatura
+from services.http_scheduler import ScheduledSession
 
 logger = logging.getLogger(__name__)
 
 class CVMScraper:
     def __init__(self):
         self.base_url = "https://dados.cvm.gov.br/dados"
-        self.session = requests.Session()
+        self.session = ScheduledSession()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         })
@@ -2,7 +2,6 @@
 Scraper Avançado da CVM - Sistema completo para extração de dados financeiros
 Captura DFPs, ITRs, FREs, FCAs e outros documentos estruturados da CVM
 """
-import requests
 import pandas as pd
 import logging
 from datetime import datetime, timedelta
@@ -13,6 +12,7 @@ import zipfile
 import os
 import time
 from pathlib import Path
+from services.http_scheduler import ScheduledSession
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -33,7 +33,7 @@ class CVMAdvancedScraper:
     
     def __init__(self):
         self.base_url = "https://dados.cvm.gov.br/dados"
-        self.session = requests.Session()
+        self.session = ScheduledSession()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         })
@@ -2,7 +2,6 @@
 Scraper para notícias financeiras de fontes públicas brasileiras
 Busca notícias de portais como G1, UOL, InfoMoney, Valor Econômico
 """
-import requests
 from bs4 import BeautifulSoup
 import logging
 from datetime import datetime, timedelta
@@ -12,12 +11,13 @@ import trafilatura
 import re
 from urllib.parse import urljoin, urlparse
 import hashlib
+from services.http_scheduler import ScheduledSession
 
 logger = logging.getLogger(__name__)
 
 class NewsScraper:
     def __init__(self):
-        self.session = requests.Session()
+        self.session = ScheduledSession()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
@@ -2,15 +2,14 @@
 Scraper para o sistema RAD da CVM - Portal de Consultas Externas
 https://www.rad.cvm.gov.br/ENET/frmConsultaExternaCVM.aspx
 """
-import requests
 from bs4 import BeautifulSoup
 import pandas as pd
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
-import time
 import re
 from urllib.parse import urljoin, parse_qs, urlparse
+from services.http_scheduler import ScheduledSession
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -21,7 +20,7 @@ class RADCVMScraper:
     
     def __init__(self):
         self.base_url = "https://www.rad.cvm.gov.br/ENET/"
-        self.session = requests.Session()
+        self.session = ScheduledSession()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
@@ -357,9 +356,6 @@ class RADCVMScraper:
                     results[sector] = companies
                     logger.info(f"Setor {sector}: {len(companies)} empresas")
                     
-                    # Delay entre setores
-                    time.sleep(2)
-                    
                 except Exception as e:
                     logger.error(f"Erro ao processar setor {sector}: {str(e)}")
                     continue
@@ -1,7 +1,6 @@
 """
 Scraper específico para transações de insiders (CVM 44) no sistema RAD da CVM
 """
-import requests
 import pandas as pd
 from bs4 import BeautifulSoup
 import re
@@ -9,6 +8,7 @@ import logging
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 import time
+from services.http_scheduler import ScheduledSession
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -18,7 +18,7 @@ class RADInsidersScraper:
     
     def __init__(self):
         self.base_url = "https://www.rad.cvm.gov.br/ENET/frmConsultaExternaCVM.aspx"
-        self.session = requests.Session()
+        self.session = ScheduledSession()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
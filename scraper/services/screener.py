@@ -0,0 +1,470 @@
+"""
+Cross-sectional stock screener.
+
+The latest value of every screenable field for every ticker is kept in memory as one
+float64 matrix (fields x tickers, each field a contiguous row), built from:
+
+    quotes                 last price, change_percent, volume
+    technical_indicators   latest session of each indicator
+    financial_indicators   latest year/period of the market and fundamental ratios
+    market_data            latest market_cap
+    companies              b3_sector (text, kept as a separate column)
+
+Filters such as "rsi < 30 and pe_ratio < 8 and net_margin > 10%" are parsed once
+into a tree of NumPy comparisons (cached per expression string), so a screen over
+the whole universe is a handful of vectorized operations plus a partial sort.
+Missing values are NaN and never satisfy a comparison; a negation ("not ...") only
+matches tickers where every field it uses is known. A "%" literal is a fraction
+(10% = 0.1) except against fields already stored in percentage points
+(PERCENT_POINT_FIELDS), where 10% = 10.
+
+Rebuilds are atomic: a new matrix is built off to the side and swapped in with a
+single reference assignment, so a running screen always sees one consistent
+snapshot. Writers (quote ETL, indicator batch, daily bar close) call
+`publish_refresh`, which bumps a version counter in Redis. Each worker checks the
+counter at most once per VERSION_CHECK_INTERVAL and rebuilds in the background,
+serving the previous matrix in the meantime.
+"""
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'screener:version'
+VERSION_CHECK_INTERVAL = 1.0  # Seconds between version checks of one worker
+MAX_LIMIT = 500
+
+QUOTE_FIELDS = ('price', 'change_percent', 'volume')
+TECHNICAL_FIELDS = (
+    'close', 'sma_20', 'sma_50', 'sma_200', 'ema_12', 'ema_20', 'ema_26', 'ema_50',
+    'rsi', 'macd_line', 'macd_signal', 'macd_histogram',
+    'bb_upper', 'bb_middle', 'bb_lower', 'atr', 'obv',
+)
+RATIO_FIELDS = (
+    'pe_ratio', 'pb_ratio', 'ev_ebitda', 'dividend_yield',
+    'roe', 'roa', 'gross_margin', 'operating_margin', 'net_margin',
+    'current_ratio', 'quick_ratio', 'cash_ratio',
+    'debt_to_equity', 'debt_to_assets', 'interest_coverage', 'asset_turnover',
+)
+MARKET_FIELDS = ('market_cap',)
+FIELDS = QUOTE_FIELDS + TECHNICAL_FIELDS + RATIO_FIELDS + MARKET_FIELDS
+FIELD_INDEX = {name: position for position, name in enumerate(FIELDS)}
+
+# Portuguese names used across the API
+ALIASES = {
+    'pl': 'pe_ratio', 'p_l': 'pe_ratio',
+    'pvp': 'pb_ratio', 'p_vp': 'pb_ratio',
+    'dy': 'dividend_yield',
+    'ev_ebit': 'ev_ebitda',
+    'margem_liquida': 'net_margin', 'margem_bruta': 'gross_margin', 'margem_operacional': 'operating_margin',
+    'divida_pl': 'debt_to_equity',
+    'preco': 'price', 'variacao': 'change_percent', 'valor_mercado': 'market_cap',
+}
+TEXT_FIELDS = ('sector', 'ticker')
+# Fields stored in percentage points (5.2 means 5.2%); the ratios are fractions
+PERCENT_POINT_FIELDS = ('change_percent', 'rsi')
+
+@dataclass
+class ScreenerMatrix:
+    tickers: np.ndarray                       # str, sorted
+    values: np.ndarray                        # float64 (len(FIELDS), len(tickers))
+    sectors: np.ndarray                       # object, '' when unknown
+    built_at: datetime = field(default_factory=datetime.utcnow)
+    version: Optional[int] = None
+
+    def column(self, name: str) -> np.ndarray:
+        if name == 'sector':
+            return self.sectors
+        if name == 'ticker':
+            return self.tickers
+        return self.values[FIELD_INDEX[name]]
+
+    def known(self, name: str) -> np.ndarray:
+        """Tickers with a value for the field"""
+        if name == 'sector':
+            return self.sectors != ''
+        if name == 'ticker':
+            return np.ones(self.tickers.shape, dtype=bool)
+        return np.isfinite(self.values[FIELD_INDEX[name]])
+
+def resolve_field(name: str) -> str:
+    name = ALIASES.get(name.lower(), name.lower())
+    if name not in FIELD_INDEX and name not in TEXT_FIELDS:
+        raise ValueError(f"Unknown field '{name}'")
+    return name
+
+# ---------------------------------------------------------------------------
+# Filter expressions
+#
+#   expr       := term (('or' | '||') term)*
+#   term       := factor (('and' | '&&' | ',') factor)*
+#   factor     := 'not' factor | '(' expr ')' | comparison
+#   comparison := operand ('<' | '<=' | '>' | '>=' | '=' | '==' | '!=') operand
+#   operand    := field | number ['%'] | 'quoted text'
+# ---------------------------------------------------------------------------
+
+_TOKEN = re.compile(r"""
+    \s*(?:
+        (?P<number>-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?%?)
+      | (?P<string>'[^']*'|"[^"]*")
+      | (?P<op><=|>=|==|!=|<|>|=)
+      | (?P<logic>&&|\|\||,|\(|\))
+      | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+    )""", re.VERBOSE)
+
+_COMPARE = {
+    '<': np.less, '<=': np.less_equal, '>': np.greater, '>=': np.greater_equal,
+    '=': np.equal, '==': np.equal, '!=': np.not_equal,
+}
+
+Mask = Callable[[ScreenerMatrix], np.ndarray]
+
+def _tokenize(expression: str) -> List[Tuple[str, str]]:
+    tokens, position = [], 0
+    expression = expression.strip()
+    while position < len(expression):
+        match = _TOKEN.match(expression, position)
+        if not match or match.end() == position:
+            raise ValueError(f"Invalid filter near '{expression[position:position + 20]}'")
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == 'name' and value.lower() in ('and', 'or', 'not'):
+            kind, value = 'logic', value.lower()
+        tokens.append((kind, value))
+        position = match.end()
+    return tokens
+
+class _Parser:
+    def __init__(self, tokens: List[Tuple[str, str]]):
+        self.tokens = tokens
+        self.position = 0
+        self.fields = set()
+        self._scope = set()           # Fields used by the factor being parsed (for 'not')
+
+    def _peek(self) -> Optional[Tuple[str, str]]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def _next(self) -> Tuple[str, str]:
+        token = self._peek()
+        if token is None:
+            raise ValueError("Unexpected end of filter")
+        self.position += 1
+        return token
+
+    def parse(self) -> Mask:
+        mask = self._expr()
+        if self._peek() is not None:
+            raise ValueError(f"Unexpected '{self._peek()[1]}' in filter")
+        return mask
+
+    def _expr(self) -> Mask:
+        terms = [self._term()]
+        while self._peek() in (('logic', 'or'), ('logic', '||')):
+            self._next()
+            terms.append(self._term())
+        if len(terms) == 1:
+            return terms[0]
+        return lambda matrix: np.logical_or.reduce([term(matrix) for term in terms])
+
+    def _term(self) -> Mask:
+        factors = [self._factor()]
+        while self._peek() in (('logic', 'and'), ('logic', '&&'), ('logic', ',')):
+            self._next()
+            factors.append(self._factor())
+        if len(factors) == 1:
+            return factors[0]
+        return lambda matrix: np.logical_and.reduce([factor(matrix) for factor in factors])
+
+    def _factor(self) -> Mask:
+        token = self._peek()
+        if token == ('logic', 'not'):
+            self._next()
+            outer, self._scope = self._scope, set()
+            inner = self._factor()
+            used = tuple(sorted(self._scope))
+            self._scope = outer | self._scope
+            # Missing values fail the inner comparison, they must not pass its negation
+            return lambda matrix: ~inner(matrix) & np.logical_and.reduce(
+                [matrix.known(name) for name in used] or [True])
+        if token == ('logic', '('):
+            self._next()
+            inner = self._expr()
+            if self._next() != ('logic', ')'):
+                raise ValueError("Missing ')' in filter")
+            return inner
+        return self._comparison()
+
+    def _operand(self):
+        kind, value = self._next()
+        if kind == 'number':
+            # Scaled in _comparison, where the field on the other side is known
+            return ('percent', float(value[:-1])) if value.endswith('%') else ('value', float(value))
+        if kind == 'string':
+            return 'value', value[1:-1]
+        if kind == 'name':
+            name = resolve_field(value)
+            self.fields.add(name)
+            self._scope.add(name)
+            return 'field', name
+        raise ValueError(f"Unexpected '{value}' in filter")
+
+    def _comparison(self) -> Mask:
+        left = self._operand()
+        kind, op = self._next()
+        if kind != 'op':
+            raise ValueError(f"Expected a comparison operator, got '{op}'")
+        right = self._operand()
+        compare = _COMPARE[op]
+        points = any(side == ('field', name) for side in (left, right) for name in PERCENT_POINT_FIELDS)
+        left, right = [('value', value if points else value / 100) if kind == 'percent' else (kind, value)
+                       for kind, value in (left, right)]
+        text = any(side[0] == 'field' and side[1] in TEXT_FIELDS for side in (left, right))
+        if text:
+            if op not in ('=', '==', '!='):
+                raise ValueError("Text fields only support = and !=")
+            left, right = [(side, value.upper() if side == 'value' else value) for side, value in (left, right)]
+
+        def operand(side, matrix):
+            kind, value = side
+            if kind == 'value':
+                return value
+            column = matrix.column(value)
+            return np.char.upper(column.astype(str)) if text else column
+
+        def mask(matrix: ScreenerMatrix) -> np.ndarray:
+            with np.errstate(invalid='ignore'):
+                result = compare(operand(left, matrix), operand(right, matrix))
+            return np.broadcast_to(result, matrix.tickers.shape)
+
+        return mask
+
+@lru_cache(maxsize=256)
+def compile_filter(expression: str) -> Tuple[Mask, frozenset]:
+    """Compiled mask function of a filter expression and the fields it uses"""
+    parser = _Parser(_tokenize(expression))
+    return parser.parse(), frozenset(parser.fields)
+
+# ---------------------------------------------------------------------------
+# Matrix construction
+# ---------------------------------------------------------------------------
+
+_SOURCES = (
+    (QUOTE_FIELDS,
+     "SELECT DISTINCT ON (ticker) ticker, {columns} FROM quotes "
+     "WHERE ticker IS NOT NULL ORDER BY ticker, quote_datetime DESC"),
+    (TECHNICAL_FIELDS,
+     "SELECT DISTINCT ON (ticker) ticker, {columns} FROM technical_indicators "
+     "ORDER BY ticker, indicator_date DESC"),
+    (RATIO_FIELDS,
+     "SELECT DISTINCT ON (ticker) ticker, {columns} FROM financial_indicators "
+     "WHERE ticker IS NOT NULL ORDER BY ticker, year DESC, period DESC NULLS LAST"),
+    (MARKET_FIELDS,
+     "SELECT DISTINCT ON (ticker) ticker, {columns} FROM market_data "
+     "ORDER BY ticker, trade_date DESC"),
+)
+
+def build_matrix(session) -> ScreenerMatrix:
+    """Latest value of every field for every ticker, one query per source table"""
+    from sqlalchemy import text
+
+    blocks = []
+    for fields, query in _SOURCES:
+        try:
+            rows = session.execute(text(query.format(columns=', '.join(fields)))).fetchall()
+        except Exception as e:
+            # A source that is missing or failing leaves its fields empty
+            logger.error(f"Screener source for {fields[0]}... failed: {str(e)}")
+            session.rollback()
+            continue
+        if rows:
+            tickers = np.array([str(row[0]).upper() for row in rows])
+            values = np.array([row[1:] for row in rows], dtype=np.float64)  # None becomes NaN
+            blocks.append((fields, tickers, values))
+
+    try:
+        sector_rows = session.execute(text(
+            "SELECT ticker, b3_sector FROM companies WHERE ticker IS NOT NULL"
+        )).fetchall()
+    except Exception as e:
+        logger.error(f"Screener sectors failed: {str(e)}")
+        session.rollback()
+        sector_rows = []
+
+    universe = np.unique(np.concatenate([tickers for _, tickers, _ in blocks])) if blocks \
+        else np.empty(0, dtype=str)
+    matrix = np.full((len(FIELDS), universe.size), np.nan)
+    for fields, tickers, values in blocks:
+        columns = np.searchsorted(universe, tickers)
+        rows = [FIELD_INDEX[name] for name in fields]
+        matrix[np.ix_(rows, columns)] = values.T
+
+    sectors = np.full(universe.size, '', dtype=object)
+    for ticker, sector in sector_rows:
+        position = np.searchsorted(universe, str(ticker).upper())
+        if position < universe.size and universe[position] == str(ticker).upper():
+            sectors[position] = sector or ''
+
+    return ScreenerMatrix(tickers=universe, values=matrix, sectors=sectors)
+
+def publish_refresh(redis_client) -> None:
+    """Tell every worker that the screener sources changed"""
+    try:
+        redis_client.incr(VERSION_KEY)
+    except Exception as e:
+        logger.error(f"Screener refresh publish error: {str(e)}")
+
+# ---------------------------------------------------------------------------
+# Screener
+# ---------------------------------------------------------------------------
+
+class Screener:
+    """In-memory screener with atomic, version-driven background rebuilds"""
+
+    def __init__(self, redis_client=None, builder: Callable = build_matrix):
+        self.redis = redis_client
+        self.builder = builder
+        self._matrix: Optional[ScreenerMatrix] = None
+        self._checked_at = 0.0
+        self._building = False
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='screener-refresh')
+
+    def _remote_version(self) -> Optional[int]:
+        if self.redis is None:
+            return None
+        try:
+            version = self.redis.get(VERSION_KEY)
+            return int(version) if version is not None else 0
+        except Exception as e:
+            logger.error(f"Screener version check error: {str(e)}")
+            return None
+
+    def refresh(self, session, version: Optional[int] = None) -> ScreenerMatrix:
+        """Build a new matrix and swap it in"""
+        started = time.monotonic()
+        matrix = self.builder(session)
+        matrix.version = version if version is not None else self._remote_version()
+        self._matrix = matrix  # Single assignment: readers see the old or the new matrix, never a mix
+        logger.info(f"Screener matrix: {matrix.tickers.size} tickers x {len(FIELDS)} fields "
+                    f"in {time.monotonic() - started:.3f}s")
+        return matrix
+
+    def matrix(self, session) -> Optional[ScreenerMatrix]:
+        """Current matrix; built on first use and rebuilt in the background when sources change"""
+        current = self._matrix
+        if current is None:
+            with self._lock:
+                if self._matrix is None:
+                    return self.refresh(session)
+                return self._matrix
+
+        now = time.monotonic()
+        if now - self._checked_at < VERSION_CHECK_INTERVAL:
+            return current
+        self._checked_at = now
+        version = self._remote_version()
+        if version is not None and version != current.version:
+            self._schedule(version)
+        return current
+
+    def _schedule(self, version: int) -> None:
+        with self._lock:
+            if self._building:
+                return
+            self._building = True
+        app = self._current_app()
+        self._executor.submit(self._background_refresh, version, app)
+
+    def _background_refresh(self, version: int, app) -> None:
+        try:
+            if app is not None:
+                from app import db
+                with app.app_context():
+                    self.refresh(db.session, version)
+                    db.session.remove()
+            else:
+                logger.warning("Screener refresh skipped: no application context")
+        except Exception as e:
+            # The previous matrix keeps being served
+            logger.error(f"Screener refresh failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._building = False
+
+    @staticmethod
+    def _current_app():
+        try:
+            from flask import current_app
+            return current_app._get_current_object()
+        except Exception:
+            return None
+
+    def screen(self, session, expression: Optional[str] = None, sort: Optional[str] = None,
+               limit: int = 50, fields: Optional[List[str]] = None) -> Dict:
+        """
+        Tickers matching `expression`, ordered by `sort` ('-field' for descending) and
+        cut at `limit`. Returned fields default to the ones used in the filter and sort
+        """
+        started = time.perf_counter()
+        matrix = self.matrix(session)
+        if matrix is None or matrix.tickers.size == 0:
+            return {'count': 0, 'universe': 0, 'results': []}
+
+        used = set()
+        if expression and expression.strip():
+            mask_of, used = compile_filter(expression.strip())
+            selected = np.flatnonzero(mask_of(matrix))
+        else:
+            selected = np.arange(matrix.tickers.size)
+        count = selected.size
+
+        limit = max(1, min(int(limit), MAX_LIMIT))
+        descending = False
+        if sort:
+            descending = sort.startswith('-')
+            sort_field = resolve_field(sort.lstrip('-+'))
+            used = set(used) | {sort_field}
+            keys = matrix.column(sort_field)[selected]
+            if sort_field in TEXT_FIELDS:
+                order = np.argsort(keys.astype(str), kind='stable')
+                order = order[::-1] if descending else order
+            else:
+                # Missing values go last in both directions
+                keys = -keys if descending else keys
+                keys = np.where(np.isnan(keys), np.inf, keys)
+                if limit < keys.size:
+                    top = np.argpartition(keys, limit - 1)[:limit]
+                    order = top[np.argsort(keys[top], kind='stable')]
+                else:
+                    order = np.argsort(keys, kind='stable')
+            selected = selected[order]
+        selected = selected[:limit]
+
+        names = [resolve_field(name) for name in fields] if fields else \
+            [name for name in FIELDS if name in used or name == 'price']
+        names = [name for name in names if name not in TEXT_FIELDS]
+        columns = [matrix.values[FIELD_INDEX[name], selected].tolist() for name in names]
+        results = []
+        for position, ticker in enumerate(matrix.tickers[selected].tolist()):
+            row = {'ticker': ticker, 'sector': matrix.sectors[selected[position]] or None}
+            for name, column in zip(names, columns):
+                value = column[position]
+                row[name] = None if value != value else value
+            results.append(row)
+
+        return {
+            'count': int(count),
+            'universe': int(matrix.tickers.size),
+            'results': results,
+            'as_of': matrix.built_at.isoformat() + 'Z',
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 3),
+        }
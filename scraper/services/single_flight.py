@@ -0,0 +1,116 @@
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Compare-and-delete: only the worker holding the lock may release it
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+class SingleFlight:
+    """
+    Coalesces concurrent cache misses for the same key.
+
+    Inside a process, the first caller becomes the leader and the others wait on its
+    Future. Across workers, a short Redis lock (SET NX PX) elects one fetcher; the other
+    workers poll the cache until the leader has written the value.
+
+    lock_ttl and wait_timeout must exceed the slowest fetch, otherwise the lock expires
+    mid-fetch and waiters give up while the leader is still working.
+    """
+
+    def __init__(self, redis_client, lock_ttl: float = 30.0, wait_timeout: float = 20.0,
+                 poll_interval: float = 0.05):
+        self.redis = redis_client
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats = {'leader': 0, 'coalesced_local': 0, 'coalesced_remote': 0, 'lock_timeouts': 0}
+
+    def _count(self, name: str) -> None:
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def do(self, key: str, fetch: Callable[[], Any],
+           read_cache: Optional[Callable[[], Any]] = None) -> Any:
+        """Return fetch() for key, running it at most once concurrently per key"""
+        with self._lock:
+            future = self._futures.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._futures[key] = future
+
+        if not leader:
+            self._count('coalesced_local')
+            try:
+                return future.result(timeout=self.wait_timeout)
+            except FutureTimeout:
+                # The leader is stuck: use whatever reached the cache, else fetch directly
+                self._count('lock_timeouts')
+                cached = read_cache() if read_cache is not None else None
+                return cached if cached else fetch()
+
+        try:
+            result = self._fetch_across_workers(key, fetch, read_cache)
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._futures.pop(key, None)
+
+    def _fetch_across_workers(self, key: str, fetch: Callable[[], Any],
+                              read_cache: Optional[Callable[[], Any]]) -> Any:
+        lock_key = f"lock:{key}"
+        token = uuid.uuid4().hex
+
+        try:
+            acquired = self.redis.set(lock_key, token, nx=True, px=int(self.lock_ttl * 1000))
+        except Exception as e:
+            logger.error(f"Single-flight lock error for {key}: {str(e)}")
+            return fetch()
+
+        if acquired:
+            self._count('leader')
+            try:
+                return fetch()
+            finally:
+                try:
+                    self.redis.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+                except Exception as e:
+                    logger.error(f"Single-flight unlock error for {key}: {str(e)}")
+
+        # Another worker is fetching: wait for its value to land in the cache
+        if read_cache is not None:
+            deadline = time.monotonic() + self.wait_timeout
+            while time.monotonic() < deadline:
+                cached = read_cache()
+                if cached:
+                    self._count('coalesced_remote')
+                    return cached
+                if not self.redis.exists(lock_key):
+                    # The leader finished or gave up without a value: check one last time
+                    cached = read_cache()
+                    if cached:
+                        self._count('coalesced_remote')
+                        return cached
+                    break
+                time.sleep(self.poll_interval)
+            else:
+                self._count('lock_timeouts')
+
+        return fetch()
@@ -0,0 +1,448 @@
+"""
+Online (streaming) technical indicators.
+
+Each ticker keeps a small state: running EMAs, Wilder averages for RSI and ATR, and
+windowed Welford mean/variance for the SMAs and Bollinger bands. A closed daily bar
+updates the state in constant time; the bar still open (the current session, fed by
+live ticks) is never committed, its indicators are computed with `peek`, which
+evaluates the same update without storing it. The formulas and seeds match
+services/indicator_engine.py, so the values continue the stored series.
+
+States are checkpointed to Redis as JSON. A restored state catches up on the sessions
+the history store got since the checkpoint; it is discarded (and rebuilt from the
+recent history) when its last close no longer matches the history, which is what a
+new corporate-action adjustment looks like.
+"""
+import json
+import logging
+import math
+import threading
+import time
+from collections import deque
+from datetime import date
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from services.history_store import market_today, session_day
+from services.indicator_engine import (
+    ATR_PERIOD, BOLLINGER_PERIOD, BOLLINGER_WIDTH, EMA_PERIODS, MACD_PERIODS, RSI_PERIOD,
+    SMA_PERIODS, obv as obv_series,
+)
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_KEY = 'indicators:state'
+CHECKPOINT_INTERVAL = 60      # Seconds between checkpoints of the tickers that changed
+WARMUP_SESSIONS = 750         # Sessions replayed to build a state (EMA50 error ~1e-6 after 750)
+RESYNC_INTERVAL = 14400       # Fresh sessions are pulled from the history store every 4h
+STATE_VERSION = 1
+
+def _finite(value) -> bool:
+    return value is not None and value == value and not math.isinf(value)
+
+class EMA:
+    """Exponential moving average seeded with the mean of the first n values"""
+
+    __slots__ = ('n', 'alpha', 'value', '_seed_sum', '_seed_count')
+
+    def __init__(self, n: int, alpha: Optional[float] = None):
+        self.n = n
+        self.alpha = 2.0 / (n + 1) if alpha is None else alpha
+        self.value = None
+        self._seed_sum = 0.0
+        self._seed_count = 0
+
+    def update(self, x: float) -> Optional[float]:
+        if not _finite(x):
+            return self.value
+        if self.value is None:
+            self._seed_sum += x
+            self._seed_count += 1
+            if self._seed_count == self.n:
+                self.value = self._seed_sum / self.n
+        else:
+            self.value += self.alpha * (x - self.value)
+        return self.value
+
+    def peek(self, x: float) -> Optional[float]:
+        if not _finite(x):
+            return self.value
+        if self.value is None:
+            return (self._seed_sum + x) / self.n if self._seed_count + 1 == self.n else None
+        return self.value + self.alpha * (x - self.value)
+
+    def state(self) -> list:
+        return [self.value, self._seed_sum, self._seed_count]
+
+    def restore(self, state: list) -> 'EMA':
+        self.value, self._seed_sum, self._seed_count = state
+        return self
+
+def wilder(n: int) -> EMA:
+    return EMA(n, alpha=1.0 / n)
+
+class RollingStats:
+    """Mean and population variance of the last n values (windowed Welford)"""
+
+    __slots__ = ('n', 'window', 'mean', 'm2', '_updates')
+
+    def __init__(self, n: int):
+        self.n = n
+        self.window = deque(maxlen=n)
+        self.mean = 0.0
+        self.m2 = 0.0
+        self._updates = 0
+
+    def update(self, x: float) -> None:
+        if not _finite(x):
+            return
+        if len(self.window) < self.n:
+            self.mean, self.m2 = self._add(x)
+        else:
+            self.mean, self.m2 = self._replace(x)
+        self.window.append(x)
+        self._updates += 1
+        # Rounding drifts with every replacement: resum the window now and then (amortized O(1))
+        if self._updates % (self.n * 50) == 0:
+            self._resum()
+
+    def _add(self, x: float):
+        count = len(self.window) + 1
+        delta = x - self.mean
+        mean = self.mean + delta / count
+        return mean, self.m2 + delta * (x - mean)
+
+    def _replace(self, x: float):
+        old = self.window[0]
+        mean = self.mean + (x - old) / self.n
+        return mean, self.m2 + (x - old) * (x - mean + old - self.mean)
+
+    def _resum(self) -> None:
+        values = np.fromiter(self.window, dtype=np.float64)
+        self.mean = float(values.mean()) if values.size else 0.0
+        self.m2 = float(((values - self.mean) ** 2).sum()) if values.size else 0.0
+
+    def _stats(self, mean: float, m2: float):
+        return mean, math.sqrt(max(m2 / self.n, 0.0))
+
+    def current(self):
+        """(mean, std) of the window, or (None, None) until it is full"""
+        if len(self.window) < self.n:
+            return None, None
+        return self._stats(self.mean, self.m2)
+
+    def peek(self, x: float):
+        if not _finite(x):
+            return self.current()
+        if len(self.window) == self.n:
+            return self._stats(*self._replace(x))
+        if len(self.window) == self.n - 1:
+            return self._stats(*self._add(x))
+        return None, None
+
+    def state(self) -> list:
+        return list(self.window)
+
+    def restore(self, state: list) -> 'RollingStats':
+        self.window = deque(state, maxlen=self.n)
+        self._resum()
+        return self
+
+def _rsi(average_gain: Optional[float], average_loss: Optional[float]) -> Optional[float]:
+    if average_gain is None or average_loss is None:
+        return None
+    if average_loss == 0:
+        return 50.0 if average_gain == 0 else 100.0
+    return 100.0 - 100.0 / (1.0 + average_gain / average_loss)
+
+def _true_range(high: float, low: float, previous_close: Optional[float]) -> float:
+    if previous_close is None:
+        return high - low
+    return max(high - low, abs(high - previous_close), abs(low - previous_close))
+
+class IndicatorState:
+    """Per-ticker indicator state, updated once per closed daily bar"""
+
+    def __init__(self):
+        self.last_day: Optional[int] = None
+        self.last_close: Optional[float] = None
+        self.sma = {n: RollingStats(n) for n in set(SMA_PERIODS) | {BOLLINGER_PERIOD}}
+        self.ema = {n: EMA(n) for n in set(EMA_PERIODS) | set(MACD_PERIODS[:2])}
+        self.macd_signal = EMA(MACD_PERIODS[2])
+        self.average_gain = wilder(RSI_PERIOD)
+        self.average_loss = wilder(RSI_PERIOD)
+        self.atr = wilder(ATR_PERIOD)
+        self.obv: Optional[float] = None
+
+    def update(self, day: int, close: float, high: float = None, low: float = None,
+               volume: float = 0.0) -> None:
+        """Commit a closed session"""
+        if not _finite(close):
+            return
+        high = high if _finite(high) else close
+        low = low if _finite(low) else close
+        volume = volume if _finite(volume) else 0.0
+        previous = self.last_close
+
+        for stats in self.sma.values():
+            stats.update(close)
+        for average in self.ema.values():
+            average.update(close)
+        fast, slow = self.ema[MACD_PERIODS[0]].value, self.ema[MACD_PERIODS[1]].value
+        if fast is not None and slow is not None:
+            self.macd_signal.update(fast - slow)
+        if previous is not None:
+            delta = close - previous
+            self.average_gain.update(max(delta, 0.0))
+            self.average_loss.update(max(-delta, 0.0))
+            self.obv = (self.obv or 0.0) + math.copysign(volume, delta) * (delta != 0)
+        else:
+            self.obv = self.obv or 0.0
+        self.atr.update(_true_range(high, low, previous))
+
+        self.last_day = day
+        self.last_close = close
+
+    def values(self, close: Optional[float] = None, high: float = None, low: float = None,
+               volume: float = 0.0) -> Dict[str, Optional[float]]:
+        """Indicators after the committed sessions, or with an open bar when close is given"""
+        if not _finite(close):
+            return self._values(
+                self.last_close,
+                {n: stats.current() for n, stats in self.sma.items()},
+                {n: average.value for n, average in self.ema.items()},
+                self.macd_signal.value, self.average_gain.value, self.average_loss.value,
+                self.atr.value, self.obv,
+            )
+
+        high = high if _finite(high) else close
+        low = low if _finite(low) else close
+        volume = volume if _finite(volume) else 0.0
+        previous = self.last_close
+        emas = {n: average.peek(close) for n, average in self.ema.items()}
+        fast, slow = emas[MACD_PERIODS[0]], emas[MACD_PERIODS[1]]
+        signal = self.macd_signal.peek(fast - slow) if fast is not None and slow is not None else self.macd_signal.value
+        if previous is not None:
+            delta = close - previous
+            gain, loss = self.average_gain.peek(max(delta, 0.0)), self.average_loss.peek(max(-delta, 0.0))
+            obv = (self.obv or 0.0) + math.copysign(volume, delta) * (delta != 0)
+        else:
+            gain, loss, obv = None, None, 0.0
+        return self._values(
+            close,
+            {n: stats.peek(close) for n, stats in self.sma.items()},
+            emas, signal, gain, loss,
+            self.atr.peek(_true_range(high, low, previous)), obv,
+        )
+
+    @staticmethod
+    def _values(close, sma, ema, signal, gain, loss, atr, obv) -> Dict[str, Optional[float]]:
+        values = {'close': close}
+        for n in SMA_PERIODS:
+            values[f'sma_{n}'] = sma[n][0]
+        for n in EMA_PERIODS:
+            values[f'ema_{n}'] = ema[n]
+        values['rsi'] = _rsi(gain, loss)
+        fast, slow = ema[MACD_PERIODS[0]], ema[MACD_PERIODS[1]]
+        line = fast - slow if fast is not None and slow is not None else None
+        values['macd_line'] = line
+        values['macd_signal'] = signal if line is not None else None
+        values['macd_histogram'] = line - signal if line is not None and signal is not None else None
+        middle, deviation = sma[BOLLINGER_PERIOD]
+        values['bb_middle'] = middle
+        values['bb_upper'] = middle + BOLLINGER_WIDTH * deviation if middle is not None else None
+        values['bb_lower'] = middle - BOLLINGER_WIDTH * deviation if middle is not None else None
+        values['atr'] = atr
+        values['obv'] = obv
+        return values
+
+    def to_dict(self) -> Dict:
+        return {
+            'version': STATE_VERSION,
+            'last_day': self.last_day,
+            'last_close': self.last_close,
+            'sma': {str(n): stats.state() for n, stats in self.sma.items()},
+            'ema': {str(n): average.state() for n, average in self.ema.items()},
+            'macd_signal': self.macd_signal.state(),
+            'average_gain': self.average_gain.state(),
+            'average_loss': self.average_loss.state(),
+            'atr': self.atr.state(),
+            'obv': self.obv,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'IndicatorState':
+        if data.get('version') != STATE_VERSION:
+            raise ValueError(f"Unsupported indicator state version {data.get('version')}")
+        state = cls()
+        state.last_day = data['last_day']
+        state.last_close = data['last_close']
+        for n, stats in state.sma.items():
+            stats.restore(data['sma'][str(n)])
+        for n, average in state.ema.items():
+            average.restore(data['ema'][str(n)])
+        state.macd_signal.restore(data['macd_signal'])
+        state.average_gain.restore(data['average_gain'])
+        state.average_loss.restore(data['average_loss'])
+        state.atr.restore(data['atr'])
+        state.obv = data['obv']
+        return state
+
+class IndicatorStream:
+    """
+    Streaming indicators for every ticker that receives ticks. Register `on_tick` as a
+    tick store listener and read `snapshot(ticker)` for the current values
+    """
+
+    def __init__(self, redis_client=None, history_store=None,
+                 loader: Optional[Callable[[str], Dict[str, np.ndarray]]] = None,
+                 checkpoint_interval: float = CHECKPOINT_INTERVAL):
+        self.redis = redis_client
+        self.loader = loader or (history_store.read if history_store is not None else None)
+        self.checkpoint_interval = checkpoint_interval
+        self._states: Dict[str, IndicatorState] = {}
+        self._bars: Dict[str, List[float]] = {}       # ticker -> [day, close, high, low, volume] of the open session
+        self._synced: Dict[str, float] = {}
+        self._dirty = set()
+        self._last_checkpoint = time.monotonic()
+        self._lock = threading.RLock()
+
+    def _history(self, ticker: str) -> Optional[Dict[str, np.ndarray]]:
+        if self.loader is None:
+            return None
+        try:
+            return self.loader(ticker)
+        except Exception as e:
+            logger.error(f"Indicator history load failed for {ticker}: {str(e)}")
+            return None
+
+    def state(self, ticker: str) -> IndicatorState:
+        """State of a ticker, restored from the checkpoint or built from its history"""
+        ticker = ticker.upper()
+        with self._lock:
+            state = self._states.get(ticker)
+            if state is None:
+                state = self._states[ticker] = self._load(ticker)
+            elif time.monotonic() - self._synced.get(ticker, 0) >= RESYNC_INTERVAL:
+                self._catch_up(ticker, state, self._history(ticker))
+            return state
+
+    def _load(self, ticker: str) -> IndicatorState:
+        columns = self._history(ticker)
+        state = self._restore(ticker)
+        if state is not None and columns is not None and state.last_day is not None:
+            # A restored state is only valid if the history still has the same close on its last day
+            position = int(np.searchsorted(columns['date'], state.last_day))
+            if position < columns['date'].size and columns['date'][position] == state.last_day \
+                    and abs(columns['close'][position] - state.last_close) <= 1e-6 * abs(state.last_close):
+                self._catch_up(ticker, state, columns)
+                return state
+            logger.info(f"Discarding indicator checkpoint of {ticker}: history changed")
+        state = IndicatorState()
+        self._catch_up(ticker, state, columns)
+        return state
+
+    def _catch_up(self, ticker: str, state: IndicatorState, columns: Optional[Dict[str, np.ndarray]]) -> None:
+        """Commit the closed sessions of the history that the state has not seen"""
+        self._synced[ticker] = time.monotonic()
+        if columns is None or not columns['date'].size:
+            return
+        days = columns['date']
+        today = (market_today() - date(1970, 1, 1)).days
+        lo = int(np.searchsorted(days, state.last_day, side='right')) if state.last_day is not None else 0
+        hi = int(np.searchsorted(days, today, side='left'))
+        open_day = self._bars.get(ticker, [None])[0]
+        if open_day is not None:
+            hi = min(hi, int(np.searchsorted(days, open_day, side='left')))
+        if state.last_day is None and hi - lo > WARMUP_SESSIONS:
+            # Only the recent sessions are replayed; OBV is cumulative, so its level comes vectorized
+            first = hi - WARMUP_SESSIONS
+            state.update(int(days[first]), float(columns['close'][first]))
+            state.obv = float(obv_series(columns['close'][:first + 1], columns['volume'][:first + 1])[-1])
+            lo = first + 1
+        for position in range(lo, hi):
+            state.update(int(days[position]), float(columns['close'][position]), float(columns['high'][position]),
+                         float(columns['low'][position]), float(columns['volume'][position]))
+        if hi > lo:
+            self._dirty.add(ticker)
+        # Today's row in the history is the open session until ticks take over
+        if ticker not in self._bars and hi < days.size and days[hi] == today:
+            self._bars[ticker] = [today, float(columns['close'][hi]), float(columns['high'][hi]),
+                                  float(columns['low'][hi]), float(columns['volume'][hi])]
+
+    def on_tick(self, ticker: str, timestamp: float, price: float, volume: float = np.nan,
+                bid: float = np.nan, ask: float = np.nan) -> None:
+        if not _finite(price):
+            return
+        ticker = ticker.upper()
+        day = session_day(timestamp)
+        with self._lock:
+            state = self.state(ticker)
+            bar = self._bars.get(ticker)
+            if bar is not None and day < bar[0]:
+                return  # Tick from a session already closed
+            if bar is not None and day > bar[0]:
+                # New session: the previous one is closed and becomes part of the state
+                if state.last_day is None or bar[0] > state.last_day:
+                    state.update(*bar)
+                    self._dirty.add(ticker)
+                bar = None
+            if bar is None:
+                self._bars[ticker] = [day, price, price, price, volume if _finite(volume) else 0.0]
+            else:
+                bar[1] = price
+                bar[2] = max(bar[2], price) if _finite(bar[2]) else price
+                bar[3] = min(bar[3], price) if _finite(bar[3]) else price
+                if _finite(volume):
+                    bar[4] = volume  # brapi volume is the session total so far
+            due = self._dirty and time.monotonic() - self._last_checkpoint >= self.checkpoint_interval
+        if due:
+            self.checkpoint()
+
+    def snapshot(self, ticker: str) -> Optional[Dict]:
+        """Current indicator values (including the open session, if any)"""
+        ticker = ticker.upper()
+        with self._lock:
+            if ticker not in self._states and self.loader is None:
+                return None
+            state = self.state(ticker)
+            bar = self._bars.get(ticker)
+            if bar is not None and (state.last_day is None or bar[0] > state.last_day):
+                values = state.values(*bar[1:])
+                day = bar[0]
+            else:
+                values = state.values()
+                day = state.last_day
+        if day is None:
+            return None
+        values['session'] = str(np.datetime64(int(day), 'D'))
+        return values
+
+    def checkpoint(self, tickers: Optional[List[str]] = None) -> int:
+        """Save the states that changed since the last checkpoint (or the given tickers)"""
+        with self._lock:
+            names = set(tickers) if tickers is not None else set(self._dirty)
+            payload = {name: json.dumps(self._states[name].to_dict()) for name in names if name in self._states}
+            self._dirty -= names
+            self._last_checkpoint = time.monotonic()
+        if not payload or self.redis is None:
+            return 0
+        try:
+            self.redis.hset(CHECKPOINT_KEY, mapping=payload)
+        except Exception as e:
+            logger.error(f"Indicator checkpoint error: {str(e)}")
+            with self._lock:
+                self._dirty |= set(payload)
+            return 0
+        return len(payload)
+
+    def _restore(self, ticker: str) -> Optional[IndicatorState]:
+        if self.redis is None:
+            return None
+        try:
+            raw = self.redis.hget(CHECKPOINT_KEY, ticker)
+            return IndicatorState.from_dict(json.loads(raw)) if raw else None
+        except Exception as e:
+            logger.warning(f"Indicator checkpoint of {ticker} not restored: {str(e)}")
+            return None
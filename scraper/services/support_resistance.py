@@ -0,0 +1,351 @@
+"""
+Pivot-based support and resistance levels.
+
+For each timeframe (daily sessions, and weeks and months resampled from them) a
+swing high is a bar whose high is above the `window` bars before it and not below
+the `window` bars after it (swing lows mirror that). Detection is one sliding-window
+comparison over a (tickers x bars) matrix, so a whole batch of tickers is done at once.
+
+The pivots of a ticker are sorted by price and split wherever the gap between two
+neighbours exceeds half an ATR, so each cluster becomes one level. A level records
+its touches (pivots in the cluster), how many were highs and lows, when it was last
+touched, and a score: the sum of the touches' recency weights, 0.5 ** (age / half_life).
+Whether a level is support or resistance depends only on the current price, so that
+split is made when the levels are read.
+
+Levels only change when a new bar arrives. Results are cached (in process and in
+Redis) under the ticker's last session day, so they are recomputed once per bar.
+"""
+import json
+import logging
+import threading
+import time
+from datetime import date
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from services.indicator_engine import atr, stack
+
+logger = logging.getLogger(__name__)
+
+TIMEFRAMES = ('1d', '1wk', '1mo')
+PIVOT_WINDOW = {'1d': 5, '1wk': 3, '1mo': 2}        # Bars on each side of a pivot
+LOOKBACK = {'1d': 500, '1wk': 260, '1mo': 120}      # Bars searched for pivots
+HALF_LIFE = {'1d': 60, '1wk': 26, '1mo': 12}        # Bars for a touch to lose half its weight
+TIMEFRAME_WEIGHT = {'1d': 1.0, '1wk': 2.0, '1mo': 3.0}
+CLUSTER_ATR = 0.5             # Pivots closer than this many ATRs belong to the same level
+MIN_TOLERANCE = 0.005         # ... and never closer than 0.5% of the price
+CACHE_PREFIX = 'sr'
+CACHE_TTL = 3 * 86400         # Fallback expiry; entries are replaced when a new bar arrives
+BATCH_TICKERS = 128
+
+def resample(columns: Dict[str, np.ndarray], timeframe: str) -> Dict[str, np.ndarray]:
+    """Weekly (Monday-based) or monthly bars from daily columns"""
+    if timeframe == '1d':
+        return columns
+    days = np.asarray(columns['date'], dtype=np.int64)
+    if days.size == 0:
+        return columns
+    if timeframe == '1wk':
+        groups = (days + 3) // 7  # Day 0 (1970-01-01) was a Thursday
+    elif timeframe == '1mo':
+        groups = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    else:
+        raise ValueError(f"Unsupported timeframe {timeframe}")
+    starts = np.concatenate(([0], np.flatnonzero(groups[1:] != groups[:-1]) + 1))
+    ends = np.append(starts[1:], days.size) - 1
+    high = np.where(np.isnan(columns['high']), columns['close'], columns['high'])
+    low = np.where(np.isnan(columns['low']), columns['close'], columns['low'])
+    return {
+        'date': days[ends],
+        'high': np.fmax.reduceat(high, starts),
+        'low': np.fmin.reduceat(low, starts),
+        'close': columns['close'][ends],
+    }
+
+def find_pivots(high: np.ndarray, low: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Boolean masks of swing highs and swing lows, same shape as the inputs"""
+    high, low = np.atleast_2d(high), np.atleast_2d(low)
+    is_high = np.zeros(high.shape, dtype=bool)
+    is_low = np.zeros(low.shape, dtype=bool)
+    size = 2 * window + 1
+    if high.shape[-1] < size:
+        return is_high, is_low
+    highs = sliding_window_view(high, size, axis=-1)
+    lows = sliding_window_view(low, size, axis=-1)
+    center_high, center_low = highs[..., window], lows[..., window]
+    # Strict on the left and loose on the right, so a flat top counts once (its first bar)
+    with np.errstate(invalid='ignore'):
+        is_high[..., window:-window] = (center_high > highs[..., :window].max(axis=-1)) & \
+                                       (center_high >= highs[..., window + 1:].max(axis=-1))
+        is_low[..., window:-window] = (center_low < lows[..., :window].min(axis=-1)) & \
+                                      (center_low <= lows[..., window + 1:].min(axis=-1))
+    return is_high, is_low
+
+def cluster_levels(prices: np.ndarray, ages: np.ndarray, is_high: np.ndarray, tolerance: float,
+                   half_life: float) -> Dict[str, np.ndarray]:
+    """Group pivot prices into levels (columns: level, touches, highs, lows, score, age)"""
+    if prices.size == 0:
+        return {name: np.empty(0) for name in ('level', 'touches', 'highs', 'lows', 'score', 'age')}
+    order = np.argsort(prices, kind='stable')
+    prices, ages, is_high = prices[order], ages[order], is_high[order]
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(prices) > tolerance) + 1))
+    weights = 0.5 ** (ages / half_life)
+    score = np.add.reduceat(weights, starts)
+    return {
+        'level': np.add.reduceat(prices * weights, starts) / score,
+        'touches': np.diff(np.append(starts, prices.size)),
+        'highs': np.add.reduceat(is_high.astype(np.int64), starts),
+        'lows': np.add.reduceat((~is_high).astype(np.int64), starts),
+        'score': score,
+        'age': np.minimum.reduceat(ages, starts),
+    }
+
+def _strength(score: float, best: float) -> str:
+    if best <= 0 or score >= 0.66 * best:
+        return 'strong'
+    return 'moderate' if score >= 0.33 * best else 'weak'
+
+def _day_iso(day: int) -> str:
+    return str(np.datetime64(int(day), 'D'))
+
+def detect_levels(batch: Dict[str, Dict[str, np.ndarray]], timeframe: str) -> Dict[str, List[Dict]]:
+    """Levels of one timeframe for a batch of tickers ({ticker: daily columns})"""
+    bars = {ticker: resample(columns, timeframe) for ticker, columns in batch.items()}
+    names = [ticker for ticker, columns in bars.items() if columns['date'].size]
+    if not names:
+        return {}
+    lookback = LOOKBACK[timeframe]
+    tails = {ticker: {name: values[-lookback:] for name, values in bars[ticker].items()} for ticker in names}
+    high = stack([tails[ticker]['high'].astype(np.float64) for ticker in names])
+    low = stack([tails[ticker]['low'].astype(np.float64) for ticker in names])
+    close = stack([tails[ticker]['close'].astype(np.float64) for ticker in names])
+    is_high, is_low = find_pivots(high, low, PIVOT_WINDOW[timeframe])
+    ranges = atr(high, low, close)[:, -1]
+    width = high.shape[1]
+
+    levels = {}
+    for row, ticker in enumerate(names):
+        rows, columns = np.nonzero(np.stack((is_high[row], is_low[row])))
+        prices = np.where(rows == 0, high[row, columns], low[row, columns])
+        last_close = close[row, -1]
+        tolerance = max(CLUSTER_ATR * ranges[row] if ranges[row] == ranges[row] else 0.0,
+                        MIN_TOLERANCE * last_close)
+        clusters = cluster_levels(prices, (width - 1 - columns).astype(np.float64), rows == 0,
+                                  tolerance, HALF_LIFE[timeframe])
+        dates = tails[ticker]['date']
+        size = dates.size
+        best = float(clusters['score'].max()) if clusters['score'].size else 0.0
+        levels[ticker] = [
+            {
+                'level': round(float(level), 4),
+                'touches': int(touches),
+                'pivot_highs': int(highs),
+                'pivot_lows': int(lows),
+                'score': round(float(score), 4),
+                'strength': _strength(score, best),
+                'last_touch': _day_iso(dates[size - 1 - int(age)]),
+                'timeframe': timeframe,
+            }
+            for level, touches, highs, lows, score, age in zip(
+                clusters['level'], clusters['touches'], clusters['highs'], clusters['lows'],
+                clusters['score'], clusters['age'])
+        ]
+    return levels
+
+def merge_timeframes(levels_by_timeframe: Dict[str, List[Dict]], tolerance: float) -> List[Dict]:
+    """Key levels: levels of all timeframes within tolerance merged, scores weighted by timeframe"""
+    flat = [level for levels in levels_by_timeframe.values() for level in levels]
+    if not flat:
+        return []
+    prices = np.array([level['level'] for level in flat])
+    weights = np.array([level['score'] * TIMEFRAME_WEIGHT[level['timeframe']] for level in flat])
+    order = np.argsort(prices, kind='stable')
+    prices, weights = prices[order], weights[order]
+    flat = [flat[i] for i in order]
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(prices) > tolerance) + 1))
+    ends = np.append(starts[1:], prices.size)
+    score = np.add.reduceat(weights, starts)
+    merged_prices = np.add.reduceat(prices * weights, starts) / np.where(score > 0, score, 1)
+    best = float(score.max())
+    merged = []
+    for start, end, price, total in zip(starts, ends, merged_prices, score):
+        members = flat[start:end]
+        merged.append({
+            'level': round(float(price), 4),
+            'touches': sum(level['touches'] for level in members),
+            'score': round(float(total), 4),
+            'strength': _strength(total, best),
+            'last_touch': max(level['last_touch'] for level in members),
+            'timeframes': sorted({level['timeframe'] for level in members}, key=TIMEFRAMES.index),
+        })
+    return merged
+
+def classify(levels: List[Dict], current_price: float, max_levels: int = 5) -> Tuple[List[Dict], List[Dict]]:
+    """Nearest supports (below the price) and resistances (above), with the distance to each"""
+    supports, resistances = [], []
+    for level in levels:
+        distance = (level['level'] - current_price) / current_price * 100
+        entry = dict(level, distance_percent=round(abs(distance), 2))
+        if level['level'] < current_price:
+            supports.append(dict(entry, type='support'))
+        elif level['level'] > current_price:
+            resistances.append(dict(entry, type='resistance'))
+    supports.sort(key=lambda level: -level['level'])
+    resistances.sort(key=lambda level: level['level'])
+    return supports[:max_levels], resistances[:max_levels]
+
+class SupportResistanceEngine:
+    """Batch level detection with a cache that lasts until the ticker's next bar"""
+
+    def __init__(self, redis_client=None, history_store=None,
+                 loader: Optional[Callable[[str], Dict[str, np.ndarray]]] = None):
+        self.redis = redis_client
+        self.history = history_store
+        self.loader = loader or (history_store.read if history_store is not None else None)
+        self._cache: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def _cache_key(self, ticker: str) -> str:
+        return f"{CACHE_PREFIX}:{ticker}"
+
+    def _last_day(self, ticker: str) -> Optional[int]:
+        if self.history is None:
+            return None
+        last = self.history.last_date(ticker)
+        return (last - date(1970, 1, 1)).days if last else None
+
+    def _cached(self, ticker: str, last_day: Optional[int]) -> Optional[Dict]:
+        if last_day is None:
+            return None
+        entry = self._cache.get(ticker)
+        if entry is not None and entry['last_day'] == last_day:
+            return entry
+        if self.redis is None:
+            return None
+        try:
+            raw = self.redis.get(self._cache_key(ticker))
+            entry = json.loads(raw) if raw else None
+        except Exception as e:
+            logger.error(f"Support/resistance cache read error: {str(e)}")
+            return None
+        if entry is not None and entry['last_day'] == last_day:
+            with self._lock:
+                self._cache[ticker] = entry
+            return entry
+        return None
+
+    def _store(self, results: Dict[str, Dict]) -> None:
+        with self._lock:
+            self._cache.update(results)
+        if self.redis is None or not results:
+            return
+        try:
+            pipeline = self.redis.pipeline(transaction=False)
+            for ticker, entry in results.items():
+                pipeline.set(self._cache_key(ticker), json.dumps(entry), ex=CACHE_TTL)
+            pipeline.execute()
+        except Exception as e:
+            logger.error(f"Support/resistance cache write error: {str(e)}")
+
+    def compute(self, tickers: List[str]) -> Dict[str, Dict]:
+        """Levels of every timeframe for a batch of tickers (no cache lookup)"""
+        batch = {}
+        for ticker in tickers:
+            try:
+                columns = self.loader(ticker)
+            except Exception as e:
+                logger.error(f"Support/resistance history load failed for {ticker}: {str(e)}")
+                continue
+            if columns is not None and columns['date'].size:
+                batch[ticker] = columns
+
+        per_timeframe = {timeframe: detect_levels(batch, timeframe) for timeframe in TIMEFRAMES}
+        results = {}
+        for ticker, columns in batch.items():
+            close = float(columns['close'][-1])
+            timeframes = {timeframe: per_timeframe[timeframe].get(ticker, []) for timeframe in TIMEFRAMES}
+            results[ticker] = {
+                'last_day': int(columns['date'][-1]),
+                'close': close,
+                'timeframes': timeframes,
+                'key_levels': merge_timeframes(timeframes, MIN_TOLERANCE * close * 2),
+            }
+        return results
+
+    def compute_all(self, tickers: Optional[List[str]] = None, batch_size: int = BATCH_TICKERS) -> Dict:
+        """Recompute and cache every ticker (all stored histories by default)"""
+        started = time.monotonic()
+        tickers = [ticker.upper() for ticker in (tickers or (self.history.tickers() if self.history else []))]
+        computed = 0
+        for first in range(0, len(tickers), batch_size):
+            results = self.compute(tickers[first:first + batch_size])
+            self._store(results)
+            computed += len(results)
+        summary = {'tickers': computed, 'seconds': round(time.monotonic() - started, 3)}
+        logger.info(f"Support/resistance levels: {summary}")
+        return summary
+
+    def levels(self, ticker: str) -> Optional[Dict]:
+        """Cached levels of a ticker, recomputed when a new bar arrived"""
+        ticker = ticker.upper()
+        cached = self._cached(ticker, self._last_day(ticker))
+        if cached is not None:
+            return cached
+        results = self.compute([ticker])
+        self._store(results)
+        return results.get(ticker)
+
+    def analyze(self, ticker: str, current_price: Optional[float] = None,
+                timeframes: Optional[List[str]] = None, max_levels: int = 5) -> Optional[Dict]:
+        """Supports and resistances around the current price (last close by default)"""
+        entry = self.levels(ticker)
+        if entry is None:
+            return None
+        price = current_price or entry['close']
+        selected = [timeframe for timeframe in (timeframes or TIMEFRAMES) if timeframe in entry['timeframes']]
+        if selected == list(TIMEFRAMES):
+            levels = entry['key_levels']
+        else:
+            levels = merge_timeframes({tf: entry['timeframes'][tf] for tf in selected}, MIN_TOLERANCE * price * 2)
+        supports, resistances = classify(levels, price, max_levels)
+        return {
+            'ticker': ticker.upper(),
+            'current_price': price,
+            'last_session': _day_iso(entry['last_day']),
+            'timeframes': selected,
+            'support_levels': supports,
+            'resistance_levels': resistances,
+            'key_levels': supports + resistances,
+        }
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Compute support/resistance levels for the stored daily histories')
+    parser.add_argument('--tickers', nargs='*', help='Only these tickers (default: every stored history)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    from app import app, db, redis_client
+    from services.corporate_actions import AdjustmentEngine
+    from services.history_store import history_store
+
+    adjustments = AdjustmentEngine(redis_client, history_store)
+
+    def adjusted_history(ticker):
+        try:
+            return adjustments.adjusted(db.session, ticker)
+        except Exception as e:
+            # Keep the session usable for the next tickers
+            db.session.rollback()
+            logger.error(f"Adjustment failed for {ticker}, using raw prices: {str(e)}")
+            return history_store.read(ticker)
+
+    with app.app_context():
+        engine = SupportResistanceEngine(redis_client, history_store, loader=adjusted_history)
+        result = engine.compute_all(args.tickers)
+    print(json.dumps(result, indent=2))
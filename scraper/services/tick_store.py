@@ -0,0 +1,234 @@
+"""
+In-process intraday tick store.
+
+Each ticker gets a fixed-capacity columnar ring buffer of (timestamp, price, volume,
+bid, ask) float64 columns. Every tick is written twice, at slot i and i + capacity,
+so the latest n ticks are always one contiguous slice and windows are returned as
+NumPy views without copying. Memory per symbol is 2 x capacity x 5 x 8 bytes
+(160 KB with the default 2048 ticks, about 2h50 of 5 s polling).
+
+Views alias the buffer: a window is only stable until the next `capacity` appends,
+so callers that keep data around (or hand it to another thread) should pass copy=True.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ('timestamp', 'price', 'volume', 'bid', 'ask')
+TIMESTAMP, PRICE, VOLUME, BID, ASK = range(len(FIELDS))
+
+DEFAULT_CAPACITY = int(os.getenv('TICK_BUFFER_CAPACITY', '2048'))
+
+class TickRingBuffer:
+    """Fixed-capacity ring buffer of ticks with O(1) append and zero-copy window views"""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self._data = np.full((len(FIELDS), 2 * capacity), np.nan, dtype=np.float64)
+        self._next = 0      # Slot (0..capacity-1) the next tick goes to
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def nbytes(self) -> int:
+        return self._data.nbytes
+
+    def append(self, timestamp: float, price: float, volume: float = np.nan,
+               bid: float = np.nan, ask: float = np.nan) -> bool:
+        """
+        Append one tick. Ticks not newer than the last one are ignored (the same quote
+        polled twice), which keeps the timestamp column sorted. Returns True if stored
+        """
+        with self._lock:
+            if self._count and timestamp <= self._data[TIMESTAMP, self._next + self.capacity - 1]:
+                return False
+            slot = self._next
+            row = (timestamp, price, volume, bid, ask)
+            self._data[:, slot] = row
+            self._data[:, slot + self.capacity] = row
+            self._next = (slot + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+            return True
+
+    def _bounds(self, n: Optional[int]):
+        count = self._count if n is None else max(0, min(n, self._count))
+        end = self._next + self.capacity
+        return end - count, end
+
+    def window(self, n: Optional[int] = None, copy: bool = False) -> np.ndarray:
+        """Latest n ticks (all if n is None), oldest first, as a (len(FIELDS), n) array"""
+        with self._lock:
+            start, end = self._bounds(n)
+            view = self._data[:, start:end]
+            return view.copy() if copy else view
+
+    def column(self, field: str, n: Optional[int] = None, copy: bool = False) -> np.ndarray:
+        """Latest n values of one field, e.g. column('price', 100)"""
+        return self.window(n, copy)[FIELDS.index(field)]
+
+    def since(self, timestamp: float, copy: bool = False) -> np.ndarray:
+        """Ticks with timestamp >= the given epoch seconds, oldest first"""
+        with self._lock:
+            start, end = self._bounds(None)
+            offset = int(np.searchsorted(self._data[TIMESTAMP, start:end], timestamp, side='left'))
+            view = self._data[:, start + offset:end]
+            return view.copy() if copy else view
+
+    def last(self) -> Optional[Dict[str, float]]:
+        with self._lock:
+            if not self._count:
+                return None
+            values = self._data[:, self._next + self.capacity - 1]
+            return dict(zip(FIELDS, values.tolist()))
+
+def window_to_records(window: np.ndarray) -> List[Dict[str, Optional[float]]]:
+    """Convert a window to JSON-friendly dicts (NaN becomes None)"""
+    columns = [
+        [None if value != value else value for value in row]
+        for row in window.tolist()
+    ]
+    return [dict(zip(FIELDS, values)) for values in zip(*columns)]
+
+def _quote_timestamp(quote: Dict) -> float:
+    """Exchange time of a brapi quote in epoch seconds, falling back to now"""
+    market_time = quote.get('regularMarketTime')
+    if isinstance(market_time, (int, float)):
+        return float(market_time)
+    if isinstance(market_time, str):
+        try:
+            return datetime.fromisoformat(market_time.replace('Z', '+00:00')).timestamp()
+        except ValueError:
+            pass
+    return time.time()
+
+def _as_float(value) -> float:
+    try:
+        return float(value) if value is not None else np.nan
+    except (TypeError, ValueError):
+        return np.nan
+
+class TickStore:
+    """Per-ticker tick buffers, created on first tick with a bounded capacity each"""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._buffers: Dict[str, TickRingBuffer] = {}
+        self._listeners: List[Callable] = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, callback: Callable) -> None:
+        """Call callback(ticker, timestamp, price, volume, bid, ask) for every stored tick"""
+        with self._lock:
+            if callback not in self._listeners:
+                self._listeners.append(callback)
+
+    def buffer(self, ticker: str, create: bool = False) -> Optional[TickRingBuffer]:
+        ticker = ticker.upper()
+        buffer = self._buffers.get(ticker)
+        if buffer is None and create:
+            with self._lock:
+                buffer = self._buffers.setdefault(ticker, TickRingBuffer(self.capacity))
+        return buffer
+
+    def append(self, ticker: str, timestamp: float, price: float, volume: float = np.nan,
+               bid: float = np.nan, ask: float = np.nan) -> bool:
+        if not ticker or not price or price != price:
+            return False
+        stored = self.buffer(ticker, create=True).append(timestamp, price, volume, bid, ask)
+        if stored:
+            for callback in self._listeners:
+                try:
+                    callback(ticker.upper(), timestamp, price, volume, bid, ask)
+                except Exception as e:
+                    logger.error(f"Tick listener error: {str(e)}")
+        return stored
+
+    def append_quote(self, quote: Dict) -> bool:
+        """Append a raw brapi quote (symbol, regularMarketPrice, regularMarketTime, ...)"""
+        try:
+            return self.append(
+                quote.get('symbol', ''),
+                _quote_timestamp(quote),
+                _as_float(quote.get('regularMarketPrice')),
+                _as_float(quote.get('regularMarketVolume')),
+                _as_float(quote.get('bid')),
+                _as_float(quote.get('ask')),
+            )
+        except Exception as e:
+            logger.error(f"Tick store append error: {str(e)}")
+            return False
+
+    def append_quotes(self, quotes) -> int:
+        return sum(1 for quote in quotes if quote and self.append_quote(quote))
+
+    def window(self, ticker: str, n: Optional[int] = None, copy: bool = False) -> Optional[np.ndarray]:
+        buffer = self.buffer(ticker)
+        return buffer.window(n, copy) if buffer is not None else None
+
+    def since(self, ticker: str, timestamp: float, copy: bool = False) -> Optional[np.ndarray]:
+        buffer = self.buffer(ticker)
+        return buffer.since(timestamp, copy) if buffer is not None else None
+
+    def tickers(self) -> List[str]:
+        return list(self._buffers)
+
+    def stats(self) -> Dict:
+        buffers = list(self._buffers.values())
+        return {
+            'symbols': len(buffers),
+            'capacity_per_symbol': self.capacity,
+            'ticks': sum(len(buffer) for buffer in buffers),
+            'bytes': sum(buffer.nbytes for buffer in buffers),
+        }
+
+def intraday_summary(window: np.ndarray) -> Dict:
+    """
+    Intraday analytics over a tick window. brapi volume is the cumulative session
+    volume, so traded volume per tick is the positive part of its first difference
+    """
+    prices = window[PRICE]
+    if prices.size == 0:
+        return {'ticks': 0}
+
+    summary = {
+        'ticks': int(prices.size),
+        'first_timestamp': float(window[TIMESTAMP, 0]),
+        'last_timestamp': float(window[TIMESTAMP, -1]),
+        'open': float(prices[0]),
+        'last': float(prices[-1]),
+        'high': float(np.nanmax(prices)),
+        'low': float(np.nanmin(prices)),
+        'change_percent': float((prices[-1] / prices[0] - 1) * 100) if prices[0] else 0.0,
+        'vwap': None,
+        'volatility': None,
+        'spread': None,
+    }
+
+    if prices.size > 1:
+        traded = np.clip(np.diff(window[VOLUME]), 0, None)
+        traded = np.nan_to_num(traded)
+        if traded.sum() > 0:
+            summary['vwap'] = float(np.dot(prices[1:], traded) / traded.sum())
+        returns = np.diff(np.log(prices))
+        summary['volatility'] = float(np.nanstd(returns))
+
+    spreads = window[ASK] - window[BID]
+    if np.isfinite(spreads).any():
+        summary['spread'] = float(np.nanmean(spreads))
+
+    return summary
+
+# Process-wide store fed by the quote pollers
+tick_store = TickStore()
@@ -0,0 +1,118 @@
+"""
+Parity tests for the technical indicators: batch series (services.indicator_engine)
+against reference definitions, and the streaming state (services.streaming_indicators)
+against the batch series.
+
+    python -m pytest -q test_indicators.py
+"""
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.indicator_engine import (
+    INDICATOR_COLUMNS, bollinger, compute_indicators, ema, rsi, sma, stack,
+)
+from services.streaming_indicators import IndicatorState
+
+SESSIONS = 600
+
+@pytest.fixture(scope='module')
+def prices():
+    rng = np.random.default_rng(7)
+    close = 30.0 * np.exp(np.cumsum(rng.normal(0.0, 0.02, SESSIONS)))
+    spread = np.abs(rng.normal(0.0, 0.01, SESSIONS)) * close
+    return {
+        'date': np.arange(19000, 19000 + SESSIONS),
+        'close': close,
+        'high': close + spread,
+        'low': close - spread,
+        'volume': rng.integers(1_000, 100_000, SESSIONS).astype(np.float64),
+    }
+
+def _reference_ema(values, n, alpha=None):
+    alpha = 2.0 / (n + 1) if alpha is None else alpha
+    out = np.full(values.size, np.nan)
+    out[n - 1] = values[:n].mean()
+    for t in range(n, values.size):
+        out[t] = out[t - 1] + alpha * (values[t] - out[t - 1])
+    return out
+
+def test_sma_and_bollinger_match_pandas(prices):
+    close = prices['close']
+    rolling = pd.Series(close).rolling(20)
+    upper, middle, lower = bollinger(close)
+
+    np.testing.assert_allclose(sma(close, 20), rolling.mean().to_numpy(), rtol=1e-10, equal_nan=True)
+    np.testing.assert_allclose(middle, rolling.mean().to_numpy(), rtol=1e-10, equal_nan=True)
+    np.testing.assert_allclose(upper, (rolling.mean() + 2 * rolling.std(ddof=0)).to_numpy(),
+                               rtol=1e-9, equal_nan=True)
+    np.testing.assert_allclose(lower, (rolling.mean() - 2 * rolling.std(ddof=0)).to_numpy(),
+                               rtol=1e-9, equal_nan=True)
+
+def test_ema_is_seeded_with_the_sma(prices):
+    close = prices['close']
+    for n in (12, 26, 50):
+        np.testing.assert_allclose(ema(close, n)[0], _reference_ema(close, n), rtol=1e-10, equal_nan=True)
+
+def test_rsi_uses_wilder_smoothing(prices):
+    close = prices['close']
+    delta = np.diff(close)
+    gain = _reference_ema(np.maximum(delta, 0.0), 14, alpha=1 / 14)
+    loss = _reference_ema(np.maximum(-delta, 0.0), 14, alpha=1 / 14)
+    expected = np.concatenate(([np.nan], 100.0 - 100.0 / (1.0 + gain / loss)))
+
+    np.testing.assert_allclose(rsi(close)[0], expected, rtol=1e-10, equal_nan=True)
+
+def test_rsi_without_losses():
+    rising = np.arange(1.0, 40.0)
+    flat = np.full(40, 10.0)
+    assert rsi(rising)[0, -1] == 100.0
+    assert rsi(flat)[0, -1] == 50.0
+
+def test_batch_rows_match_single_series(prices):
+    short = {name: values[-250:] for name, values in prices.items()}
+    batch = compute_indicators({
+        name: stack([prices[name], short[name]]) for name in ('close', 'high', 'low', 'volume')
+    })
+    single = compute_indicators(short)
+    for name in INDICATOR_COLUMNS:
+        np.testing.assert_allclose(batch[name][1, -250:], single[name][0], rtol=1e-9, equal_nan=True)
+
+def _assert_matches(streamed, batch, t):
+    for name in INDICATOR_COLUMNS:
+        expected = batch[name][0, t]
+        value = streamed[name]
+        if math.isnan(expected):
+            assert value is None, name
+        else:
+            assert value == pytest.approx(expected, rel=1e-7, abs=1e-9), name
+
+def test_streaming_state_matches_batch(prices):
+    batch = compute_indicators(prices)
+    state = IndicatorState()
+    for t in range(SESSIONS):
+        state.update(int(prices['date'][t]), prices['close'][t], prices['high'][t],
+                     prices['low'][t], prices['volume'][t])
+        if t in (0, 13, 14, 19, 25, 34, 199, SESSIONS - 1):
+            _assert_matches(state.values(), batch, t)
+
+def test_streaming_open_bar_matches_committed_bar(prices):
+    state = IndicatorState()
+    for t in range(SESSIONS - 1):
+        state.update(int(prices['date'][t]), prices['close'][t], prices['high'][t],
+                     prices['low'][t], prices['volume'][t])
+    last = [prices[name][-1] for name in ('close', 'high', 'low', 'volume')]
+
+    peeked = state.values(*last)
+    state.update(int(prices['date'][-1]), *last)
+    assert peeked == pytest.approx(state.values(), rel=1e-12)
+
+def test_state_round_trips_through_dict(prices):
+    state = IndicatorState()
+    for t in range(300):
+        state.update(int(prices['date'][t]), prices['close'][t], prices['high'][t],
+                     prices['low'][t], prices['volume'][t])
+    restored = IndicatorState.from_dict(state.to_dict())
+    assert restored.values() == pytest.approx(state.values(), rel=1e-12)
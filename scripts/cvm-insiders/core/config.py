@@ -11,6 +11,9 @@ class Settings:
     BASE_DIR = Path(__file__).resolve().parent.parent
     DOWNLOAD_DIR = BASE_DIR / "data" / "downloads"
 
+    # Cache persistente dos resultados do parser (sidecar SQLite ao lado dos downloads)
+    PARSE_CACHE_PATH = BASE_DIR / "data" / "parse_cache.sqlite3"
+
 settings = Settings()
 
 # Cria o diretório de downloads se não existir
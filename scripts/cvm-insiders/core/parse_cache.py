@@ -0,0 +1,141 @@
+# core/parse_cache.py
+
+import hashlib
+import json
+import sqlite3
+import threading
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Union
+
+def compute_rules_version(*sources: Union[str, Path], extra: str = "") -> str:
+    """
+    Gera a versão do parser a partir do código-fonte que define as regras de extração.
+    Qualquer alteração nesses arquivos muda a versão e invalida o cache automaticamente.
+    """
+    digest = hashlib.sha256(extra.encode("utf-8"))
+    for source in sources:
+        digest.update(Path(source).read_bytes())
+    return digest.hexdigest()[:16]
+
+def file_sha256(path: Union[str, Path], chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _json_default(value: Any):
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    raise TypeError(f"Tipo não serializável no cache: {type(value)!r}")
+
+def _json_object_hook(obj: Dict[str, Any]):
+    if len(obj) == 1:
+        if "__date__" in obj:
+            return date.fromisoformat(obj["__date__"])
+        if "__datetime__" in obj:
+            return datetime.fromisoformat(obj["__datetime__"])
+    return obj
+
+class ParseCache:
+    """
+    Cache persistente (sidecar SQLite) de resultados do parser de PDFs.
+    A chave é (SHA-256 do arquivo, versão do parser); o valor guarda as transações
+    extraídas e os metadados do documento. A conexão é compartilhada entre threads
+    e serializada por um lock.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS parse_results (
+        file_sha256 TEXT NOT NULL,
+        parser_version TEXT NOT NULL,
+        file_name TEXT,
+        transactions TEXT NOT NULL,
+        metadata TEXT NOT NULL,
+        parsed_at TEXT NOT NULL,
+        PRIMARY KEY (file_sha256, parser_version)
+    );
+    CREATE TABLE IF NOT EXISTS file_hashes (
+        path TEXT PRIMARY KEY,
+        size INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        file_sha256 TEXT NOT NULL
+    );
+    """
+
+    def __init__(self, db_path: Union[str, Path]):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(self.SCHEMA)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def file_hash(self, pdf_path: Union[str, Path]) -> str:
+        """SHA-256 do arquivo, reaproveitado enquanto tamanho e mtime não mudarem."""
+        path = Path(pdf_path).resolve()
+        stat = path.stat()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, file_sha256 FROM file_hashes WHERE path = ?", (str(path),)
+            ).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+
+        sha = file_sha256(path)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO file_hashes (path, size, mtime_ns, file_sha256) VALUES (?, ?, ?, ?)",
+                (str(path), stat.st_size, stat.st_mtime_ns, sha),
+            )
+            self._conn.commit()
+        return sha
+
+    def get(self, pdf_path: Union[str, Path], parser_version: str) -> Optional[Dict[str, Any]]:
+        sha = self.file_hash(pdf_path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT transactions, metadata FROM parse_results WHERE file_sha256 = ? AND parser_version = ?",
+                (sha, parser_version),
+            ).fetchone()
+        if not row:
+            return None
+        return {
+            "transactions": json.loads(row[0], object_hook=_json_object_hook),
+            "metadata": json.loads(row[1], object_hook=_json_object_hook),
+        }
+
+    def put(self, pdf_path: Union[str, Path], parser_version: str,
+            transactions: Iterable[Dict[str, Any]], metadata: Optional[Dict[str, Any]] = None):
+        sha = self.file_hash(pdf_path)
+        row = (
+            sha, parser_version, Path(pdf_path).name,
+            json.dumps(list(transactions), default=_json_default, ensure_ascii=False),
+            json.dumps(metadata or {}, default=_json_default, ensure_ascii=False),
+            datetime.utcnow().isoformat(),
+        )
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO parse_results "
+                "(file_sha256, parser_version, file_name, transactions, metadata, parsed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                row,
+            )
+            self._conn.commit()
+
+    def purge_stale(self, parser_version: str) -> int:
+        """Remove resultados gerados por versões anteriores do parser."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM parse_results WHERE parser_version != ?", (parser_version,)
+            )
+            self._conn.commit()
+            return cursor.rowcount
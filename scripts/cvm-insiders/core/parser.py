@@ -1,14 +1,27 @@
 # core/parser.py
 
 import pdfplumber
+import pypdfium2 as pdfium
 import re
 import pandas as pd
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+from .parse_cache import ParseCache, compute_rules_version
+
+# Muda sempre que as regras de extração deste módulo mudam (hash do próprio código-fonte)
+PARSER_VERSION = compute_rules_version(Path(__file__))
+
+# Marcadores usados na pré-varredura do texto bruto (comparados sem espaços em branco)
+MOVEMENTS_MARKER = "MovimentaçõesnoMês"
+NO_OPERATIONS_MARKER = "(X)nãoforamrealizadasoperações"
 
 class PDFParser:
-    def __init__(self, pdf_path: str):
+    def __init__(self, pdf_path: str, cache: Optional[ParseCache] = None):
         self.pdf_path = str(pdf_path)
+        self.cache = cache
+        self.metadata: Dict[str, Any] = {}
 
     def _clean_text(self, text: Optional[str]) -> str:
         if not text: return ""
@@ -21,11 +34,64 @@ class PDFParser:
         except (ValueError, TypeError):
             return None
 
+    def _prescan_candidate_pages(self) -> Optional[List[int]]:
+        """
+        Varredura rápida do texto bruto de cada página (pdfium, sem análise de layout)
+        para descartar páginas sem movimentações antes da extração cara do pdfplumber.
+        Retorna os números (base 1) das páginas candidatas, ou None se a varredura falhar.
+        """
+        try:
+            doc = pdfium.PdfDocument(self.pdf_path)
+        except Exception as e:
+            print(f"Aviso: pré-varredura indisponível para {self.pdf_path}: {e}")
+            return None
+
+        candidates = []
+        try:
+            for page_index in range(len(doc)):
+                page = doc[page_index]
+                text_page = page.get_textpage()
+                raw_text = "".join(text_page.get_text_range().split())
+                text_page.close()
+                page.close()
+
+                # Páginas sem texto extraível (ex.: digitalizadas) seguem para a análise completa
+                if not raw_text:
+                    candidates.append(page_index + 1)
+                    continue
+                if MOVEMENTS_MARKER not in raw_text or NO_OPERATIONS_MARKER in raw_text:
+                    continue
+                candidates.append(page_index + 1)
+        except Exception as e:
+            print(f"Aviso: falha na pré-varredura de {self.pdf_path}: {e}")
+            return None
+        finally:
+            doc.close()
+        return candidates
+
     def extract_transactions(self) -> List[Dict[str, Any]]:
+        if self.cache is not None:
+            cached = self.cache.get(self.pdf_path, PARSER_VERSION)
+            if cached is not None:
+                self.metadata = cached["metadata"]
+                return cached["transactions"]
+
+        all_transactions, self.metadata, ok = self._parse()
+        if self.cache is not None and ok:
+            self.cache.put(self.pdf_path, PARSER_VERSION, all_transactions, self.metadata)
+        return all_transactions
+
+    def _parse(self) -> Tuple[List[Dict[str, Any]], Dict[str, Any], bool]:
         all_transactions = []
+        metadata: Dict[str, Any] = {"page_count": 0, "reference_periods": [], "transaction_pages": []}
+        candidate_pages = self._prescan_candidate_pages()
         try:
             with pdfplumber.open(self.pdf_path) as pdf:
-                for page_num, page in enumerate(pdf.pages, 1):
+                metadata["page_count"] = len(pdf.pages)
+                if candidate_pages is None:
+                    candidate_pages = range(1, len(pdf.pages) + 1)
+                for page_num in candidate_pages:
+                    page = pdf.pages[page_num - 1]
                     page_text = page.extract_text(x_tolerance=1)
                     if not page_text or "Movimentações no Mês" not in page_text or "(X) não foram realizadas operações" in page_text:
                         continue
@@ -33,6 +99,9 @@ class PDFParser:
                     ref_date_match = re.search(r"Em\s*(\d{2}/\d{4})", page_text)
                     if not ref_date_match: continue
                     month, year = map(int, ref_date_match.group(1).split('/'))
+                    if ref_date_match.group(1) not in metadata["reference_periods"]:
+                        metadata["reference_periods"].append(ref_date_match.group(1))
+                    metadata["transaction_pages"].append(page_num)
                     
                     tables = page.extract_tables(table_settings={"vertical_strategy": "lines", "horizontal_strategy": "text"})
                     for table_data in tables:
@@ -76,4 +145,5 @@ class PDFParser:
                                 })
         except Exception as e:
             print(f"ERRO no Parser ao processar {self.pdf_path}: {e}")
-        return all_transactions
\ No newline at end of file
+            return all_transactions, metadata, False
+        return all_transactions, metadata, True
\ No newline at end of file
@@ -11,10 +11,11 @@ from datetime import datetime
 from .core.database import engine, get_db
 from .core.models import Base, Company, Insider, Filing, Transaction
 from .core.data_portal import download_and_extract_dataframes
-from .core.parser import PDFParser
+from .core.parser import PDFParser, PARSER_VERSION
+from .core.parse_cache import ParseCache
 from .core.config import settings
 
-def process_document(doc_metadata: pd.Series, df_consolidado: pd.DataFrame, db: Session):
+def process_document(doc_metadata: pd.Series, df_consolidado: pd.DataFrame, db: Session, parse_cache: ParseCache = None):
     # ... (o resto da função permanece o mesmo) ...
     protocol = str(doc_metadata['Protocolo_Entrega'])
     cnpj_cleaned = re.sub(r'\D', '', doc_metadata['CNPJ_Companhia'])
@@ -33,7 +34,7 @@ def process_document(doc_metadata: pd.Series, df_consolidado: pd.DataFrame, db:
         except requests.exceptions.RequestException as e:
             print(f"ERRO ao baixar PDF: {e}. Pulando."); return
 
-    parser = PDFParser(pdf_path=pdf_path)
+    parser = PDFParser(pdf_path=pdf_path, cache=parse_cache)
     transactions_from_pdf = parser.extract_transactions()
     if not transactions_from_pdf:
         print("Nenhuma transação encontrada pelo parser no PDF."); return
@@ -102,6 +103,11 @@ if __name__ == "__main__":
     start_year = int(input("Digite o ano inicial para a carga de dados de insiders (ex: 2023): "))
     end_year = datetime.now().year
 
+    parse_cache = ParseCache(settings.PARSE_CACHE_PATH)
+    removed = parse_cache.purge_stale(PARSER_VERSION)
+    if removed:
+        print(f"Cache do parser: {removed} resultados de versões anteriores descartados.")
+
     for year in range(start_year, end_year + 1):
         print(f"{'='*20} PROCESSANDO ANO: {year} {'='*20}")
         df_main, df_consolidado = download_and_extract_dataframes(year=year)
@@ -114,10 +120,11 @@ if __name__ == "__main__":
             db_session = next(get_db())
             try:
                 for index, doc_row in df_filtered.iterrows():
-                    process_document(doc_row, df_consolidado, db_session)
+                    process_document(doc_row, df_consolidado, db_session, parse_cache)
             finally:
                 db_session.close()
         else:
             print(f"Falha ao obter DataFrames para o ano {year}. Pulando.")
 
+    parse_cache.close()
     print("--- Pipeline de ETL de Insiders concluído. ---")
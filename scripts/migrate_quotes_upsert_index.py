@@ -0,0 +1,51 @@
+# scripts/migrate_quotes_upsert_index.py
+import psycopg2
+
+from migrate_schema import get_db_connection_string
+
+def run_migration():
+    """Cria o índice único (ticker, quote_datetime) usado pelo upsert em lote do ETL de cotações."""
+    print("--- INICIANDO MIGRAÇÃO DO ÍNDICE DE COTAÇÕES ---")
+
+    # Cada tupla contém: (descrição_da_tarefa, comando_sql)
+    migration_commands = [
+        # O índice único não pode ser criado enquanto houver chaves repetidas: fica a linha mais recente
+        ("Removendo cotações duplicadas por (ticker, quote_datetime)",
+         """
+         DELETE FROM public.quotes a
+         USING public.quotes b
+         WHERE a.ticker = b.ticker
+           AND a.quote_datetime = b.quote_datetime
+           AND a.id < b.id;
+         """),
+
+        ("Criando índice único 'uq_quotes_ticker_quote_datetime'",
+         "CREATE UNIQUE INDEX IF NOT EXISTS uq_quotes_ticker_quote_datetime ON public.quotes (ticker, quote_datetime);"),
+    ]
+
+    conn = None
+    cur = None
+    try:
+        conn = psycopg2.connect(get_db_connection_string())
+        cur = conn.cursor()
+
+        # Os comandos dependem um do outro: qualquer falha desfaz a migração inteira
+        for description, command in migration_commands:
+            print(f"  - {description}...", end='')
+            cur.execute(command)
+            print(f" OK ({cur.rowcount} linhas)" if cur.rowcount > 0 else " OK")
+
+        conn.commit()
+        print("Migração executada com sucesso!")
+
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        print(f" FALHOU: {e}")
+    finally:
+        if cur: cur.close()
+        if conn: conn.close()
+        print("--- MIGRAÇÃO CONCLUÍDA ---")
+
+if __name__ == "__main__":
+    run_migration()
@@ -1,9 +1,10 @@
 import os
 import sys
+import csv
 import time
-import pandas as pd
-import MetaTrader5 as mt5
-from sqlalchemy import create_engine, text
+import argparse
+from datetime import date
+from sqlalchemy import create_engine
 from dotenv import load_dotenv
 
 # --- 1. CONFIGURAÇÃO E INICIALIZAÇÃO ---
@@ -14,11 +15,287 @@ load_dotenv()
 AWS_REGION = "sa-east-1"  # Região de São Paulo
 PAUSE_INTERVAL_SECONDS = 15
 RETRY_DELAY_SECONDS = 60
+# Sem LISTEN/NOTIFY, a configuração é conferida (por assinatura) neste intervalo
+CONFIG_CHECK_SECONDS = 60
+CONFIG_CHANNEL = "portfolio_config_changed"
 
-def initialize_services():
-    """Conecta-se aos serviços e retorna a engine do banco."""
+# Upsert preparado: aceita qualquer número de linhas via arrays (unnest)
+PREPARE_UPSERT_SQL = """
+    PREPARE upsert_realtime_quotes(text[], float8[], float8[]) AS
+    INSERT INTO realtime_quotes (ticker, last_price, previous_close)
+    SELECT * FROM unnest($1, $2, $3)
+    ON CONFLICT (ticker) DO UPDATE
+    SET last_price = EXCLUDED.last_price,
+        previous_close = EXCLUDED.previous_close,
+        updated_at = NOW();
+"""
+
+NOTIFY_TRIGGER_SQL = f"""
+    CREATE OR REPLACE FUNCTION notify_portfolio_config() RETURNS trigger AS $$
+    BEGIN
+        PERFORM pg_notify('{CONFIG_CHANNEL}', '');
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    DROP TRIGGER IF EXISTS portfolio_config_notify ON portfolio_config;
+    CREATE TRIGGER portfolio_config_notify
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON portfolio_config
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_portfolio_config();
+"""
+
+# --- 2. FONTES DE COTAÇÕES ---
+
+class QuoteFeed:
+    """Interface das fontes de cotação usadas pelo worker."""
+
+    def connect(self):
+        pass
+
+    def ensure_connected(self):
+        """Retorna False se a conexão caiu e precisou ser refeita nesta iteração."""
+        return True
+
+    def last_prices(self, tickers):
+        """Retorna {ticker: último preço} para os ativos com negócio."""
+        raise NotImplementedError
+
+    def previous_close(self, ticker):
+        """Fechamento do pregão anterior (ou None se indisponível)."""
+        raise NotImplementedError
+
+    def shutdown(self):
+        pass
+
+class MT5Feed(QuoteFeed):
+    """Cotações do MetaTrader 5 no terminal local."""
+
+    def __init__(self, login, password, server):
+        import MetaTrader5 as mt5
+        self.mt5 = mt5
+        self.login = login
+        self.password = password
+        self.server = server
+        self._selected = set()
+
+    def connect(self):
+        print("3. Conectando ao MetaTrader 5...")
+        if not self.mt5.initialize(login=self.login, password=self.password, server=self.server):
+            raise ConnectionError(f"Falha ao inicializar o MT5: {self.mt5.last_error()}")
+        self._selected.clear()
+        print("   -> Conexão com o MetaTrader 5 estabelecida.")
+
+    def ensure_connected(self):
+        if self.mt5.terminal_info():
+            return True
+        print(f"[{time.ctime()}] Conexão com MT5 perdida. Tentando reconectar...")
+        self.mt5.shutdown()
+        self.connect()
+        return False
+
+    def _select(self, ticker):
+        # symbol_select só é necessário uma vez por sessão do terminal
+        if ticker not in self._selected:
+            if not self.mt5.symbol_select(ticker, True):
+                return False
+            self._selected.add(ticker)
+        return True
+
+    def last_prices(self, tickers):
+        prices = {}
+        for ticker in tickers:
+            if not self._select(ticker):
+                continue
+            tick = self.mt5.symbol_info_tick(ticker)
+            if tick and tick.last > 0:
+                prices[ticker] = float(tick.last)
+        return prices
+
+    def previous_close(self, ticker):
+        if not self._select(ticker):
+            return None
+        rates = self.mt5.copy_rates_from_pos(ticker, self.mt5.TIMEFRAME_D1, 0, 2)
+        if rates is None or len(rates) < 2:
+            return None
+        return float(rates[0]['close'])
+
+    def shutdown(self):
+        self.mt5.shutdown()
+
+class ReplayFeed(QuoteFeed):
+    """
+    Reproduz cotações gravadas em CSV (timestamp,ticker,last_price,previous_close),
+    um timestamp por iteração. Substitui o MT5 em testes e fora do Windows.
+    """
+
+    def __init__(self, path, loop=False):
+        self.path = path
+        self.loop = loop
+        self._snapshots = []
+        self._position = 0
+        self._previous_close = {}
+
+    def connect(self):
+        print(f"3. Carregando cotações gravadas de {self.path}...")
+        snapshots = {}
+        with open(self.path, newline='', encoding='utf-8') as handle:
+            for row in csv.DictReader(handle):
+                ticker = row['ticker'].strip().upper()
+                snapshots.setdefault(row['timestamp'], {})[ticker] = float(row['last_price'])
+                if row.get('previous_close'):
+                    self._previous_close[ticker] = float(row['previous_close'])
+        self._snapshots = [snapshots[key] for key in sorted(snapshots)]
+        self._position = 0
+        print(f"   -> {len(self._snapshots)} instantes carregados.")
+
+    def last_prices(self, tickers):
+        if self._position >= len(self._snapshots):
+            if not self.loop or not self._snapshots:
+                return {}
+            self._position = 0
+        snapshot = self._snapshots[self._position]
+        self._position += 1
+        return {ticker: snapshot[ticker] for ticker in tickers if ticker in snapshot}
+
+    def previous_close(self, ticker):
+        return self._previous_close.get(ticker)
+
+# --- 3. CONFIGURAÇÃO DA CARTEIRA EM CACHE ---
+
+class PortfolioConfig:
+    """
+    Lista de ativos da 'portfolio_config' mantida em memória. É recarregada quando o
+    banco avisa via LISTEN/NOTIFY; sem permissão para criar o trigger, uma assinatura
+    barata (contagem + md5 dos tickers) é conferida a cada CONFIG_CHECK_SECONDS.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.tickers = []
+        self._signature = None
+        self._checked_at = 0.0
+        self._listen_conn = None
+        self._setup_listen()
+        self.reload()
+
+    def _setup_listen(self):
+        conn = None
+        try:
+            conn = self.engine.raw_connection()
+            conn.set_isolation_level(0)  # AUTOCOMMIT
+            cur = conn.cursor()
+            cur.execute(NOTIFY_TRIGGER_SQL)
+            cur.execute(f"LISTEN {CONFIG_CHANNEL};")
+            self._listen_conn = conn
+            print("   -> Configuração monitorada via LISTEN/NOTIFY.")
+        except Exception as e:
+            print(f"   -> LISTEN/NOTIFY indisponível ({e}); conferindo a configuração a cada {CONFIG_CHECK_SECONDS}s.")
+            self._discard(conn)
+            self._listen_conn = None
+
+    @staticmethod
+    def _discard(conn):
+        """Descarta a conexão LISTEN: em AUTOCOMMIT, ela não pode voltar ao pool do engine"""
+        if conn is None:
+            return
+        try:
+            conn.invalidate()
+        except Exception:
+            pass
+
+    def _read_signature(self, cur):
+        cur.execute("SELECT count(*), md5(coalesce(string_agg(ticker, ',' ORDER BY ticker), '')) FROM portfolio_config")
+        return cur.fetchone()
+
+    def reload(self):
+        conn = self.engine.raw_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT ticker FROM portfolio_config ORDER BY ticker")
+            self.tickers = [row[0].strip().upper() for row in cur.fetchall()]
+            self._signature = self._read_signature(cur)
+        finally:
+            conn.close()
+        self._checked_at = time.monotonic()
+        print(f"[{time.ctime()}] Configuração carregada: {len(self.tickers)} ativos.")
+
+    def refresh(self):
+        """Recarrega a lista se ela mudou. Retorna True quando houve recarga."""
+        if self._listen_conn is not None:
+            try:
+                self._listen_conn.poll()
+                if self._listen_conn.notifies:
+                    self._listen_conn.notifies.clear()
+                    self.reload()
+                    return True
+                return False
+            except Exception as e:
+                print(f"[{time.ctime()}] Conexão LISTEN perdida ({e}); voltando à conferência periódica.")
+                self._discard(self._listen_conn)
+                self._listen_conn = None
+
+        if time.monotonic() - self._checked_at < CONFIG_CHECK_SECONDS:
+            return False
+        conn = self.engine.raw_connection()
+        try:
+            signature = self._read_signature(conn.cursor())
+        finally:
+            conn.close()
+        self._checked_at = time.monotonic()
+        if signature != self._signature:
+            self.reload()
+            return True
+        return False
+
+# --- 4. GRAVAÇÃO APENAS DO QUE MUDOU ---
+
+class RealtimeQuoteWriter:
+    """Mantém o último valor gravado por ativo e só envia as linhas alteradas."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._conn = None
+        self._written = {}
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = self.engine.raw_connection()
+            cur = self._conn.cursor()
+            cur.execute(PREPARE_UPSERT_SQL)
+            self._conn.commit()
+        return self._conn
+
+    def write(self, quotes):
+        """quotes: {ticker: (last_price, previous_close)}. Retorna o número de linhas gravadas."""
+        changed = {
+            ticker: values for ticker, values in quotes.items()
+            if self._written.get(ticker) != values
+        }
+        if not changed:
+            return 0
+
+        tickers = list(changed)
+        conn = self._connection()
+        try:
+            cur = conn.cursor()
+            cur.execute(
+                "EXECUTE upsert_realtime_quotes(%s, %s, %s)",
+                (tickers, [changed[t][0] for t in tickers], [changed[t][1] for t in tickers])
+            )
+            conn.commit()
+        except Exception:
+            # A conexão (e o statement preparado) é refeita na próxima gravação
+            try:
+                conn.close()
+            finally:
+                self._conn = None
+            raise
+        self._written.update(changed)
+        return len(changed)
+
+def initialize_services(feed_name="mt5", replay_file=None, replay_loop=False):
+    """Conecta-se aos serviços e retorna a engine do banco e a fonte de cotações."""
     print("--- Configurando Serviços ---")
-    
+
     try:
         # --- Carregando credenciais do arquivo .env ---
         print("1. Lendo credenciais do arquivo .env...")
@@ -26,13 +303,21 @@ def initialize_services():
         db_password = os.getenv("DB_PASSWORD")
         db_host = os.getenv("DB_HOST")
         db_name = os.getenv("DB_NAME", "postgres") # Usa 'postgres' como padrão
-        
-        mt5_login = int(os.getenv("MT5_LOGIN"))
-        mt5_password = os.getenv("MT5_PASSWORD")
-        mt5_server = os.getenv("MT5_SERVER")
-        
-        if not all([db_user, db_password, db_host, mt5_login, mt5_password, mt5_server]):
+
+        if not all([db_user, db_password, db_host]):
             raise ValueError("Uma ou mais variáveis de ambiente não foram encontradas no arquivo .env.")
+
+        if feed_name == "replay":
+            if not replay_file:
+                raise ValueError("Informe --replay-file para usar a fonte 'replay'.")
+            feed = ReplayFeed(replay_file, loop=replay_loop)
+        else:
+            mt5_login = os.getenv("MT5_LOGIN")
+            mt5_password = os.getenv("MT5_PASSWORD")
+            mt5_server = os.getenv("MT5_SERVER")
+            if not all([mt5_login, mt5_password, mt5_server]):
+                raise ValueError("Uma ou mais variáveis de ambiente não foram encontradas no arquivo .env.")
+            feed = MT5Feed(int(mt5_login), mt5_password, mt5_server)
         print("   -> Credenciais carregadas.")
 
         # --- Conexão com o Banco de Dados (AWS RDS) ---
@@ -43,69 +328,61 @@ def initialize_services():
             pass
         print("   -> Conexão com o banco de dados estabelecida.")
 
-        # --- Conexão com o MetaTrader 5 ---
-        print("3. Conectando ao MetaTrader 5...")
-        if not mt5.initialize(login=mt5_login, password=mt5_password, server=mt5_server):
-            raise ConnectionError(f"Falha ao inicializar o MT5: {mt5.last_error()}")
-        print("   -> Conexão com o MetaTrader 5 estabelecida.")
+        # --- Conexão com a fonte de cotações ---
+        feed.connect()
 
         print("--- Todos os serviços foram iniciados com sucesso! ---")
-        return engine
+        return engine, feed
 
     except Exception as e:
         print(f"\n[ERRO FATAL] Falha na inicialização: {e}")
         sys.exit(1)
 
-def main_worker(engine):
+def main_worker(engine, feed):
     """Loop principal que busca e salva as cotações."""
     print(f"\n--- Worker iniciado. Buscando cotações a cada {PAUSE_INTERVAL_SECONDS} segundos. ---\n")
+    config = PortfolioConfig(engine)
+    writer = RealtimeQuoteWriter(engine)
+    # Fechamento anterior por ativo, válido para o dia em que foi lido
+    previous_closes = {}
+
     while True:
         try:
-            if not mt5.terminal_info():
-                print(f"[{time.ctime()}] Conexão com MT5 perdida. Tentando reconectar...")
-                mt5.shutdown()
-                initialize_services()
+            if not feed.ensure_connected():
                 continue
-            
-            df_config = pd.read_sql("SELECT ticker FROM portfolio_config", engine)
-            if df_config.empty:
+
+            config.refresh()
+            if not config.tickers:
                 print(f"[{time.ctime()}] Nenhum ativo na 'portfolio_config'. Insira ativos pelo DBeaver para começar.")
                 time.sleep(PAUSE_INTERVAL_SECONDS)
                 continue
 
-            quotes_to_upsert = []
-            for ticker in df_config['ticker']:
-                if not mt5.symbol_select(ticker, True): continue
-                tick = mt5.symbol_info_tick(ticker)
-                rates = mt5.copy_rates_from_pos(ticker, mt5.TIMEFRAME_D1, 0, 2)
-                if tick and tick.last > 0 and rates is not None and len(rates) > 1:
-                    quotes_to_upsert.append({
-                        "ticker": ticker,
-                        "last_price": tick.last,
-                        "previous_close": rates[0]['close']
-                    })
-            
-            if quotes_to_upsert:
-                df_quotes = pd.DataFrame(quotes_to_upsert)
-                with engine.connect() as conn:
-                    df_quotes.to_sql('temp_quotes', conn, if_exists='replace', index=False)
-                    upsert_sql = text("""
-                        INSERT INTO realtime_quotes (ticker, last_price, previous_close)
-                        SELECT ticker, last_price, previous_close FROM temp_quotes
-                        ON CONFLICT (ticker) DO UPDATE
-                        SET last_price = EXCLUDED.last_price, 
-                            previous_close = EXCLUDED.previous_close,
-                            updated_at = NOW();
-                    """)
-                    conn.execute(upsert_sql)
-                    conn.commit()
-                print(f"[{time.ctime()}] Preços atualizados para {len(quotes_to_upsert)} ativos.")
+            today = date.today()
+            quotes = {}
+            for ticker, last_price in feed.last_prices(config.tickers).items():
+                cached = previous_closes.get(ticker)
+                if cached is None or cached[0] != today:
+                    close = feed.previous_close(ticker)
+                    if close is None:
+                        continue
+                    cached = previous_closes[ticker] = (today, close)
+                quotes[ticker] = (last_price, cached[1])
+
+            written = writer.write(quotes)
+            if written:
+                print(f"[{time.ctime()}] Preços atualizados para {written} de {len(quotes)} ativos.")
         except Exception as e:
             print(f"\n[ERRO NO LOOP] {e}. Aguardando {RETRY_DELAY_SECONDS}s...")
             time.sleep(RETRY_DELAY_SECONDS)
-        
+
         time.sleep(PAUSE_INTERVAL_SECONDS)
 
 if __name__ == "__main__":
-    db_engine = initialize_services()
-    main_worker(db_engine)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Worker de cotações em tempo real")
+    parser.add_argument("--feed", choices=["mt5", "replay"], default=os.getenv("RTD_FEED", "mt5"))
+    parser.add_argument("--replay-file", help="CSV com timestamp,ticker,last_price,previous_close")
+    parser.add_argument("--replay-loop", action="store_true", help="Reinicia o replay ao chegar no fim")
+    args = parser.parse_args()
+
+    db_engine, quote_feed = initialize_services(args.feed, args.replay_file, args.replay_loop)
+    main_worker(db_engine, quote_feed)